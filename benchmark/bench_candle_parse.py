@@ -0,0 +1,72 @@
+"""
+Compare per-row CandleData parsing with the vectorized columnar path of gateway.candle
+
+python -m benchmark.bench_candle_parse [num_candles]
+"""
+import random
+import sys
+import time
+
+from gateway.candle import candle_arrays_to_df, format_candles, parse_candle_arrays
+from gateway.constant import CandleData
+
+
+def make_klines(n: int, start_ms: int = 1609459200000, timeframe_ms: int = 60000) -> list[list]:
+    data = []
+    price = 30000.
+    for i in range(n):
+        o = price
+        c = o * (1 + random.gauss(0, 0.001))
+        h, l = max(o, c) * 1.0005, min(o, c) * 0.9995
+        v = random.random() * 100
+        t = start_ms + i * timeframe_ms
+        data.append([
+            t, f'{o:.2f}', f'{h:.2f}', f'{l:.2f}', f'{c:.2f}', f'{v:.6f}', t + timeframe_ms - 1, f'{v * c:.6f}',
+            random.randint(100, 5000), f'{v / 2:.6f}', f'{v * c / 2:.6f}', '0'
+        ])
+        price = c
+    return data
+
+
+def parse_rows(data: list[list]) -> list[CandleData]:
+    # 逐行构造CandleData的原始实现
+    return [
+        CandleData(candle_begin_ms=int(d[0]),
+                   candle_end_ms=int(d[6]),
+                   open=float(d[1]),
+                   high=float(d[2]),
+                   low=float(d[3]),
+                   close=float(d[4]),
+                   volume=float(d[5]),
+                   turnover=float(d[7]),
+                   num_trades=int(d[8]),
+                   buy_vol=float(d[9]),
+                   buy_turnover=float(d[10])) for d in data
+    ]
+
+
+def timeit(func, *args, repeat: int = 3) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        t = time.perf_counter()
+        func(*args)
+        best = min(best, time.perf_counter() - t)
+    return best
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    data = make_klines(n)
+    results = {
+        'dataclass list': timeit(parse_rows, data),
+        'numpy columns': timeit(parse_candle_arrays, data),
+        'dataframe': timeit(lambda x: candle_arrays_to_df(parse_candle_arrays(x)), data),
+        'list (format_candles)': timeit(format_candles, data),
+    }
+    base = results['dataclass list']
+    for name, sec in results.items():
+        print(f'{name:>22}: {sec * 1000:9.1f} ms  {n / sec:12,.0f} rows/s  x{base / sec:.1f}')
+
+
+if __name__ == '__main__':
+    main()
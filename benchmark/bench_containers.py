@@ -0,0 +1,71 @@
+"""
+Memory and construction speed of candle containers: plain dataclass, slotted CandleData and CandleBatch
+
+python -m benchmark.bench_containers [num_candles]
+"""
+import random
+import sys
+import time
+import tracemalloc
+from dataclasses import fields, make_dataclass
+
+import numpy as np
+
+from gateway.candle import CANDLE_COLUMNS, CANDLE_DTYPES, CandleBatch
+from gateway.constant import CandleData
+
+# 原实现: 不带__slots__的dataclass
+PlainCandleData = make_dataclass('PlainCandleData', [(f.name, f.type) for f in fields(CandleData)])
+
+
+def make_rows(n: int) -> list[tuple]:
+    start_ms = 1609459200000
+    rows = []
+    for i in range(n):
+        t = start_ms + i * 60000
+        p = 30000 + random.random() * 100
+        rows.append((t, t + 59999, p, p + 1, p - 1, p, 10.5, 315000., 100, 5.2, 156000.))
+    return rows
+
+
+def build_objects(cls, rows: list[tuple]) -> list:
+    return [cls(*row) for row in rows]
+
+
+def build_batch(rows: list[tuple]) -> CandleBatch:
+    columns = list(zip(*rows))
+    return CandleBatch({
+        col: np.array(values, dtype=CANDLE_DTYPES[col]) for col, values in zip(CANDLE_COLUMNS, columns)
+    })
+
+
+def measure(func, *args) -> tuple[float, int]:
+    """
+    Construction time in seconds and memory held by the result in bytes
+    """
+    tracemalloc.start()
+    t = time.perf_counter()
+    result = func(*args)
+    sec = time.perf_counter() - t
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return sec, size
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    rows = make_rows(n)
+    results = {
+        'plain dataclass': measure(build_objects, PlainCandleData, rows),
+        'slotted dataclass': measure(build_objects, CandleData, rows),
+        'CandleBatch': measure(build_batch, rows),
+    }
+    base_sec, base_size = results['plain dataclass']
+    for name, (sec, size) in results.items():
+        print(f'{name:>18}: {sec * 1000:9.1f} ms  {n / sec:12,.0f} rows/s  '
+              f'{size / 2**20:8.1f} MiB  {size / n:6.0f} B/row  mem x{size / base_size:.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+"""
+End-to-end throughput and tail latency of BinanceGateway paths against the local stub server
+
+python -m benchmark.bench_gateway [--latency-ms 1] [--jitter-ms 1] [--error-rate 0] [--repeat 200] [--threads 1] [--metrics]
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+from gateway.binance import BinanceGateway
+from gateway.binance_spot_ws import BinanceSpotWs
+from gateway.constant import Direction, OrderType, SymbolType
+from gateway.metrics import METRICS
+from gateway.rate_limit import ApiFamily, RequestScheduler
+
+from benchmark.stub_server import StubConfig, StubServer, use_stub_server
+
+SPOT_SYMBOL = 'BTC-USDT.SPT'
+USDT_SYMBOL = 'BTC-USDT.SWPU'
+COIN_SYMBOL = 'BTC-USD.SWPC'
+
+
+def percentile(sorted_values: list[float], q: float) -> float:
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+def run_case(name: str, func, repeat: int, threads: int):
+    """
+    Call func repeat times on threads threads, print throughput and latency percentiles
+    """
+    latencies = []
+
+    def timed(_):
+        t = time.perf_counter()
+        func()
+        latencies.append(time.perf_counter() - t)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(threads) as executor:
+        list(executor.map(timed, range(repeat)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    p50, p99, p999 = (percentile(latencies, q) * 1000 for q in (0.5, 0.99, 0.999))
+    print(f'{name:>28}: {repeat / elapsed:9.1f} req/s  p50 {p50:7.2f} ms  p99 {p99:7.2f} ms  p999 {p999:7.2f} ms')
+
+
+def bench_ws(url: str, seconds: float):
+    received = []
+    ws = BinanceSpotWs(candle_format='raw', host=url.replace('http', 'ws') + '/stream')
+    ws.on_candle = received.append
+    ws.connect()
+    time.sleep(seconds)
+    ws.stop()
+    print(f'{"ws kline":>28}: {len(received) / seconds:9.1f} msg/s')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Gateway benchmark against the local stub server')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency-ms', type=float, default=1)
+    parser.add_argument('--jitter-ms', type=float, default=1)
+    parser.add_argument('--error-rate', type=float, default=0)
+    parser.add_argument('--repeat', type=int, default=200)
+    parser.add_argument('--threads', type=int, default=1)
+    parser.add_argument('--ws-seconds', type=float, default=5)
+    parser.add_argument('--metrics', action='store_true', help='Print gateway metrics in Prometheus text format')
+    args = parser.parse_args()
+
+    METRICS.enabled = args.metrics
+    config = StubConfig(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, error_rate=args.error_rate)
+    url = StubServer(config).start_in_thread(port=args.port)
+
+    # 不受真实交易所限频约束, 测量网关自身的开销
+    scheduler = RequestScheduler(weight_limits={f: 10**9 for f in ApiFamily},
+                                 order_limits={f: (10**9, 1) for f in ApiFamily})
+    gateway = BinanceGateway('stub_key', 'stub_secret', scheduler=scheduler)
+    use_stub_server(gateway, url)
+
+    end = datetime.now(timezone.utc).replace(second=0, microsecond=0)
+    start = end - timedelta(days=3)
+    orders = {(sym, Direction.LONG): {
+        'order_type': OrderType.LIMIT, 'price': 30000.123, 'size': 0.0123
+    } for sym in (USDT_SYMBOL, COIN_SYMBOL, SPOT_SYMBOL)}
+    n, threads = args.repeat, args.threads
+
+    run_case('query_symbol', lambda: gateway.query_symbol([SymbolType.SWAP_USDT, SymbolType.SWAP_COIN]), n, threads)
+    run_case('query_orderbook', lambda: gateway.query_orderbook(SPOT_SYMBOL, 100), n, threads)
+    run_case('query_candle 3d 1m', lambda: gateway.query_candle(USDT_SYMBOL, start, end, '1m'), max(1, n // 10),
+             threads)
+    run_case('query_candle 3d 1m x4', lambda: gateway.query_candle(USDT_SYMBOL, start, end, '1m', concurrency=4),
+             max(1, n // 10), threads)
+    run_case('send_order', lambda: gateway.send_order(USDT_SYMBOL, Direction.LONG, OrderType.LIMIT, 30000.123,
+                                                      0.0123), n, threads)
+    run_case('batch_send_orders', lambda: gateway.batch_send_orders(orders), n, threads)
+    run_case('query_account_and_position',
+             lambda: gateway.query_account_and_position([SymbolType.SWAP_USDT, SymbolType.SWAP_COIN]), n, threads)
+    run_case('get_swap_recent_fee_rate', gateway.get_swap_recent_fee_rate, n, threads)
+    bench_ws(url, args.ws_seconds)
+
+    if args.metrics:
+        print(METRICS.to_prometheus())
+
+
+if __name__ == '__main__':
+    main()
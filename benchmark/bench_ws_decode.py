@@ -0,0 +1,91 @@
+"""
+Websocket frame decoding throughput in messages per second
+
+python -m benchmark.bench_ws_decode [num_frames]
+"""
+import json
+import random
+import sys
+import time
+
+from gateway.decoder import EVENT_PARSERS, JsonDecoder, TypedDecoder, get_channel, orjson, msgspec
+
+
+def make_frames(n: int) -> list[str]:
+    frames = []
+    t = 1609459200000
+    for i in range(n):
+        p = 30000 + random.random() * 100
+        kind = i % 4
+        if kind == 0:
+            data = {
+                'e': 'kline', 'E': t + i, 's': 'BTCUSDT', 'k': {
+                    't': t, 'T': t + 59999, 's': 'BTCUSDT', 'i': '1m', 'f': 100, 'L': 200, 'o': f'{p:.2f}',
+                    'c': f'{p:.2f}', 'h': f'{p:.2f}', 'l': f'{p:.2f}', 'v': '10.5', 'n': 100, 'x': False,
+                    'q': '315000.0', 'V': '5.2', 'Q': '156000.0', 'B': '0'
+                }
+            }
+            stream = 'btcusdt@kline_1m'
+        elif kind == 1:
+            data = {'u': i, 's': 'BTCUSDT', 'b': f'{p:.2f}', 'B': '1.5', 'a': f'{p + 0.01:.2f}', 'A': '2.1'}
+            stream = 'btcusdt@bookTicker'
+        elif kind == 2:
+            levels = [[f'{p - j:.2f}', f'{random.random():.6f}'] for j in range(10)]
+            data = {'e': 'depthUpdate', 'E': t + i, 's': 'BTCUSDT', 'U': i, 'u': i + 5, 'b': levels, 'a': levels}
+            stream = 'btcusdt@depth@100ms'
+        else:
+            data = {'e': 'aggTrade', 'E': t + i, 's': 'BTCUSDT', 'a': i, 'p': f'{p:.2f}', 'q': '0.01', 'f': i,
+                    'l': i, 'T': t + i, 'm': True, 'M': True}
+            stream = 'btcusdt@aggTrade'
+        frames.append(json.dumps({'stream': stream, 'data': data}, separators=(',', ':')))
+    return frames
+
+
+def decode_json_manual(frames: list[str]):
+    # 原实现: json.loads后逐字段转换
+    for text in frames:
+        packet = json.loads(text)
+        EVENT_PARSERS[get_channel(packet['stream'])](packet['data'])
+
+
+def decode_all(decoder):
+    def run(frames: list[str]):
+        for text in frames:
+            decoder.decode(text)
+
+    return run
+
+
+def timeit(func, *args, repeat: int = 3) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        t = time.perf_counter()
+        func(*args)
+        best = min(best, time.perf_counter() - t)
+    return best
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    frames = make_frames(n)
+    cases = {
+        'json + manual': decode_json_manual,
+        'dict (fastest)': decode_all(JsonDecoder()),
+        'typed json': decode_all(TypedDecoder(loads=json.loads)),
+    }
+    if orjson is not None:
+        cases['typed orjson'] = decode_all(TypedDecoder(loads=orjson.loads))
+    if msgspec is not None:
+        cases['typed msgspec'] = decode_all(TypedDecoder(loads=msgspec.json.Decoder().decode))
+        cases['typed msgspec struct'] = decode_all(TypedDecoder())
+    cases['typed kline only'] = decode_all(TypedDecoder(channels={'kline'}))
+
+    base = None
+    for name, func in cases.items():
+        sec = timeit(func, frames)
+        base = base or sec
+        print(f'{name:>20}: {sec * 1000:9.1f} ms  {n / sec:12,.0f} msg/s  x{base / sec:.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,307 @@
+"""
+Local stand-in for the Binance REST and combined-stream websocket endpoints used by the gateway
+
+python -m benchmark.stub_server [--port 8765] [--latency-ms 0] [--error-rate 0] [--rate-limit 0]
+
+Point a gateway at it with use_stub_server(gateway, base_url).
+"""
+import argparse
+import asyncio
+import json
+import random
+import re
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Optional
+
+from aiohttp import WSMsgType, web
+
+BASE_PRICE = 30000.
+KLINE_MS: dict[str, int] = {'1m': 60000, '5m': 300000, '15m': 900000, '1h': 3600000, '4h': 14400000, '1d': 86400000}
+
+
+@dataclass
+class StubConfig:
+    latency_ms: float = 0  # 每个REST请求的固定延迟
+    jitter_ms: float = 0  # 额外的随机延迟上限
+    error_rate: float = 0  # 返回500的概率
+    rate_limit: int = 0  # 每秒最多处理的REST请求数, 超出返回429, 0表示不限制
+    retry_after: int = 1
+    ws_interval_ms: float = 10  # websocket每个stream推送间隔
+    num_symbols: int = 20
+
+
+def make_symbols(n: int) -> dict[str, list[dict]]:
+    """
+    exchangeInfo symbols of each API prefix
+    """
+    bases = [f'C{i:03d}' for i in range(n - 1)] + ['BTC']
+    filters = [{'filterType': 'PRICE_FILTER', 'tickSize': '0.01'}, {'filterType': 'LOT_SIZE', 'stepSize': '0.001'}]
+    spot = [{'symbol': f'{b}USDT', 'baseAsset': b, 'quoteAsset': 'USDT', 'filters': filters} for b in bases]
+    usdt = [{
+        'symbol': f'{b}USDT', 'baseAsset': b, 'quoteAsset': 'USDT', 'contractType': 'PERPETUAL', 'filters': filters
+    } for b in bases]
+    coin = [{
+        'symbol': f'{b}USD_PERP', 'baseAsset': b, 'quoteAsset': 'USD', 'contractType': 'PERPETUAL', 'contractSize': 100,
+        'filters': filters
+    } for b in bases]
+    return {'api': spot, 'fapi': usdt, 'dapi': coin}
+
+
+def make_kline(t: int, interval_ms: int) -> list:
+    p = BASE_PRICE + (t // interval_ms) % 1000
+    return [t, f'{p:.2f}', f'{p + 5:.2f}', f'{p - 5:.2f}', f'{p + 1:.2f}', '12.5', t + interval_ms - 1,
+            f'{p * 12.5:.4f}', 100, '6.1', f'{p * 6.1:.4f}', '0']
+
+
+def make_klines(start_ms: int, end_ms: int, interval_ms: int, limit: int) -> list[list]:
+    start_ms -= start_ms % interval_ms
+    end_ms = min(end_ms, int(time.time() * 1000))
+    data = []
+    t = start_ms
+    while t <= end_ms and len(data) < limit:
+        data.append(make_kline(t, interval_ms))
+        t += interval_ms
+    return data
+
+
+class StubServer:
+    """
+    aiohttp application simulating exchangeInfo, klines, depth, order, batchOrders, account, positionRisk,
+    premiumIndex, fundingRate and the /stream websocket, with configurable latency, errors and rate limits
+    """
+
+    def __init__(self, config: Optional[StubConfig] = None):
+        self.config = config or StubConfig()
+        self.symbols = make_symbols(self.config.num_symbols)
+        self.order_id = 0
+        self.num_requests = 0
+        self._recent: deque = deque()  # 最近1秒内请求的时间
+
+        self.app = web.Application(middlewares=[self.middleware])
+        for prefix, version in (('api', 'v3'), ('fapi', 'v1'), ('dapi', 'v1')):
+            base = f'/{prefix}/{version}'
+            self.app.router.add_get(f'{base}/exchangeInfo', self.exchange_info)
+            self.app.router.add_get(f'{base}/klines', self.klines)
+            self.app.router.add_get(f'{base}/depth', self.depth)
+            self.app.router.add_post(f'{base}/order', self.order)
+            self.app.router.add_get(f'{base}/account', self.account)
+        for prefix in ('fapi', 'dapi'):
+            base = f'/{prefix}/v1'
+            self.app.router.add_post(f'{base}/batchOrders', self.batch_orders)
+            self.app.router.add_get(f'{base}/positionRisk', self.position_risk)
+            self.app.router.add_get(f'{base}/premiumIndex', self.premium_index)
+            self.app.router.add_get(f'{base}/fundingRate', self.funding_rate)
+        self.app.router.add_get('/stream', self.stream)
+        self._runner: Optional[web.AppRunner] = None
+
+    @web.middleware
+    async def middleware(self, request: web.Request, handler):
+        if request.path == '/stream':
+            return await handler(request)
+        self.num_requests += 1
+        cfg = self.config
+        if cfg.rate_limit:
+            now = time.monotonic()
+            while self._recent and self._recent[0] < now - 1:
+                self._recent.popleft()
+            if len(self._recent) >= cfg.rate_limit:
+                return web.json_response({'code': -1003, 'msg': 'Too many requests'},
+                                         status=429,
+                                         headers={'Retry-After': str(cfg.retry_after)})
+            self._recent.append(now)
+        delay = cfg.latency_ms + random.random() * cfg.jitter_ms
+        if delay > 0:
+            await asyncio.sleep(delay / 1000)
+        if cfg.error_rate and random.random() < cfg.error_rate:
+            return web.json_response({'code': -1000, 'msg': 'Stub internal error'}, status=500)
+        response = await handler(request)
+        response.headers['X-MBX-USED-WEIGHT-1M'] = str(len(self._recent))
+        return response
+
+    @staticmethod
+    def _prefix(request: web.Request) -> str:
+        return request.path.split('/')[1]
+
+    async def _params(self, request: web.Request) -> dict:
+        params = dict(request.query)
+        if request.method == 'POST' and request.can_read_body:
+            params.update(await request.post())
+        return params
+
+    async def exchange_info(self, request: web.Request):
+        symbols = self.symbols[self._prefix(request)]
+        if 'symbol' in request.query:
+            symbols = [x for x in symbols if x['symbol'] == request.query['symbol']]
+        return web.json_response({'symbols': symbols})
+
+    async def klines(self, request: web.Request):
+        q = request.query
+        interval_ms = KLINE_MS[q['interval']]
+        limit = int(q.get('limit', 500))
+        start_ms = int(q.get('startTime', int(time.time() * 1000) - limit * interval_ms))
+        end_ms = int(q.get('endTime', start_ms + (limit - 1) * interval_ms))
+        return web.json_response(make_klines(start_ms, end_ms, interval_ms, limit))
+
+    async def depth(self, request: web.Request):
+        limit = int(request.query.get('limit', 100))
+        bids = [[f'{BASE_PRICE - 0.01 * (i + 1):.2f}', '1.000'] for i in range(limit)]
+        asks = [[f'{BASE_PRICE + 0.01 * (i + 1):.2f}', '1.000'] for i in range(limit)]
+        return web.json_response({'lastUpdateId': int(time.time() * 1000), 'bids': bids, 'asks': asks})
+
+    def _new_order(self, params: dict) -> dict:
+        self.order_id += 1
+        now = int(time.time() * 1000)
+        return {
+            'symbol': params['symbol'], 'orderId': self.order_id, 'clientOrderId': params.get('newClientOrderId', ''),
+            'price': params['price'], 'origQty': params['quantity'], 'executedQty': '0', 'avgPrice': '0',
+            'status': 'NEW', 'timeInForce': params['timeInForce'], 'type': params['type'], 'side': params['side'],
+            'updateTime': now, 'transactTime': now
+        }
+
+    async def order(self, request: web.Request):
+        return web.json_response(self._new_order(await self._params(request)))
+
+    async def batch_orders(self, request: web.Request):
+        params = await self._params(request)
+        return web.json_response([self._new_order(x) for x in json.loads(params['batchOrders'])])
+
+    async def account(self, request: web.Request):
+        if self._prefix(request) == 'api':
+            return web.json_response({'balances': [{'asset': 'USDT', 'free': '10000', 'locked': '0'}]})
+        asset = {'asset': 'USDT', 'marginBalance': '10000', 'walletBalance': '10000', 'unrealizedProfit': '0'}
+        positions = [{
+            'symbol': x['symbol'], 'positionAmt': '0', 'entryPrice': '0', 'unrealizedProfit': '0'
+        } for x in self.symbols['fapi']]
+        return web.json_response({'assets': [asset], 'positions': positions})
+
+    async def position_risk(self, request: web.Request):
+        return web.json_response([{
+            'symbol': x['symbol'], 'positionAmt': '1', 'entryPrice': f'{BASE_PRICE:.2f}', 'unRealizedProfit': '0'
+        } for x in self.symbols[self._prefix(request)]])
+
+    async def premium_index(self, request: web.Request):
+        next_funding = int(time.time() * 1000) // 28800000 * 28800000 + 28800000
+        return web.json_response([{
+            'symbol': x['symbol'], 'lastFundingRate': '0.00010000', 'nextFundingTime': next_funding
+        } for x in self.symbols[self._prefix(request)]])
+
+    async def funding_rate(self, request: web.Request):
+        q = request.query
+        limit = int(q.get('limit', 100))
+        end_ms = int(q.get('endTime', time.time() * 1000))
+        start_ms = int(q.get('startTime', end_ms - limit * 28800000))
+        start_ms += -start_ms % 28800000
+        times = range(start_ms, end_ms + 1, 28800000)
+        return web.json_response([{
+            'symbol': q['symbol'], 'fundingTime': t, 'fundingRate': '0.00010000'
+        } for t in times[:limit]])
+
+    async def stream(self, request: web.Request):
+        """
+        Combined stream websocket, pushes closed klines for every subscribed kline stream
+        """
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        streams: set[str] = set()
+
+        async def push():
+            interval_ms = KLINE_MS['1m']
+            t = int(time.time() * 1000) // interval_ms * interval_ms
+            while not ws.closed:
+                t += interval_ms
+                for stream in list(streams):
+                    symbol, channel = stream.split('@', 1)
+                    if not channel.startswith('kline'):
+                        continue
+                    # 推送时间不受当前时间限制, 不能用make_klines
+                    k = make_kline(t, interval_ms)
+                    data = {
+                        'e': 'kline', 'E': int(time.time() * 1000), 's': symbol.upper(), 'k': {
+                            't': k[0], 'T': k[6], 's': symbol.upper(), 'i': '1m', 'o': k[1], 'h': k[2], 'l': k[3],
+                            'c': k[4], 'v': k[5], 'n': k[8], 'x': True, 'q': k[7], 'V': k[9], 'Q': k[10], 'B': '0'
+                        }
+                    }
+                    await ws.send_str(json.dumps({'stream': stream, 'data': data}, separators=(',', ':')))
+                await asyncio.sleep(self.config.ws_interval_ms / 1000)
+
+        task = asyncio.ensure_future(push())
+        try:
+            async for msg in ws:
+                if msg.type != WSMsgType.TEXT:
+                    continue
+                req = json.loads(msg.data)
+                if req.get('method') == 'SUBSCRIBE':
+                    streams.update(req['params'])
+                elif req.get('method') == 'UNSUBSCRIBE':
+                    streams.difference_update(req['params'])
+                await ws.send_str(json.dumps({'result': None, 'id': req.get('id')}))
+        finally:
+            task.cancel()
+        return ws
+
+    async def start(self, host: str = '127.0.0.1', port: int = 8765):
+        self._runner = web.AppRunner(self.app)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, host, port).start()
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+    def start_in_thread(self, host: str = '127.0.0.1', port: int = 8765) -> str:
+        """
+        Run the server on a background event loop, return its base url
+        """
+        loop = asyncio.new_event_loop()
+        started = threading.Event()
+
+        def run():
+            asyncio.set_event_loop(loop)
+            loop.run_until_complete(self.start(host, port))
+            started.set()
+            loop.run_forever()
+
+        threading.Thread(target=run, name='stub_server', daemon=True).start()
+        started.wait()
+        return f'http://{host}:{port}'
+
+
+def use_stub_server(gateway, base_url: str):
+    """
+    Redirect all REST urls of a BinanceGateway to the stub server, keeping their paths
+    """
+    api = gateway.exg.urls['api']
+    for key, url in api.items():
+        if isinstance(url, str):
+            api[key] = re.sub(r'^https?://[^/]+', base_url, url)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local Binance stand-in server')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency-ms', type=float, default=0)
+    parser.add_argument('--jitter-ms', type=float, default=0)
+    parser.add_argument('--error-rate', type=float, default=0)
+    parser.add_argument('--rate-limit', type=int, default=0)
+    args = parser.parse_args()
+
+    config = StubConfig(latency_ms=args.latency_ms,
+                        jitter_ms=args.jitter_ms,
+                        error_rate=args.error_rate,
+                        rate_limit=args.rate_limit)
+    server = StubServer(config)
+    loop = asyncio.new_event_loop()
+    loop.run_until_complete(server.start(args.host, args.port))
+    print(f'Stub server listening on http://{args.host}:{args.port}')
+    try:
+        loop.run_forever()
+    except KeyboardInterrupt:
+        loop.run_until_complete(server.stop())
+
+
+if __name__ == '__main__':
+    main()
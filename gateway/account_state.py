@@ -0,0 +1,215 @@
+import logging
+import math
+import threading
+from dataclasses import dataclass, replace
+from typing import Callable, Optional, Union
+
+from .constant import AccountData, Direction, PositionData, SymbolType
+
+RECONCILE_INTERVAL_SEC = 60
+DRIFT_REL_TOL = 1e-6
+
+
+@dataclass(slots=True)
+class Drift:
+    """
+    Difference between the cached state and a REST snapshot
+    """
+    kind: str  # 'account' or 'position'
+    key: str
+    field: str
+    cached: Optional[float]
+    actual: Optional[float]
+
+
+# on_drift(drifts)
+DriftCallback = Callable[[list[Drift]], None]
+
+
+def _is_close(a: Optional[float], b: Optional[float]) -> bool:
+    if a is None or b is None:
+        return a is b
+    return math.isclose(a, b, rel_tol=DRIFT_REL_TOL, abs_tol=DRIFT_REL_TOL)
+
+
+# 参与变化判断的字段, equity和unrealized_pnl随标记价格变动, 只更新数值不产生新版本
+def _account_state(account: AccountData) -> tuple:
+    return account.account_id, account.balance
+
+
+def _position_state(position: PositionData) -> tuple:
+    return position.cc_symbol, position.direction, position.size, position.price
+
+
+class AccountStateCache:
+    """
+    In-memory account and position state
+
+    * Updated from user data stream events (update_accounts / update_positions) or fills (apply_fill)
+    * Reconciled with query_account_and_position every reconcile_interval seconds, drifts are reported to on_drift
+    * Every change bumps a version number, changes_since(version) returns only the entries changed after it.
+      Equity and unrealized pnl follow mark prices, they are kept up to date but do not count as changes
+    * Account keys and position keys follow BinanceGateway.query_account / query_position
+    """
+
+    def __init__(self,
+                 gateway,
+                 sym_type: Union[SymbolType, list[SymbolType]],
+                 reconcile_interval: float = RECONCILE_INTERVAL_SEC,
+                 on_drift: Optional[DriftCallback] = None):
+        self.gateway = gateway
+        self.sym_type = sym_type
+        self.reconcile_interval = reconcile_interval
+        if on_drift is not None:
+            self.on_drift = on_drift
+
+        self.version = 0
+        self._synced = False  # 是否已完成首次REST同步
+        self._lock = threading.Lock()
+        self._accounts: dict[str, AccountData] = dict()
+        self._positions: dict[str, PositionData] = dict()
+        self._account_versions: dict[str, int] = dict()
+        self._position_versions: dict[str, int] = dict()
+
+        self._active = False
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def attach(self, user_ws):
+        """
+        Feed account and position events of a BinanceUserWs into the cache
+        """
+        user_ws.on_account = self.update_accounts
+        user_ws.on_position = self.update_positions
+
+    def _set_account(self, key: str, account: AccountData):
+        old = self._accounts.get(key)
+        self._accounts[key] = account
+        if old is None or _account_state(old) != _account_state(account):
+            self.version += 1
+            self._account_versions[key] = self.version
+
+    def _set_position(self, key: str, position: PositionData):
+        old = self._positions.get(key)
+        self._positions[key] = position
+        if old is None or _position_state(old) != _position_state(position):
+            self.version += 1
+            self._position_versions[key] = self.version
+
+    def update_accounts(self, accounts: dict[str, AccountData]):
+        with self._lock:
+            for key, account in accounts.items():
+                self._set_account(key, account)
+
+    def update_positions(self, positions: dict[str, PositionData]):
+        with self._lock:
+            for key, position in positions.items():
+                self._set_position(key, position)
+
+    def apply_fill(self, cc_symbol: str, direction: Direction, size: float, price: float):
+        """
+        Update the position of cc_symbol by one fill, entry price is averaged when the position increases
+        """
+        signed = size if direction == Direction.LONG else -size
+        with self._lock:
+            old = self._positions.get(cc_symbol)
+            old_size = old.size if old is not None else 0.
+            new_size = old_size + signed
+            entry = old.price if old is not None else 0.
+            if old_size == 0 or old_size * new_size < 0:  # 新开仓或反向开仓
+                entry = price
+            elif abs(new_size) > abs(old_size):
+                entry = (entry * abs(old_size) + price * size) / abs(new_size)
+            new_dir = None if new_size == 0 else (Direction.LONG if new_size > 0 else Direction.SHORT)
+            if old is None:
+                position = PositionData(cc_symbol=cc_symbol, direction=new_dir, size=new_size, price=entry)
+            else:
+                position = replace(old, direction=new_dir, size=new_size, price=entry)
+            self._set_position(cc_symbol, position)
+
+    def accounts(self) -> dict[str, AccountData]:
+        with self._lock:
+            return dict(self._accounts)
+
+    def positions(self) -> dict[str, PositionData]:
+        with self._lock:
+            return dict(self._positions)
+
+    def get_account(self, key: str) -> Optional[AccountData]:
+        return self._accounts.get(key)
+
+    def get_position(self, cc_symbol: str) -> Optional[PositionData]:
+        return self._positions.get(cc_symbol)
+
+    def changes_since(self, version: int) -> tuple[int, dict[str, AccountData], dict[str, PositionData]]:
+        """
+        Return (current version, accounts changed after version, positions changed after version)
+        """
+        with self._lock:
+            accounts = {k: self._accounts[k] for k, v in self._account_versions.items() if v > version}
+            positions = {k: self._positions[k] for k, v in self._position_versions.items() if v > version}
+            return self.version, accounts, positions
+
+    def reconcile(self) -> list[Drift]:
+        """
+        Compare the cache with a REST snapshot, replace drifted entries and report drifts
+        Equity and unrealized pnl move with mark prices, so only balances and position sizes are checked
+        """
+        accounts, positions = self.gateway.query_account_and_position(self.sym_type)
+        drifts = []
+        with self._lock:
+            # 用户数据流的事件可能先于首次快照到达, 因此不能用version判断
+            first_sync = not self._synced
+            self._synced = True
+            for key, account in accounts.items():
+                old = self._accounts.get(key)
+                cached = old.balance if old is not None else None
+                if not _is_close(cached, account.balance) and not (old is None and account.balance == 0):
+                    drifts.append(Drift('account', key, 'balance', cached, account.balance))
+                self._set_account(key, account)
+
+            for key, position in positions.items():
+                old = self._positions.get(key)
+                cached = old.size if old is not None else 0.
+                if not _is_close(cached, position.size):
+                    drifts.append(Drift('position', key, 'size', cached, position.size))
+                self._set_position(key, position)
+
+            for key, old in self._positions.items():
+                if key not in positions and old.size != 0:
+                    drifts.append(Drift('position', key, 'size', old.size, 0.))
+                    self._set_position(key, replace(old, direction=None, size=0.))
+
+        if first_sync:  # 首次加载不视为偏差
+            return []
+        if drifts:
+            self.on_drift(drifts)
+        return drifts
+
+    def on_drift(self, drifts: list[Drift]):
+        """
+        Drift callback
+        """
+        for d in drifts:
+            logging.warning(f'State drift {d.kind} {d.key} {d.field}: cached={d.cached}, actual={d.actual}')
+
+    def _run(self):
+        while self._active:
+            try:
+                self.reconcile()
+            except Exception as e:
+                logging.warning(f'Failed to reconcile account state: {e}')
+            self._stop_event.wait(self.reconcile_interval)
+
+    def start(self):
+        """
+        Load the initial snapshot and start periodic reconciliation
+        """
+        self._active = True
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name='account_reconcile', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._active = False
+        self._stop_event.set()
@@ -0,0 +1,313 @@
+"""
+Historical data from the Binance public data archives (data.binance.vision)
+
+Archives are zipped CSVs, one per symbol and day or month:
+<market>/<daily|monthly>/klines/<SYMBOL>/<interval>/<SYMBOL>-<interval>-<YYYY-MM[-DD]>.zip
+<market>/<daily|monthly>/<aggTrades|fundingRate>/<SYMBOL>/<SYMBOL>-<data type>-<YYYY-MM[-DD]>.zip
+
+Files are cached under a local root with the same layout, a root prepared beforehand works without network.
+"""
+import logging
+import os
+import shutil
+import time
+import urllib.error
+import urllib.request
+import zipfile
+from datetime import datetime, timezone
+from typing import Callable, Optional
+
+import numpy as np
+import pandas as pd
+
+from .binance import BinanceGateway, parse_funding_arrays
+from .candle import CANDLE_COLUMNS, CANDLE_DTYPES, KLINE_FIELD_INDEX, format_candle_arrays
+from .candle_cache import concat_candle_arrays, slice_candle_arrays
+from .constant import SymbolType
+from .util import ms_to_datetime
+
+ARCHIVE_BASE_URL = 'https://data.binance.vision/data'
+ARCHIVE_TIMEOUT_SEC = 30
+DAY_MS = 86400000
+ARCHIVE_START_MS = 1498867200000  # 2017-07-01, 最早的归档月份之前
+# 新版现货归档的时间戳为微秒, 大于该值的时间戳按微秒处理
+MICROSECOND_THRESHOLD = 10**14
+
+ARCHIVE_MARKETS: dict[SymbolType, str] = {
+    SymbolType.SPOT: 'spot',
+    SymbolType.FUTURES_USDT: 'futures/um',
+    SymbolType.SWAP_USDT: 'futures/um',
+    SymbolType.FUTURES_COIN: 'futures/cm',
+    SymbolType.SWAP_COIN: 'futures/cm',
+}
+
+# 资金费率只有月度归档
+DAILY_DATA_TYPES = ('klines', 'aggTrades')
+
+AGG_TRADE_COLUMNS = ['agg_id', 'price', 'size', 'first_trade_id', 'last_trade_id', 'trade_time', 'is_buyer_maker']
+AGG_TRADE_DTYPES = [np.int64, np.float64, np.float64, np.int64, np.int64, np.int64, bool]
+
+# (period, 日期字符串, 起始ms, 结束ms), period为daily或monthly
+ArchivePeriod = tuple[str, str, int, int]
+
+
+def get_archive_path(sym_type: SymbolType, period: str, data_type: str, exg_symbol: str, date: str,
+                     timeframe: Optional[str] = None) -> str:
+    """
+    Relative path of an archive, shared by the download url and the local cache
+    """
+    market = ARCHIVE_MARKETS[sym_type]
+    if data_type == 'klines':
+        return f'{market}/{period}/klines/{exg_symbol}/{timeframe}/{exg_symbol}-{timeframe}-{date}.zip'
+    return f'{market}/{period}/{data_type}/{exg_symbol}/{exg_symbol}-{data_type}-{date}.zip'
+
+
+def _ms(dt: datetime) -> int:
+    return int(dt.timestamp() * 1000)
+
+
+def _month_start(ms: int) -> datetime:
+    dt = datetime.fromtimestamp(ms / 1000, tz=timezone.utc)
+    return datetime(dt.year, dt.month, 1, tzinfo=timezone.utc)
+
+
+def _next_month(dt: datetime) -> datetime:
+    return datetime(dt.year + dt.month // 12, dt.month % 12 + 1, 1, tzinfo=timezone.utc)
+
+
+def plan_archive_periods(start_ms: int, end_ms: int, closed_ms: int, daily: bool = True) -> list[ArchivePeriod]:
+    """
+    Archives overlapping [start_ms, min(end_ms, closed_ms))
+    Whole months use monthly archives, partial months use daily ones (monthly ones if daily is False)
+    """
+    end_ms = min(end_ms, closed_ms)
+    periods = []
+    month = _month_start(start_ms)
+    while _ms(month) < end_ms:
+        month_begin, month_end = _ms(month), _ms(_next_month(month))
+        if month_end <= closed_ms and (not daily or (start_ms <= month_begin and month_end <= end_ms)):
+            periods.append(('monthly', month.strftime('%Y-%m'), month_begin, month_end))
+        elif daily:
+            periods.extend(plan_daily_periods(max(start_ms, month_begin), min(end_ms, month_end)))
+        month = _next_month(month)
+    return periods
+
+
+def plan_daily_periods(start_ms: int, end_ms: int) -> list[ArchivePeriod]:
+    periods = []
+    for day_ms in range(start_ms // DAY_MS * DAY_MS, end_ms, DAY_MS):
+        date = datetime.fromtimestamp(day_ms / 1000, tz=timezone.utc).strftime('%Y-%m-%d')
+        periods.append(('daily', date, day_ms, day_ms + DAY_MS))
+    return periods
+
+
+def read_archive_csv(path: str, dtypes: dict[int, type], **kwargs) -> pd.DataFrame:
+    """
+    Read the given columns of every CSV member of a zip archive with typed columns, header rows are skipped
+    The members are parsed straight from the zip by pandas, no row of strings is materialized
+    """
+    frames = []
+    with zipfile.ZipFile(path) as zf:
+        for name in zf.namelist():
+            with zf.open(name) as f:
+                first = f.peek(1)[:1]
+                if not first:
+                    continue
+                # 新版归档的第一行为表头
+                skiprows = 0 if first.isdigit() else 1
+                frames.append(pd.read_csv(f, header=None, skiprows=skiprows, usecols=list(dtypes), dtype=dtypes,
+                                          **kwargs))
+    if not frames:
+        return pd.DataFrame({i: pd.Series([], dtype=dtype) for i, dtype in dtypes.items()})
+    return frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
+
+
+def normalize_ms(values: np.ndarray) -> np.ndarray:
+    """
+    Convert microsecond timestamps to milliseconds, millisecond ones are kept
+    """
+    return np.where(values >= MICROSECOND_THRESHOLD, values // 1000, values)
+
+
+def parse_kline_archive(path: str) -> dict[str, np.ndarray]:
+    """
+    Kline archive to the candle columns of query_candle(fmt='numpy')
+    """
+    df = read_archive_csv(path, {KLINE_FIELD_INDEX[col]: CANDLE_DTYPES[col] for col in CANDLE_COLUMNS})
+    arrays = {col: df[KLINE_FIELD_INDEX[col]].to_numpy() for col in CANDLE_COLUMNS}
+    for col in ('candle_begin_time', 'candle_end_time'):
+        arrays[col] = normalize_ms(arrays[col])
+    return arrays
+
+
+def parse_agg_trade_archive(path: str) -> dict[str, np.ndarray]:
+    """
+    aggTrades archive to columns named after decoder.AggTradeEvent
+    """
+    df = read_archive_csv(path, dict(enumerate(AGG_TRADE_DTYPES)), true_values=['true', 'True'],
+                          false_values=['false', 'False'])
+    arrays = {col: df[i].to_numpy() for i, col in enumerate(AGG_TRADE_COLUMNS)}
+    arrays['trade_time'] = normalize_ms(arrays['trade_time'])
+    return arrays
+
+
+def parse_funding_archive(path: str) -> dict[str, np.ndarray]:
+    """
+    fundingRate archive (calc_time, funding_interval_hours, last_funding_rate) to query_funding_history columns
+    """
+    df = read_archive_csv(path, {0: np.int64, 2: np.float64})
+    times, rates = normalize_ms(df[0].to_numpy()), df[2].to_numpy()
+    order = np.argsort(times, kind='stable')
+    return {'funding_time_ms': times[order], 'rate': rates[order]}
+
+
+def empty_agg_trade_arrays() -> dict[str, np.ndarray]:
+    return {col: np.empty(0, dtype=dtype) for col, dtype in zip(AGG_TRADE_COLUMNS, AGG_TRADE_DTYPES)}
+
+
+def concat_arrays(arrays: list[dict[str, np.ndarray]], columns: list[str], time_col: str, start_ms: int,
+                  end_ms: int) -> dict[str, np.ndarray]:
+    """
+    Concatenate columns, sort by time_col and keep start_ms <= time_col < end_ms
+    """
+    merged = {col: np.concatenate([a[col] for a in arrays]) for col in columns}
+    t = merged[time_col]
+    idx = np.flatnonzero((t >= start_ms) & (t < end_ms))
+    idx = idx[np.argsort(t[idx], kind='stable')]
+    return {col: merged[col][idx] for col in columns}
+
+
+class ArchiveStore:
+    """
+    Local mirror of data.binance.vision, archives are downloaded on first use when download is True
+    Archives which do not exist (not published yet, or before listing) are remembered and not requested again
+    """
+
+    def __init__(self, root_dir: str, base_url: str = ARCHIVE_BASE_URL, download: bool = True):
+        self.root_dir = root_dir
+        self.base_url = base_url.rstrip('/')
+        self.download = download
+        self._missing: set[str] = set()
+
+    def get(self, rel_path: str) -> Optional[str]:
+        """
+        Local path of an archive, None if it does not exist
+        """
+        path = os.path.join(self.root_dir, rel_path)
+        if os.path.exists(path):
+            return path
+        if not self.download or rel_path in self._missing:
+            return None
+
+        url = f'{self.base_url}/{rel_path}'
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        try:
+            with urllib.request.urlopen(url, timeout=ARCHIVE_TIMEOUT_SEC) as resp, open(path + '.tmp', 'wb') as f:
+                shutil.copyfileobj(resp, f)
+        except (urllib.error.URLError, OSError) as e:
+            # 网络错误或超时时按缺失处理, 由调用方改用REST补齐
+            if os.path.exists(path + '.tmp'):
+                os.remove(path + '.tmp')
+            if isinstance(e, urllib.error.HTTPError) and e.code == 404:
+                self._missing.add(rel_path)
+            else:
+                logging.warning(f'Failed to download {url}: {e}')
+            return None
+        os.replace(path + '.tmp', path)
+        return path
+
+
+class ArchiveLoader:
+    """
+    Load history from archives and fetch only what no archive covers through REST
+
+    * query_candle returns the same output as BinanceGateway.query_candle
+    * Every range without an archive, the not yet archived tail as well as holes in the middle, is fetched through
+      REST, adjacent ranges in one query, gateway None disables the fallback
+    * A monthly archive which is missing for the latest closed month is replaced by its daily archives
+    """
+
+    def __init__(self, store: ArchiveStore, gateway: Optional[BinanceGateway] = None):
+        self.store = store
+        self.gateway = gateway
+
+    def _load(self, cc_symbol: str, data_type: str, start_ms: int, end_ms: int, parser: Callable[[str], dict],
+              timeframe: Optional[str] = None) -> tuple[list[dict[str, np.ndarray]], list[tuple[int, int]]]:
+        """
+        Parsed archives overlapping [start_ms, end_ms) and the (start_ms, end_ms) ranges no archive covers
+        """
+        exg_symbol, sym_type = BinanceGateway.convert_symbol_cc_to_exg(cc_symbol)
+        start_ms = max(start_ms, ARCHIVE_START_MS)
+        closed_ms = int(time.time() * 1000) // DAY_MS * DAY_MS
+        daily = data_type in DAILY_DATA_TYPES
+        periods = plan_archive_periods(start_ms, end_ms, closed_ms, daily)
+
+        arrays: list[dict[str, np.ndarray]] = []
+        missing: list[tuple[int, int]] = []
+
+        def add_missing(lo: int, hi: int):
+            lo, hi = max(lo, start_ms), min(hi, end_ms)
+            if lo >= hi:
+                return
+            if missing and missing[-1][1] >= lo:  # 与上一段相连则合并, 减少REST查询次数
+                missing[-1] = (missing[-1][0], max(missing[-1][1], hi))
+            else:
+                missing.append((lo, hi))
+
+        for i, (period, date, period_start, period_end) in enumerate(periods):
+            path = self.store.get(get_archive_path(sym_type, period, data_type, exg_symbol, date, timeframe))
+            if path is not None:
+                arrays.append(parser(path))
+                continue
+            # 月度归档在次月初才发布, 最近一个月用日度归档补齐
+            is_last_month = not any(p[0] == 'monthly' for p in periods[i + 1:])
+            if period == 'monthly' and daily and is_last_month:
+                for _, day, day_start, day_end in plan_daily_periods(max(start_ms, period_start),
+                                                                     min(end_ms, period_end)):
+                    path = self.store.get(get_archive_path(sym_type, 'daily', data_type, exg_symbol, day, timeframe))
+                    if path is None:
+                        add_missing(day_start, day_end)
+                    else:
+                        arrays.append(parser(path))
+            else:
+                add_missing(period_start, period_end)
+        # 尚未归档的部分
+        add_missing(periods[-1][3] if periods else start_ms, end_ms)
+        return arrays, missing
+
+    def query_candle(self, cc_symbol: str, start: datetime, end: datetime, timeframe: str, fmt: str = 'list'):
+        """
+        Candles with start <= candle_begin_time < end, see BinanceGateway.query_candle for fmt
+        """
+        start_ms, end_ms = int(start.timestamp()) * 1000, int(end.timestamp()) * 1000
+        arrays, missing = self._load(cc_symbol, 'klines', start_ms, end_ms, parse_kline_archive, timeframe)
+        if self.gateway is not None:
+            for lo, hi in missing:
+                rest_start, rest_end = ms_to_datetime(lo), ms_to_datetime(hi)
+                arrays.append(self.gateway.query_candle(cc_symbol, rest_start, rest_end, timeframe, fmt='numpy'))
+        return format_candle_arrays(slice_candle_arrays(concat_candle_arrays(arrays), start_ms, end_ms), fmt)
+
+    def query_agg_trades(self, cc_symbol: str, start: datetime, end: datetime) -> dict[str, np.ndarray]:
+        """
+        Aggregated trades with start <= trade_time < end, archives only
+        """
+        start_ms, end_ms = _ms(start), _ms(end)
+        arrays, _ = self._load(cc_symbol, 'aggTrades', start_ms, end_ms, parse_agg_trade_archive)
+        if not arrays:
+            return empty_agg_trade_arrays()
+        return concat_arrays(arrays, AGG_TRADE_COLUMNS, 'trade_time', start_ms, end_ms)
+
+    def query_funding_history(self, cc_symbol: str, start_ms: int = 0,
+                              end_ms: Optional[int] = None) -> dict[str, np.ndarray]:
+        """
+        Same columns as BinanceGateway.query_funding_history, the current month and missing months come from REST
+        """
+        if end_ms is None:
+            end_ms = int(time.time() * 1000)
+        arrays, missing = self._load(cc_symbol, 'fundingRate', start_ms, end_ms, parse_funding_archive)
+        if self.gateway is not None:
+            for lo, hi in missing:
+                arrays.append(self.gateway.query_funding_history(cc_symbol, lo, hi))
+        if not arrays:
+            return parse_funding_arrays([])
+        return concat_arrays(arrays, ['funding_time_ms', 'rate'], 'funding_time_ms', start_ms, end_ms)
@@ -0,0 +1,108 @@
+from dataclasses import fields
+from typing import Iterator, Union
+
+import numpy as np
+import pandas as pd
+
+from .constant import OrderData
+
+
+class RowView:
+    """
+    Lightweight read-only view of one row of a ColumnBatch, holds only the columns and the row number
+    """
+    __slots__ = ('_columns', '_i')
+
+    COLUMNS: list[str] = []
+
+    def __init__(self, columns: dict[str, np.ndarray], i: int):
+        self._columns = columns
+        self._i = i
+
+    def __repr__(self) -> str:
+        values = ', '.join(f'{col}={getattr(self, col)!r}' for col in self.COLUMNS)
+        return f'{type(self).__name__}({values})'
+
+
+def make_row_view(name: str, columns: list[str]) -> type:
+    namespace = {'__slots__': (), 'COLUMNS': columns}
+    for col in columns:
+        namespace[col] = property(lambda self, col=col: self._columns[col][self._i])
+    return type(name, (RowView, ), namespace)
+
+
+class ColumnBatch:
+    """
+    Array-backed container of many records, one np.ndarray per column
+
+    * batch[i] returns a row view exposing the columns as attributes
+    * batch[slice], batch[bool mask] and batch[index array] return a new batch
+    """
+
+    COLUMNS: list[str] = []
+    DTYPES: dict[str, type] = {}
+    ROW: type = RowView
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.ROW = make_row_view(f'{cls.__name__}Row', cls.COLUMNS)
+
+    def __init__(self, columns: dict[str, np.ndarray]):
+        self.columns = columns
+
+    @classmethod
+    def empty(cls):
+        return cls({col: np.empty(0, dtype=cls.DTYPES.get(col, object)) for col in cls.COLUMNS})
+
+    def __len__(self) -> int:
+        return len(self.columns[self.COLUMNS[0]])
+
+    def __getitem__(self, key: Union[int, slice, np.ndarray]):
+        if isinstance(key, (int, np.integer)):
+            if key < 0:
+                key += len(self)
+            if not 0 <= key < len(self):
+                raise IndexError(key)
+            return self.ROW(self.columns, key)
+        return type(self)({col: arr[key] for col, arr in self.columns.items()})
+
+    def __iter__(self) -> Iterator[RowView]:
+        for i in range(len(self)):
+            yield self.ROW(self.columns, i)
+
+    def __getattr__(self, name: str) -> np.ndarray:
+        columns = self.__dict__.get('columns')
+        if columns is not None and name in columns:
+            return columns[name]
+        raise AttributeError(name)
+
+    def to_df(self) -> pd.DataFrame:
+        return pd.DataFrame(self.columns, columns=self.COLUMNS)
+
+
+ORDER_COLUMNS: list[str] = [f.name for f in fields(OrderData)]
+
+ORDER_DTYPES: dict[str, type] = {
+    col: np.float64 if col in ('price', 'size', 'filled_price', 'filled_size') else
+    np.int64 if col == 'timestamp_ms' else object
+    for col in ORDER_COLUMNS
+}
+
+
+class OrderBatch(ColumnBatch):
+    """
+    Array-backed orders, columns follow the fields of OrderData
+    """
+    COLUMNS = ORDER_COLUMNS
+    DTYPES = ORDER_DTYPES
+
+    @classmethod
+    def from_orders(cls, orders: list[OrderData]) -> 'OrderBatch':
+        if not orders:
+            return cls.empty()
+        columns = {col: [getattr(o, col) for o in orders] for col in cls.COLUMNS}
+        return cls({col: np.array(values, dtype=cls.DTYPES[col]) for col, values in columns.items()})
+
+    def to_list(self) -> list[OrderData]:
+        columns = [self.columns[col].tolist() for col in self.COLUMNS]
+        return [OrderData(*row) for row in zip(*columns)]
@@ -1,18 +1,37 @@
+import logging
 import math
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import ContextVar
 from datetime import datetime
-from typing import Optional, Union
+from typing import Mapping, Optional, Union
 
 import ccxt
+import numpy as np
 import pandas as pd
 
+from .candle import CandleBatch, format_candle_arrays, format_candles, parse_candle_arrays
+from .candle_cache import CandleCache
 from .constant import (EXCHANGE_TIMEOUT_MS, AccountData, CandleData, Direction, OrderbookData, OrderData, OrderStatus,
                         OrderType, PositionData, SymbolData, SymbolType)
-from .util import (floor_to_tick, get_timeframe_delta, retry_getter, round_to_tick)
+from .metrics import METRICS
+from .rate_limit import (BAN_SECONDS, Priority, RequestScheduler, get_api_family, get_endpoint_bucket,
+                         get_endpoint_weight)
+from .symbol_index import MARKET_COIN, MARKET_SPOT, MARKET_USDT, SYMTYPE_TO_MARKET, SymbolIndex
+from .symbol_store import SymbolStore
+from .util import get_timeframe_delta, ms_to_datetime_index, quantize_to_ticks, retry_getter, ticks_to_str
 
 SPOT_QUOTES = ['USDT', 'BUSD', 'TUSD', 'USDC', 'BKRW']
 
 SymTypeOrList = Union[SymbolType, list[SymbolType]]
 
+# 进程内共享的symbol双向索引, 由exchangeInfo构建, 未收录的symbol按字符串规则解析且不缓存
+SYMBOL_INDEX = SymbolIndex()
+
+# 当前线程(或协程)最近一次REST响应的headers, 同一ccxt实例被多个线程共用时last_response_headers可能属于其他请求
+RESPONSE_HEADERS: ContextVar[Optional[Mapping[str, str]]] = ContextVar('response_headers', default=None)
+NO_RETRY_ERRORS = (ccxt.BadSymbol, )  # 重试无法恢复的错误, 直接抛出
+
 ORDERTYPE_CC2EXG: dict[OrderType, tuple[str, str]] = {
     OrderType.LIMIT: ("LIMIT", "GTC"),
     OrderType.IOC: ("LIMIT", "IOC"),
@@ -31,6 +50,34 @@ MAX_CANDLES: dict[SymbolType, int] = {
     SymbolType.SWAP_USDT: 1500
 }
 
+SPOT_KLINE_WEIGHT = 2
+FUTURES_KLINE_WEIGHT: list[tuple[int, int]] = [(99, 1), (499, 2), (1000, 5), (1500, 10)]  # (limit 上限(含), 权重)
+SPOT_DEPTH_WEIGHT: list[tuple[int, int]] = [(100, 5), (500, 25), (1000, 50), (5000, 250)]
+FUTURES_DEPTH_WEIGHT: list[tuple[int, int]] = [(50, 2), (100, 5), (500, 10), (1000, 20)]
+CANDLE_INFLIGHT_WEIGHT = 40  # 并发下载K线时, 同时在途请求的权重上限
+FUNDING_PAGE_LIMIT = 1000  # 资金费率历史每页的最大条数
+
+BATCH_ORDER_NUM = 5  # 批量下单的数量
+SPOT_ORDER_METHOD = 'privatePostOrder'
+ORDER_WORKERS = 16  # 并发下单线程数
+
+# 各市场 (当前挂单, 全部订单) 查询方法
+ORDER_LIST_METHODS: dict[str, tuple[str, str]] = {
+    MARKET_SPOT: ('privateGetOpenOrders', 'privateGetAllOrders'),
+    MARKET_USDT: ('fapiPrivateGetOpenOrders', 'fapiPrivateGetAllOrders'),
+    MARKET_COIN: ('dapiPrivateGetOpenOrders', 'dapiPrivateGetAllOrders'),
+}
+# 指定symbol时当前挂单查询的权重, 不指定symbol时见ENDPOINT_WEIGHTS
+OPEN_ORDERS_SYMBOL_WEIGHT: dict[str, int] = {MARKET_SPOT: 6, MARKET_USDT: 1, MARKET_COIN: 1}
+ALL_ORDERS_LIMIT = 1000
+
+# 用户数据流listenKey的 (创建, 延期) 方法
+LISTEN_KEY_METHODS: dict[str, tuple[str, str]] = {
+    MARKET_SPOT: ('publicPostUserDataStream', 'publicPutUserDataStream'),
+    MARKET_USDT: ('fapiPrivatePostListenKey', 'fapiPrivatePutListenKey'),
+    MARKET_COIN: ('dapiPrivatePostListenKey', 'dapiPrivatePutListenKey'),
+}
+
 TRANSFER_WALLET_CC2EXG: dict[SymbolType, str] = {
     SymbolType.SPOT: 'MAIN',
     SymbolType.FUTURES_COIN: 'CMFUTURE',
@@ -45,20 +92,80 @@ STATUS_EXG2CC: dict[str, OrderStatus] = {
     "FILLED": OrderStatus.FULLY_FILLED,
     "CANCELED": OrderStatus.CANCELED,
     "REJECTED": OrderStatus.REJECTED,
-    "EXPIRED": OrderStatus.CANCELED
+    "EXPIRED": OrderStatus.CANCELED,
+    "EXPIRED_IN_MATCH": OrderStatus.CANCELED,  # 现货自成交保护
+    "PENDING_NEW": OrderStatus.SUBMITTING,
+    "PENDING_CANCEL": OrderStatus.CANCELING,
+    "NEW_INSURANCE": OrderStatus.OPEN,  # 强平接管
+    "NEW_ADL": OrderStatus.OPEN,  # 自动减仓
 }
+UNKNOWN_STATUS = OrderStatus.OPEN  # 未知状态按挂单处理, 订单继续被跟踪
 
 
 class BinanceGateway:
     CLS_ID = 'BA'
 
-    def __init__(self, apiKey=None, secret=None):
+    def __init__(self,
+                 apiKey=None,
+                 secret=None,
+                 candle_cache_dir: Optional[str] = None,
+                 symbol_snapshot_dir: Optional[str] = None,
+                 scheduler: Optional[RequestScheduler] = None):
+        # 同一IP下的多个gateway应共享同一个scheduler
+        self.scheduler = scheduler if scheduler is not None else RequestScheduler()
+        self.candle_cache = CandleCache(candle_cache_dir) if candle_cache_dir is not None else None
+        # 限频只由scheduler负责, ccxt自带的节流不区分优先级, 会让下单排在批量K线请求之后
         self.exg = ccxt.binance({
             'apiKey': apiKey,
             'secret': secret,
             'timeout': EXCHANGE_TIMEOUT_MS,
+            'enableRateLimit': False,
         })
-        self.sym_info = self.query_symbol([SymbolType.SWAP_COIN, SymbolType.SWAP_USDT, SymbolType.SPOT])
+        capture_response_headers(self.exg)
+        self._executor = ThreadPoolExecutor(max_workers=ORDER_WORKERS, thread_name_prefix='binance_order')
+        # 合约信息按需加载, 指定symbol_snapshot_dir时落盘缓存
+        self.sym_info = SymbolStore(self._query_symbol_records, parse_symbol, symbol_snapshot_dir, index=SYMBOL_INDEX)
+
+    def _request(self,
+                 method: str,
+                 params: Optional[dict] = None,
+                 weight: Optional[int] = None,
+                 priority: Priority = Priority.QUERY,
+                 num_orders: int = 0):
+        """
+        Call a ccxt binance method through the rate limit scheduler, retry on errors
+        Records per endpoint rate limit wait, request latency (signing included), errors and retries
+        """
+        family = get_api_family(method)
+        weight = get_endpoint_weight(method) if weight is None else weight
+        bucket = get_endpoint_bucket(method)
+        func = getattr(self.exg, method)
+        attempts = [0]
+
+        def call():
+            attempts[0] += 1
+            if attempts[0] > 1:
+                METRICS.inc('rest_retries_total', endpoint=method)
+            t = time.perf_counter()
+            self.scheduler.acquire(family, weight, priority, num_orders, bucket)
+            RESPONSE_HEADERS.set(None)
+            t_sent = time.perf_counter()
+            METRICS.observe('rest_wait_seconds', t_sent - t, endpoint=method)
+            try:
+                return func() if params is None else func(params)
+            except ccxt.DDoSProtection:  # 429 / 418
+                headers = RESPONSE_HEADERS.get() or {}
+                self.scheduler.pause(family, float(headers.get('Retry-After', BAN_SECONDS)))
+                METRICS.inc('rest_errors_total', endpoint=method, error='rate_limit')
+                raise
+            except Exception as e:
+                METRICS.inc('rest_errors_total', endpoint=method, error=type(e).__name__)
+                raise
+            finally:
+                METRICS.observe('rest_latency_seconds', time.perf_counter() - t_sent, endpoint=method)
+                self.scheduler.update_from_headers(family, RESPONSE_HEADERS.get())
+
+        return retry_getter(call, no_retry=NO_RETRY_ERRORS)
 
     @staticmethod
     def convert_symbol_exg_to_cc(exg_symbol: str, sym_type: SymbolType) -> str:
@@ -75,21 +182,21 @@ class BinanceGateway:
         account = dict()
 
         if SymbolType.FUTURES_COIN in sym_type or SymbolType.SWAP_COIN in sym_type:
-            data = retry_getter(self.exg.dapiPrivate_get_account)
+            data = self._request('dapiPrivateGetAccount')
             for x in data['assets']:
                 acc_info = parse_account(x)
                 account[f'{x["asset"]}.{SymbolType.FUTURES_COIN.value}'] = acc_info
                 account[f'{x["asset"]}.{SymbolType.SWAP_COIN.value}'] = acc_info
 
         if SymbolType.FUTURES_USDT in sym_type or SymbolType.SWAP_USDT in sym_type:
-            data = retry_getter(self.exg.fapiPrivate_get_account)
+            data = self._request('fapiPrivateGetAccount')
             for x in data['assets']:
                 acc_info = parse_account(x)
                 account[f'{x["asset"]}.{SymbolType.FUTURES_USDT.value}'] = acc_info
                 account[f'{x["asset"]}.{SymbolType.SWAP_USDT.value}'] = acc_info
 
         if SymbolType.SPOT in sym_type:
-            data = retry_getter(self.exg.private_get_account)
+            data = self._request('privateGetAccount')
             for x in data['balances']:
                 acc_info = parse_account(x)
                 account[f'{x["asset"]}.{SymbolType.SPOT.value}'] = acc_info
@@ -103,13 +210,13 @@ class BinanceGateway:
         position = dict()
 
         if SymbolType.FUTURES_COIN in sym_type or SymbolType.SWAP_COIN in sym_type:
-            data = retry_getter(self.exg.dapiPrivate_get_positionrisk)
+            data = self._request('dapiPrivateGetPositionRisk')
             for x in data:
                 cc_symbol = convert_coin_symbol_exg_to_cc(x['symbol'])
                 position[cc_symbol] = parse_position(x, cc_symbol)
 
         if SymbolType.FUTURES_USDT in sym_type or SymbolType.SWAP_USDT in sym_type:
-            data = retry_getter(self.exg.fapiPrivate_get_positionrisk)
+            data = self._request('fapiPrivateGetPositionRisk')
             for x in data:
                 cc_symbol = convert_usdt_symbol_exg_to_cc(x['symbol'])
                 position[cc_symbol] = parse_position(x, cc_symbol)
@@ -128,7 +235,7 @@ class BinanceGateway:
             position.update(self.query_position([SymbolType.FUTURES_COIN, SymbolType.SWAP_COIN]))
 
         if SymbolType.FUTURES_USDT in sym_type or SymbolType.SWAP_USDT in sym_type:
-            data = retry_getter(self.exg.fapiPrivate_get_account)
+            data = self._request('fapiPrivateGetAccount')
             for x in data['assets']:
                 acc_info = parse_account(x)
                 account[f'{x["asset"]}.{SymbolType.FUTURES_USDT.value}'] = acc_info
@@ -143,14 +250,14 @@ class BinanceGateway:
 
         return account, position
 
-    def query_symbol(self, sym_type: SymTypeOrList) -> dict[str, SymbolData]:
-        if isinstance(sym_type, SymbolType):
-            sym_type = [sym_type]
-
-        symbol = dict()
+    def _query_symbol_records(self, market: str) -> dict[str, dict]:
+        """
+        Compact exchangeInfo records of one market, keyed by cc_symbol
+        """
+        records = dict()
 
-        if SymbolType.FUTURES_COIN in sym_type or SymbolType.SWAP_COIN in sym_type:
-            data = retry_getter(self.exg.dapiPublic_get_exchangeinfo)
+        if market == MARKET_COIN:
+            data = self._request('dapiPublicGetExchangeInfo')
             for x in data['symbols']:
                 if x['contractType'] == 'PERPETUAL':
                     type_ = SymbolType.SWAP_COIN
@@ -158,11 +265,11 @@ class BinanceGateway:
                     type_ = SymbolType.FUTURES_COIN
                 else:
                     continue
-                cc_symbol = self.convert_symbol_exg_to_cc(x['symbol'], type_)
-                symbol[cc_symbol] = parse_symbol(x, cc_symbol)
+                cc_symbol = SYMBOL_INDEX.add_record(x, type_)
+                records[cc_symbol] = compact_symbol_record(x)
 
-        if SymbolType.FUTURES_USDT in sym_type or SymbolType.SWAP_USDT in sym_type:
-            data = retry_getter(self.exg.fapiPublic_get_exchangeinfo)
+        if market == MARKET_USDT:
+            data = self._request('fapiPublicGetExchangeInfo')
             for x in data['symbols']:
                 if x['contractType'] == 'PERPETUAL':
                     type_ = SymbolType.SWAP_USDT
@@ -170,13 +277,26 @@ class BinanceGateway:
                     type_ = SymbolType.FUTURES_USDT
                 else:
                     continue
-                cc_symbol = self.convert_symbol_exg_to_cc(x['symbol'], type_)
-                symbol[cc_symbol] = parse_symbol(x, cc_symbol)
+                cc_symbol = SYMBOL_INDEX.add_record(x, type_)
+                records[cc_symbol] = compact_symbol_record(x)
 
-        if SymbolType.SPOT in sym_type:
-            data = retry_getter(self.exg.public_get_exchangeinfo)
+        if market == MARKET_SPOT:
+            data = self._request('publicGetExchangeInfo')
             for x in data['symbols']:
-                cc_symbol = self.convert_symbol_exg_to_cc(x['symbol'], SymbolType.SPOT)
+                cc_symbol = SYMBOL_INDEX.add_record(x, SymbolType.SPOT)
+                records[cc_symbol] = compact_symbol_record(x)
+
+        return records
+
+    def query_symbol(self, sym_type: SymTypeOrList) -> dict[str, SymbolData]:
+        if isinstance(sym_type, SymbolType):
+            sym_type = [sym_type]
+
+        symbol = dict()
+        for market in (MARKET_COIN, MARKET_USDT, MARKET_SPOT):
+            if not any(SYMTYPE_TO_MARKET.get(t) == market for t in sym_type):
+                continue
+            for cc_symbol, x in self._query_symbol_records(market).items():
                 symbol[cc_symbol] = parse_symbol(x, cc_symbol)
 
         return symbol
@@ -187,29 +307,73 @@ class BinanceGateway:
         params = {'symbol': exg_sym, 'orderId': order_id}
 
         if sym_type == SymbolType.FUTURES_COIN or sym_type == SymbolType.SWAP_COIN:
-            data = retry_getter(lambda: self.exg.dapiPrivate_get_order(params))
+            data = self._request('dapiPrivateGetOrder', params)
 
         if sym_type == SymbolType.FUTURES_USDT or sym_type == SymbolType.SWAP_USDT:
-            data = retry_getter(lambda: self.exg.fapiPrivate_get_order(params))
+            data = self._request('fapiPrivateGetOrder', params)
 
         if sym_type == SymbolType.SPOT:
             if cliend_order_id is not None:
                 params = {'symbol': exg_sym, 'origClientOrderId': cliend_order_id}
-            data = retry_getter(lambda: self.exg.private_get_order(params))
+            data = self._request('privateGetOrder', params)
         return parse_order(data, cc_symbol, 'query')
 
-    def query_orderbook(self, cc_symbol: str, limit=50) -> OrderbookData:
+    def query_open_orders(self, market: str, cc_symbol: Optional[str] = None) -> list[OrderData]:
+        """
+        Open orders of one market (spot / usdt / coin), of all symbols in one request if cc_symbol is None
+        """
+        method = ORDER_LIST_METHODS[market][0]
+        if cc_symbol is None:
+            data = self._request(method)
+            return [parse_order(x, convert_market_symbol_exg_to_cc(x['symbol'], market), 'query') for x in data]
+        exg_sym, _ = self.convert_symbol_cc_to_exg(cc_symbol)
+        data = self._request(method, {'symbol': exg_sym}, weight=OPEN_ORDERS_SYMBOL_WEIGHT[market])
+        return [parse_order(x, cc_symbol, 'query') for x in data]
+
+    def query_all_orders(self, cc_symbol: str, from_order_id: Optional[str] = None) -> list[OrderData]:
+        """
+        Orders of cc_symbol in any status, starting from from_order_id if given, up to ALL_ORDERS_LIMIT orders
+        """
+        exg_sym, sym_type = self.convert_symbol_cc_to_exg(cc_symbol)
+        params = {'symbol': exg_sym, 'limit': ALL_ORDERS_LIMIT}
+        if from_order_id is not None:
+            params['orderId'] = from_order_id
+        data = self._request(ORDER_LIST_METHODS[SYMTYPE_TO_MARKET[sym_type]][1], params)
+        return [parse_order(x, cc_symbol, 'query') for x in data]
+
+    def create_listen_key(self, market: str) -> str:
+        """
+        Create or reuse the user data stream listenKey of the market (spot / usdt / coin)
+        """
+        data = self._request(LISTEN_KEY_METHODS[market][0])
+        return data['listenKey']
+
+    def keepalive_listen_key(self, market: str, listen_key: str):
+        """
+        Extend the listenKey for 60 minutes, futures keys are bound to the account so no key is sent
+        """
+        params = {'listenKey': listen_key} if market == MARKET_SPOT else None
+        self._request(LISTEN_KEY_METHODS[market][1], params)
+
+    def query_depth_snapshot(self, cc_symbol: str, limit=1000) -> dict:
+        """
+        Raw depth snapshot with lastUpdateId, used to initialize local order books
+        """
         exg_sym, sym_type = self.convert_symbol_cc_to_exg(cc_symbol)
         params = {'symbol': exg_sym, 'limit': limit}
+        weight = get_depth_weight(sym_type, limit)
 
         if sym_type == SymbolType.FUTURES_COIN or sym_type == SymbolType.SWAP_COIN:
-            data = retry_getter(lambda: self.exg.dapiPublic_get_depth(params))
+            return self._request('dapiPublicGetDepth', params, weight=weight)
 
         if sym_type == SymbolType.FUTURES_USDT or sym_type == SymbolType.SWAP_USDT:
-            data = retry_getter(lambda: self.exg.fapiPublic_get_depth(params))
+            return self._request('fapiPublicGetDepth', params, weight=weight)
 
         if sym_type == SymbolType.SPOT:
-            data = retry_getter(lambda: self.exg.public_get_depth(params))
+            return self._request('publicGetDepth', params, weight=weight)
+
+    def query_orderbook(self, cc_symbol: str, limit=50) -> OrderbookData:
+        data = self.query_depth_snapshot(cc_symbol, limit)
 
         ask_prices, ask_sizes = list(zip(*data['asks']))
         bid_prices, bid_sizes = list(zip(*data['bids']))
@@ -221,51 +385,109 @@ class BinanceGateway:
 
         return OrderbookData(ask_prices=ask_prices, ask_sizes=ask_sizes, bid_prices=bid_prices, bid_sizes=bid_sizes)
 
-    def query_candle(self, cc_symbol: str, start: datetime, end: datetime, timeframe: str) -> list[CandleData]:
+    def _get_klines(self, sym_type: SymbolType, params: dict) -> list:
+        weight = get_kline_weight(sym_type, params['limit'])
+        if sym_type == SymbolType.FUTURES_COIN or sym_type == SymbolType.SWAP_COIN:
+            return self._request('dapiPublicGetKlines', params, weight=weight, priority=Priority.BULK)
+
+        if sym_type == SymbolType.FUTURES_USDT or sym_type == SymbolType.SWAP_USDT:
+            return self._request('fapiPublicGetKlines', params, weight=weight, priority=Priority.BULK)
+
+        if sym_type == SymbolType.SPOT:
+            return self._request('publicGetKlines', params, weight=weight, priority=Priority.BULK)
+
+    def query_candle(self,
+                     cc_symbol: str,
+                     start: datetime,
+                     end: datetime,
+                     timeframe: str,
+                     concurrency: int = 1,
+                     fmt: str = 'list') -> Union[list[CandleData], dict[str, np.ndarray], pd.DataFrame, CandleBatch]:
+        """
+        Query candlestick data with start <= candle_begin_time < end
+        With concurrency > 1, pages are computed up front and fetched concurrently,
+        the number of requests in flight is bounded by CANDLE_INFLIGHT_WEIGHT
+        fmt: 'list' for list of CandleData, 'numpy' for dict of typed columns, 'dataframe' for pd.DataFrame,
+        'batch' for CandleBatch, timestamps of columnar formats are int64 epoch milliseconds
+        If the gateway has a candle cache, only ranges missing from the cache are downloaded
+        """
+        start_ms, end_ms = int(start.timestamp()) * 1000, int(end.timestamp()) * 1000
+
+        def fetch(fetch_start_ms: int, fetch_end_ms: int) -> dict[str, np.ndarray]:
+            return parse_candle_arrays(
+                self._query_candle_raw(cc_symbol, fetch_start_ms, fetch_end_ms, timeframe, concurrency))
+
+        if self.candle_cache is not None:
+            return format_candle_arrays(self.candle_cache.get(cc_symbol, timeframe, start_ms, end_ms, fetch), fmt)
+        return format_candles(self._query_candle_raw(cc_symbol, start_ms, end_ms, timeframe, concurrency), fmt)
+
+    def query_first_candle_ms(self, cc_symbol: str, start_ms: int, timeframe: str) -> Optional[int]:
+        """
+        Begin time of the first candle with candle_begin_time >= start_ms, None if there is none (delisted)
+        """
         exg_sym, sym_type = self.convert_symbol_cc_to_exg(cc_symbol)
-        max_candles = MAX_CANDLES[sym_type]
+        return self._query_first_candle_ms(exg_sym, sym_type, timeframe, start_ms)
+
+    def _query_first_candle_ms(self, exg_sym: str, sym_type: SymbolType, timeframe: str,
+                               start_ms: int) -> Optional[int]:
+        data = self._get_klines(sym_type, {'symbol': exg_sym, 'interval': timeframe, 'startTime': start_ms, 'limit': 1})
+        return int(data[0][0]) if data else None
 
-        timeframe_dlt = get_timeframe_delta(timeframe)
-        cur_time = start
-        results: list[CandleData] = []
+    def _query_candle_raw(self, cc_symbol: str, start_ms: int, end_ms: int, timeframe: str,
+                          concurrency: int = 1) -> list[list]:
+        exg_sym, sym_type = self.convert_symbol_cc_to_exg(cc_symbol)
+        max_candles = MAX_CANDLES[sym_type]
 
-        while cur_time < end:
-            num_to_end = math.ceil((end - cur_time) / timeframe_dlt)
+        timeframe_ms = int(get_timeframe_delta(timeframe).total_seconds()) * 1000
+
+        if concurrency > 1:
+            windows = split_candle_windows(start_ms, end_ms, timeframe_ms, max_candles)
+            if not windows:
+                return []
+            weight = get_kline_weight(sym_type, windows[0][2])
+            num_workers = max(1, min(concurrency, CANDLE_INFLIGHT_WEIGHT // weight, len(windows)))
+
+            def fetch(window):
+                window_start_ms, window_end_ms, limit = window
+                params = {
+                    'symbol': exg_sym,
+                    'interval': timeframe,
+                    'startTime': window_start_ms,
+                    'endTime': window_end_ms,
+                    'limit': limit
+                }
+                return self._get_klines(sym_type, params)
+
+            with ThreadPoolExecutor(max_workers=num_workers) as executor:
+                pages = list(executor.map(fetch, windows))
+            return merge_candle_pages(pages, timeframe_ms, end_ms, cc_symbol)
+
+        cur_ms = start_ms
+        results: list[list] = []
+
+        while cur_ms < end_ms:
+            num_to_end = math.ceil((end_ms - cur_ms) / timeframe_ms)
             limit = min(num_to_end, max_candles)
             params = {
                 'symbol': exg_sym,
                 'interval': timeframe,
-                'startTime': int(cur_time.timestamp()) * 1000,
-                'endTime': int((cur_time + (limit - 1) * timeframe_dlt).timestamp()) * 1000,
+                'startTime': cur_ms,
+                'endTime': cur_ms + (limit - 1) * timeframe_ms,
                 'limit': limit
             }
-            if sym_type == SymbolType.FUTURES_COIN or sym_type == SymbolType.SWAP_COIN:
-                data = retry_getter(lambda: self.exg.dapiPublic_get_klines(params))
-
-            if sym_type == SymbolType.FUTURES_USDT or sym_type == SymbolType.SWAP_USDT:
-                data = retry_getter(lambda: self.exg.fapiPublic_get_klines(params))
-
-            if sym_type == SymbolType.SPOT:
-                data = retry_getter(lambda: self.exg.public_get_klines(params))
+            data = self._get_klines(sym_type, params)
 
             if not data:
-                break
+                # 窗口内没有K线(尚未上线或停机), 不带endTime查询之后的第一根K线, 没有则结束
+                next_ms = self._query_first_candle_ms(exg_sym, sym_type, timeframe, cur_ms)
+                if next_ms is None or next_ms >= end_ms:
+                    break
+                cur_ms = next_ms
+                continue
 
-            for d in data:
-                results.append(
-                    CandleData(candle_begin_time=pd.to_datetime(int(d[0]), unit='ms', utc=True),
-                               caldne_end_time=pd.to_datetime(int(d[6]), unit='ms', utc=True),
-                               open=float(d[1]),
-                               high=float(d[2]),
-                               low=float(d[3]),
-                               close=float(d[4]),
-                               volume=float(d[5]),
-                               turnover=float(d[7]),
-                               num_trades=int(d[8]),
-                               buy_vol=float(d[9]),
-                               buy_turnover=float(d[10])))
-
-            cur_time = results[-1].candle_begin_time + timeframe_dlt
+            results.extend(data)
+
+            cur_ms = int(results[-1][0]) + timeframe_ms
 
         return results
 
@@ -278,125 +500,176 @@ class BinanceGateway:
                    reference: Optional[str] = None) -> OrderData:
         order_type, time_condition = ORDERTYPE_CC2EXG[order_type]
         exg_sym, sym_type = self.convert_symbol_cc_to_exg(cc_symbol)
-        sym_info = self.sym_info[cc_symbol]
+        (price, ), (size, ) = format_price_size([price], [size], [self.sym_info[cc_symbol]])
         params = {
             "symbol": exg_sym,
             "side": DIRECTION_CC2EXG[direction],
             "type": order_type,
             "timeInForce": time_condition,
-            "price": round_to_tick(price, sym_info.price_tick),
-            "quantity": floor_to_tick(size, sym_info.size_tick),
+            "price": price,
+            "quantity": size,
         }
         if reference is not None:
             params['newClientOrderId'] = reference
 
         if sym_type == SymbolType.FUTURES_COIN or sym_type == SymbolType.SWAP_COIN:
-            data = retry_getter(lambda: self.exg.dapiPrivate_post_order(params))
+            data = self._request('dapiPrivatePostOrder', params, priority=Priority.ORDER, num_orders=1)
 
         if sym_type == SymbolType.FUTURES_USDT or sym_type == SymbolType.SWAP_USDT:
-            data = retry_getter(lambda: self.exg.fapiPrivate_post_order(params))
+            data = self._request('fapiPrivatePostOrder', params, priority=Priority.ORDER, num_orders=1)
 
         if sym_type == SymbolType.SPOT:
-            data = retry_getter(lambda: self.exg.private_post_order(params))
+            data = self._request('privatePostOrder', params, priority=Priority.ORDER, num_orders=1)
 
         return parse_order(data, cc_symbol, 'send')
 
     def batch_send_orders(self, orders: dict[tuple[str, Direction], dict]) -> dict[str, OrderData]:
+        """
+        Batch send multiple orders, all batches and spot orders are sent concurrently
+        Every order gets a result, orders rejected or failed to send have status FAILED and error_msg set
+        """
         coin_orders = []
         usdt_orders = []
         spot_orders = []
-        for (cc_symbol, order_dir), order in orders.items():
+        # 所有订单的价格和数量一次性取整
+        prices, sizes = format_price_size([order['price'] for order in orders.values()],
+                                          [order['size'] for order in orders.values()],
+                                          [self.sym_info[cc_symbol] for cc_symbol, _ in orders])
+        for ((cc_symbol, order_dir), order), price, size in zip(orders.items(), prices, sizes):
             exg_sym, sym_type = self.convert_symbol_cc_to_exg(cc_symbol)
             order_type, time_condition = ORDERTYPE_CC2EXG[order['order_type']]
-            sym_info = self.sym_info[cc_symbol]
             order_params = {
                 "symbol": exg_sym,
                 "side": DIRECTION_CC2EXG[order_dir],
                 "type": order_type,
                 "timeInForce": time_condition,
-                "price": str(round_to_tick(order['price'], sym_info.price_tick)),
-                "quantity": str(floor_to_tick(order['size'], sym_info.size_tick)),
+                "price": price,
+                "quantity": size,
             }
             if sym_type == SymbolType.FUTURES_COIN or sym_type == SymbolType.SWAP_COIN:
-                coin_orders.append(order_params)
+                coin_orders.append(((cc_symbol, order_dir), order_params))
             if sym_type == SymbolType.FUTURES_USDT or sym_type == SymbolType.SWAP_USDT:
-                usdt_orders.append(order_params)
+                usdt_orders.append(((cc_symbol, order_dir), order_params))
             if sym_type == SymbolType.SPOT:
-                spot_orders.append(order_params)
+                spot_orders.append(((cc_symbol, order_dir), order_params))
 
-        NUM = 5  # 批量下单的数量
+        batches = split_order_batches(coin_orders, usdt_orders, spot_orders)
 
+        futures = [self._executor.submit(self._send_order_batch, method, batch) for method, batch in batches]
         result = dict()
-        coin_data = []
-        for i in range(0, len(coin_orders), NUM):
-            params = {'batchOrders': self.exg.json(coin_orders[i:i + NUM])}
-            coin_data.extend(retry_getter(lambda: self.exg.dapiPrivatePostBatchOrders(params)))
-        for x in coin_data:
-            cc_symbol = convert_coin_symbol_exg_to_cc(x['symbol'])
-            order = parse_order(x, cc_symbol, 'send')
-            result[(cc_symbol, order.direction)] = order
-
-        usdt_data = []
-        for i in range(0, len(usdt_orders), NUM):
-            params = {'batchOrders': self.exg.json(usdt_orders[i:i + NUM])}
-            usdt_data.extend(retry_getter(lambda: self.exg.fapiPrivatePostBatchOrders(params)))
-        for x in usdt_data:
-            cc_symbol = convert_usdt_symbol_exg_to_cc(x['symbol'])
-            order = parse_order(x, cc_symbol, 'send')
-            result[(cc_symbol, order.direction)] = order
-
-        for params in spot_orders:
-            data = retry_getter(lambda: self.exg.private_post_order(params))
-            cc_symbol = self.convert_symbol_exg_to_cc(data['symbol'], SymbolType.SPOT)
-            order = parse_order(data, cc_symbol, 'send')
-            result[(cc_symbol, order.direction)] = order
+        for future in futures:
+            result.update(future.result())
         return result
 
+    def _send_order_batch(self, method: str, batch: list[tuple[tuple[str, Direction], dict]]) -> dict:
+        try:
+            if method == SPOT_ORDER_METHOD:
+                data = [self._request(method, batch[0][1], priority=Priority.ORDER, num_orders=1)]
+            else:
+                params = {'batchOrders': self.exg.json([order_params for _, order_params in batch])}
+                data = self._request(method, params, priority=Priority.ORDER, num_orders=len(batch))
+        except Exception as e:
+            logging.warning(f'Failed to send orders {[key for key, _ in batch]}: {e}')
+            data = [{'msg': str(e)}] * len(batch)
+        return parse_batch_orders(batch, data)
+
     def cancel_order(self, cc_symbol: str, order_id: str) -> OrderData:
         exg_sym, sym_type = self.convert_symbol_cc_to_exg(cc_symbol)
 
         params = {'symbol': exg_sym, 'orderId': order_id}
 
         if sym_type == SymbolType.FUTURES_COIN or sym_type == SymbolType.SWAP_COIN:
-            data = retry_getter(lambda: self.exg.dapiPrivate_delete_order(params))
+            data = self._request('dapiPrivateDeleteOrder', params, priority=Priority.ORDER)
 
         if sym_type == SymbolType.FUTURES_USDT or sym_type == SymbolType.SWAP_USDT:
-            data = retry_getter(lambda: self.exg.fapiPrivate_delete_order(params))
+            data = self._request('fapiPrivateDeleteOrder', params, priority=Priority.ORDER)
 
         return parse_order(data, cc_symbol, 'cancel')
 
     def transfer_asset(self, from_wallet: SymbolType, to_wallet: SymbolType, currency: str, amount: float):
         transfer_type = f'{TRANSFER_WALLET_CC2EXG[from_wallet]}_{TRANSFER_WALLET_CC2EXG[to_wallet]}'
         params = {'type': transfer_type, 'asset': currency, 'amount': amount}
-        retry_getter(lambda: self.exg.sapiPostAssetTransfer(params))
+        self._request('sapiPostAssetTransfer', params)
 
-    def get_swap_funding_fee_rate_history(self, cc_symbol):
+    def _query_funding_raw(self, cc_symbol: str, start_ms: int = 0, end_ms: Optional[int] = None) -> list[dict]:
+        """
+        Funding records with start_ms <= fundingTime (< end_ms), paginated by startTime
+        """
         exg_symbol, sym_type = self.convert_symbol_cc_to_exg(cc_symbol)
         if sym_type == SymbolType.SWAP_COIN:
-            data = retry_getter(lambda: self.exg.dapiPublic_get_fundingrate({'symbol': exg_symbol}), raise_err=True)
-        if sym_type == SymbolType.SWAP_USDT:
-            data = retry_getter(lambda: self.exg.fapiPublic_get_fundingrate({'symbol': exg_symbol}), raise_err=True)
-        data = [{
+            method = 'dapiPublicGetFundingRate'
+        elif sym_type == SymbolType.SWAP_USDT:
+            method = 'fapiPublicGetFundingRate'
+        else:
+            raise ValueError(f'{cc_symbol} is not a perpetual swap')
+
+        results: list[dict] = []
+        cur_ms = start_ms
+        while end_ms is None or cur_ms < end_ms:
+            params = {'symbol': exg_symbol, 'startTime': cur_ms, 'limit': FUNDING_PAGE_LIMIT}
+            if end_ms is not None:
+                params['endTime'] = end_ms - 1
+            data = self._request(method, params, priority=Priority.BULK)
+            results.extend(data)
+            if len(data) < FUNDING_PAGE_LIMIT:
+                break
+            cur_ms = int(data[-1]['fundingTime']) + 1
+        return results
+
+    def query_funding_history(self,
+                              cc_symbol: str,
+                              start_ms: int = 0,
+                              end_ms: Optional[int] = None) -> dict[str, np.ndarray]:
+        """
+        Funding rate history of a perpetual swap as typed columns, funding_time_ms (int64) and rate (float64)
+        """
+        return parse_funding_arrays(self._query_funding_raw(cc_symbol, start_ms, end_ms))
+
+    def get_swap_funding_fee_rate_history(self, cc_symbol, start_ms: int = 0):
+        arrays = self.query_funding_history(cc_symbol, start_ms)
+        return add_funding_time([{
             'symbol': cc_symbol,
-            'funding_time': pd.to_datetime(x['fundingTime'], unit='ms', utc=True),
-            'rate': float(x['fundingRate'])
-        } for x in data]
-        return data
+            'funding_time_ms': t,
+            'rate': r
+        } for t, r in zip(arrays['funding_time_ms'].tolist(), arrays['rate'].tolist())])
 
     def get_swap_recent_fee_rate(self):
-        data = retry_getter(self.exg.dapiPublic_get_premiumindex, raise_err=True)
+        data = self._request('dapiPublicGetPremiumIndex')
         drates = [{
             'symbol': self.convert_symbol_exg_to_cc(x['symbol'], SymbolType.SWAP_COIN),
-            'funding_time': pd.to_datetime(x['nextFundingTime'], unit='ms', utc=True),
+            'funding_time_ms': int(x['nextFundingTime']),
             'rate': float(x['lastFundingRate'])
         } for x in data if x['lastFundingRate'] != '']
-        data = retry_getter(self.exg.fapiPublic_get_premiumindex, raise_err=True)
+        data = self._request('fapiPublicGetPremiumIndex')
         frates = [{
             'symbol': self.convert_symbol_exg_to_cc(x['symbol'], SymbolType.SWAP_USDT),
-            'funding_time': pd.to_datetime(x['nextFundingTime'], unit='ms', utc=True),
+            'funding_time_ms': int(x['nextFundingTime']),
             'rate': float(x['lastFundingRate'])
         } for x in data if x['lastFundingRate'] != '']
-        return drates + frates
+        return add_funding_time(drates + frates)
+
+
+def add_funding_time(rates: list[dict]) -> list[dict]:
+    """
+    Add the funding_time datetime next to funding_time_ms, converted in one vectorized call
+    """
+    for x, dt in zip(rates, ms_to_datetime_index([x['funding_time_ms'] for x in rates])):
+        x['funding_time'] = dt
+    return rates
+
+
+def capture_response_headers(exg):
+    """
+    Record the headers of every response of a ccxt instance in RESPONSE_HEADERS
+    on_rest_response runs in the thread (or task) that sent the request, so the caller reads its own headers
+    """
+    on_rest_response = exg.on_rest_response
+
+    def wrapper(code, reason, url, method, headers, body, *args):
+        RESPONSE_HEADERS.set(headers)
+        return on_rest_response(code, reason, url, method, headers, body, *args)
+
+    exg.on_rest_response = wrapper
 
 
 def parse_account(x: dict) -> AccountData:
@@ -424,6 +697,15 @@ def parse_position(x: dict, cc_symbol: str) -> PositionData:
                         unrealized_pnl=unrealized_pnl)
 
 
+def compact_symbol_record(x: dict) -> dict:
+    """
+    Keep only the exchangeInfo fields needed by the gateway
+    """
+    record = {k: x[k] for k in ('symbol', 'baseAsset', 'quoteAsset', 'contractType', 'contractSize') if k in x}
+    record['filters'] = [f for f in x['filters'] if f['filterType'] in ('PRICE_FILTER', 'LOT_SIZE')]
+    return record
+
+
 def parse_symbol(x: dict, cc_symbol: str) -> SymbolData:
     price_tick = 1
     size_tick = 1
@@ -438,24 +720,158 @@ def parse_symbol(x: dict, cc_symbol: str) -> SymbolData:
     return SymbolData(cc_symbol=cc_symbol, size_tick=size_tick, price_tick=price_tick, face_value=face_value)
 
 
+def get_kline_weight(sym_type: SymbolType, limit: int) -> int:
+    """
+    Request weight of one klines page
+    """
+    if sym_type == SymbolType.SPOT:
+        return SPOT_KLINE_WEIGHT
+    for max_limit, weight in FUTURES_KLINE_WEIGHT:
+        if limit <= max_limit:
+            return weight
+    return FUTURES_KLINE_WEIGHT[-1][1]
+
+
+def get_depth_weight(sym_type: SymbolType, limit: int) -> int:
+    """
+    Request weight of one depth snapshot
+    """
+    weights = SPOT_DEPTH_WEIGHT if sym_type == SymbolType.SPOT else FUTURES_DEPTH_WEIGHT
+    for max_limit, weight in weights:
+        if limit <= max_limit:
+            return weight
+    return weights[-1][1]
+
+
+def split_candle_windows(start_ms: int, end_ms: int, timeframe_ms: int,
+                         max_candles: int) -> list[tuple[int, int, int]]:
+    """
+    Split [start_ms, end_ms) into klines pages of (startTime, endTime, limit)
+    start_ms is aligned up to timeframe so that consecutive pages neither overlap nor leave holes
+    """
+    cur_ms = -(-start_ms // timeframe_ms) * timeframe_ms
+    windows = []
+    while cur_ms < end_ms:
+        limit = min(-(-(end_ms - cur_ms) // timeframe_ms), max_candles)
+        windows.append((cur_ms, cur_ms + (limit - 1) * timeframe_ms, limit))
+        cur_ms += limit * timeframe_ms
+    return windows
+
+
+def find_candle_gaps(begin_times: list[int], timeframe_ms: int) -> list[tuple[int, int]]:
+    """
+    Find missing ranges [gap_start, gap_end) between consecutive candle begin times (epoch ms)
+    """
+    gaps = []
+    for prev, cur in zip(begin_times[:-1], begin_times[1:]):
+        if cur - prev > timeframe_ms:
+            gaps.append((prev + timeframe_ms, cur))
+    return gaps
+
+
+@METRICS.timed('parse_seconds', func='parse_funding_arrays')
+def parse_funding_arrays(data: list[dict]) -> dict[str, np.ndarray]:
+    """
+    fundingRate records to typed columns sorted by funding time
+    """
+    times = np.array([x['fundingTime'] for x in data], dtype=np.int64)
+    rates = np.array([x['fundingRate'] for x in data], dtype=np.float64)
+    order = np.argsort(times, kind='stable')
+    return {'funding_time_ms': times[order], 'rate': rates[order]}
+
+
+@METRICS.timed('parse_seconds', func='merge_candle_pages')
+def merge_candle_pages(pages: list[list], timeframe_ms: int, end_ms: int, cc_symbol: str = '') -> list[list]:
+    """
+    Merge raw klines pages in order, remove duplicated candles and report gaps
+    """
+    rows = []
+    last_begin = None
+    for page in pages:
+        for d in page or []:
+            begin = int(d[0])
+            if begin >= end_ms or (last_begin is not None and begin <= last_begin):
+                continue
+            rows.append(d)
+            last_begin = begin
+
+    for gap_start, gap_end in find_candle_gaps([int(d[0]) for d in rows], timeframe_ms):
+        logging.warning(f'{cc_symbol} missing candles {pd.to_datetime(gap_start, unit="ms", utc=True)} - '
+                        f'{pd.to_datetime(gap_end, unit="ms", utc=True)}')
+    return rows
+
+
+def format_price_size(prices: list[float], sizes: list[float],
+                      syms: list[SymbolData]) -> tuple[list[str], list[str]]:
+    """
+    Round prices to price tick and floor sizes to size tick in one vectorized pass
+    Return exact decimal strings for the request payload
+    """
+    price_tick_ints = [s.price_tick_int for s in syms]
+    price_scales = [s.price_scale for s in syms]
+    size_tick_ints = [s.size_tick_int for s in syms]
+    size_scales = [s.size_scale for s in syms]
+    price_ticks = quantize_to_ticks(prices, price_tick_ints, price_scales)
+    size_ticks = quantize_to_ticks(sizes, size_tick_ints, size_scales, floor=True)
+    prices = ticks_to_str(price_ticks, price_tick_ints, price_scales)
+    sizes = ticks_to_str(size_ticks, size_tick_ints, size_scales)
+    return prices, sizes
+
+
+def split_order_batches(coin_orders: list, usdt_orders: list, spot_orders: list) -> list[tuple[str, list]]:
+    """
+    Split (key, order_params) lists into (ccxt method, orders) requests
+    Futures orders are sent with batchOrders, spot orders one by one
+    """
+    batches = []
+    for method, group in (('dapiPrivatePostBatchOrders', coin_orders), ('fapiPrivatePostBatchOrders', usdt_orders)):
+        for i in range(0, len(group), BATCH_ORDER_NUM):
+            batches.append((method, group[i:i + BATCH_ORDER_NUM]))
+    for order in spot_orders:
+        batches.append((SPOT_ORDER_METHOD, [order]))
+    return batches
+
+
+@METRICS.timed('parse_seconds', func='parse_batch_orders')
+def parse_batch_orders(batch: list[tuple[tuple[str, Direction], dict]], data: list[dict]) -> dict:
+    """
+    Results of one batch request, data is aligned with the requested orders
+    """
+    result = dict()
+    for ((cc_symbol, direction), order_params), x in zip(batch, data):
+        if 'orderId' in x:
+            result[(cc_symbol, direction)] = parse_order(x, cc_symbol, 'send')
+        else:  # {"code": -2022, "msg": "..."}
+            result[(cc_symbol, direction)] = OrderData(
+                cc_symbol=cc_symbol,
+                order_id='',
+                timestamp_ms=0,
+                type=ORDERTYPE_EXG2CC.get((order_params['type'], order_params['timeInForce'])),
+                direction=direction,
+                status=OrderStatus.FAILED,
+                price=float(order_params['price']),
+                size=float(order_params['quantity']),
+                error_msg=x.get('msg', ''))
+    return result
+
+
 def parse_order(x: dict, cc_symbol: str, type_: str) -> OrderData:
     key = (x["type"], x["timeInForce"])
     order_type = ORDERTYPE_EXG2CC.get(key, None)
+    ts = 0
     if type_ == 'send':
         if 'updateTime' in x:
-            ts = pd.to_datetime(int(x['updateTime']), unit='ms', utc=True)
+            ts = int(x['updateTime'])
         elif 'transactTime' in x:
-            ts = pd.to_datetime(int(x['transactTime']), unit='ms', utc=True)
+            ts = int(x['transactTime'])
     if type_ == 'query':
-        ts = pd.to_datetime(int(x['time']), unit='ms', utc=True)
-    if type_ == 'cancel':
-        ts = pd.NaT
+        ts = int(x['time'])
     return OrderData(cc_symbol=cc_symbol,
                      order_id=x['orderId'],
-                     timestamp=ts,
+                     timestamp_ms=ts,
                      type=order_type,
                      direction=DIRECTION_EXG2CC[x['side']],
-                     status=STATUS_EXG2CC[x["status"]],
+                     status=STATUS_EXG2CC.get(x["status"], UNKNOWN_STATUS),
                      price=float(x['price']),
                      size=float(x['origQty']),
                      filled_price=float(x.get("avgPrice", 0)),
@@ -463,7 +879,7 @@ def parse_order(x: dict, cc_symbol: str, type_: str) -> OrderData:
                      cliend_order_id=x.get('clientOrderId', ''))
 
 
-def _convert_symbol_exg_to_cc(exg_symbol: str, sym_type: SymbolType) -> str:
+def _parse_symbol_exg_to_cc(exg_symbol: str, sym_type: SymbolType) -> str:
     """
         {base}-{quote}.{type}
         {base}-{quote}-{exp_date}.{type}
@@ -489,7 +905,7 @@ def _convert_symbol_exg_to_cc(exg_symbol: str, sym_type: SymbolType) -> str:
         return f'{exg_symbol[:-4]}-USDT.SWPU'
 
 
-def _convert_symbol_cc_to_exg(cc_symbol: str) -> tuple[str, SymbolType]:
+def _parse_symbol_cc_to_exg(cc_symbol: str) -> tuple[str, SymbolType]:
     symbol, sym_type = cc_symbol.split('.')
     sym_type = SymbolType(sym_type)
 
@@ -504,7 +920,25 @@ def _convert_symbol_cc_to_exg(cc_symbol: str) -> tuple[str, SymbolType]:
         return f'{symbol.replace("-", "")}_PERP', sym_type
 
 
+# 索引只由exchangeInfo记录填充, 按字符串规则推断的结果不写入索引, 以免覆盖之后加载的正确映射
+def _convert_symbol_exg_to_cc(exg_symbol: str, sym_type: SymbolType) -> str:
+    cc_symbol = SYMBOL_INDEX.exg_to_cc(exg_symbol, SYMTYPE_TO_MARKET[sym_type])
+    if cc_symbol is None:
+        cc_symbol = _parse_symbol_exg_to_cc(exg_symbol, sym_type)
+    return cc_symbol
+
+
+def _convert_symbol_cc_to_exg(cc_symbol: str) -> tuple[str, SymbolType]:
+    result = SYMBOL_INDEX.cc_to_exg(cc_symbol)
+    if result is None:
+        result = _parse_symbol_cc_to_exg(cc_symbol)
+    return result
+
+
 def convert_coin_symbol_exg_to_cc(exg_symbol):
+    cc_symbol = SYMBOL_INDEX.exg_to_cc(exg_symbol, MARKET_COIN)
+    if cc_symbol is not None:
+        return cc_symbol
     if exg_symbol[-1].isdigit():  # futures symbol
         cc_symbol = _convert_symbol_exg_to_cc(exg_symbol, SymbolType.FUTURES_COIN)
     else:
@@ -513,8 +947,19 @@ def convert_coin_symbol_exg_to_cc(exg_symbol):
 
 
 def convert_usdt_symbol_exg_to_cc(exg_symbol):
+    cc_symbol = SYMBOL_INDEX.exg_to_cc(exg_symbol, MARKET_USDT)
+    if cc_symbol is not None:
+        return cc_symbol
     if exg_symbol[-1].isdigit():  # futures symbol
         cc_symbol = _convert_symbol_exg_to_cc(exg_symbol, SymbolType.FUTURES_USDT)
     else:
         cc_symbol = _convert_symbol_exg_to_cc(exg_symbol, SymbolType.SWAP_USDT)
     return cc_symbol
+
+
+def convert_market_symbol_exg_to_cc(exg_symbol: str, market: str) -> str:
+    if market == MARKET_COIN:
+        return convert_coin_symbol_exg_to_cc(exg_symbol)
+    if market == MARKET_USDT:
+        return convert_usdt_symbol_exg_to_cc(exg_symbol)
+    return _convert_symbol_exg_to_cc(exg_symbol, SymbolType.SPOT)
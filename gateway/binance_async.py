@@ -0,0 +1,540 @@
+import asyncio
+import logging
+import math
+import time
+from datetime import datetime, timezone
+from typing import Optional, Union
+
+import ccxt.async_support as ccxt_async
+import numpy as np
+import pandas as pd
+from aiohttp import ClientSession, ClientTimeout, TCPConnector
+
+from .binance import (CANDLE_INFLIGHT_WEIGHT, DIRECTION_CC2EXG, MAX_CANDLES, NO_RETRY_ERRORS, ORDERTYPE_CC2EXG,
+                      RESPONSE_HEADERS, SPOT_ORDER_METHOD, SYMBOL_INDEX, TRANSFER_WALLET_CC2EXG, SymTypeOrList,
+                      _convert_symbol_cc_to_exg, _convert_symbol_exg_to_cc, add_funding_time, capture_response_headers,
+                      convert_coin_symbol_exg_to_cc, convert_usdt_symbol_exg_to_cc, format_price_size, get_depth_weight,
+                      get_kline_weight, merge_candle_pages, parse_account, parse_batch_orders, parse_order,
+                      parse_position, parse_symbol, split_candle_windows, split_order_batches)
+from .candle import CandleBatch, format_candles
+from .constant import (EXCHANGE_TIMEOUT_MS, AccountData, CandleData, Direction, OrderbookData, OrderData, OrderType,
+                       PositionData, SymbolData, SymbolType)
+from .metrics import METRICS
+from .rate_limit import (BAN_SECONDS, Priority, RequestScheduler, get_api_family, get_endpoint_bucket,
+                         get_endpoint_weight)
+from .util import async_retry_getter, get_timeframe_delta
+
+POOL_SIZE = 100  # 连接池最大连接数
+POOL_SIZE_PER_HOST = 30  # 单个host的最大连接数
+
+
+def create_session(pool_size: int = POOL_SIZE, pool_size_per_host: int = POOL_SIZE_PER_HOST) -> ClientSession:
+    """
+    Create a pooled HTTP session that can be shared by multiple AsyncBinanceGateway instances
+    """
+    connector = TCPConnector(limit=pool_size, limit_per_host=pool_size_per_host, ttl_dns_cache=300)
+    return ClientSession(connector=connector, timeout=ClientTimeout(total=EXCHANGE_TIMEOUT_MS / 1000))
+
+
+class AsyncBinanceGateway:
+    """
+    Asyncio version of BinanceGateway, every request goes through a pooled aiohttp session
+
+    Requests to different markets (dapi, fapi and spot) within one method are sent concurrently,
+    every request waits on the RequestScheduler, which can be shared with BinanceGateway instances of the same IP.
+    Call `await gateway.init()` to load symbol info before sending orders, and `await gateway.close()` when done.
+    """
+    CLS_ID = 'BA'
+
+    def __init__(self,
+                 apiKey=None,
+                 secret=None,
+                 session: Optional[ClientSession] = None,
+                 scheduler: Optional[RequestScheduler] = None):
+        self.scheduler = scheduler if scheduler is not None else RequestScheduler()
+        self._own_session = session is None
+        self.session = session
+        self.exg = None
+        self._config = {
+            'apiKey': apiKey,
+            'secret': secret,
+            'timeout': EXCHANGE_TIMEOUT_MS,
+            'enableRateLimit': False,  # 限频只由scheduler负责, 同一方法中各市场的请求才能并发发出
+        }
+        self.sym_info: dict[str, SymbolData] = dict()
+
+    async def init(self):
+        if self.exg is None:
+            if self.session is None:
+                self.session = create_session()
+            self.exg = ccxt_async.binance({**self._config, 'session': self.session})
+            capture_response_headers(self.exg)
+        self.sym_info = await self.query_symbol([SymbolType.SWAP_COIN, SymbolType.SWAP_USDT, SymbolType.SPOT])
+
+    async def close(self):
+        if self.exg is not None:
+            await self.exg.close()
+        if self._own_session and self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    async def __aenter__(self):
+        await self.init()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def _request(self,
+                       method: str,
+                       params: Optional[dict] = None,
+                       weight: Optional[int] = None,
+                       priority: Priority = Priority.QUERY,
+                       num_orders: int = 0):
+        """
+        Call a ccxt binance method through the rate limit scheduler, retry on errors
+        Records per endpoint rate limit wait, request latency (signing included), errors and retries
+        """
+        family = get_api_family(method)
+        weight = get_endpoint_weight(method) if weight is None else weight
+        bucket = get_endpoint_bucket(method)
+        func = getattr(self.exg, method)
+        attempts = [0]
+
+        async def call():
+            attempts[0] += 1
+            if attempts[0] > 1:
+                METRICS.inc('rest_retries_total', endpoint=method)
+            t = time.perf_counter()
+            await self.scheduler.acquire_async(family, weight, priority, num_orders, bucket)
+            RESPONSE_HEADERS.set(None)
+            t_sent = time.perf_counter()
+            METRICS.observe('rest_wait_seconds', t_sent - t, endpoint=method)
+            try:
+                return await (func() if params is None else func(params))
+            except ccxt_async.DDoSProtection:  # 429 / 418
+                headers = RESPONSE_HEADERS.get() or {}
+                self.scheduler.pause(family, float(headers.get('Retry-After', BAN_SECONDS)))
+                METRICS.inc('rest_errors_total', endpoint=method, error='rate_limit')
+                raise
+            except Exception as e:
+                METRICS.inc('rest_errors_total', endpoint=method, error=type(e).__name__)
+                raise
+            finally:
+                METRICS.observe('rest_latency_seconds', time.perf_counter() - t_sent, endpoint=method)
+                self.scheduler.update_from_headers(family, RESPONSE_HEADERS.get())
+
+        return await async_retry_getter(call, no_retry=NO_RETRY_ERRORS)
+
+    @staticmethod
+    def convert_symbol_exg_to_cc(exg_symbol: str, sym_type: SymbolType) -> str:
+        return _convert_symbol_exg_to_cc(exg_symbol, sym_type)
+
+    @staticmethod
+    def convert_symbol_cc_to_exg(cc_symbol: str) -> tuple[str, SymbolType]:
+        return _convert_symbol_cc_to_exg(cc_symbol)
+
+    async def _query_coin_account(self) -> dict[str, AccountData]:
+        account = dict()
+        data = await self._request('dapiPrivateGetAccount')
+        for x in data['assets']:
+            acc_info = parse_account(x)
+            account[f'{x["asset"]}.{SymbolType.FUTURES_COIN.value}'] = acc_info
+            account[f'{x["asset"]}.{SymbolType.SWAP_COIN.value}'] = acc_info
+        return account
+
+    async def _query_usdt_account(self) -> dict[str, AccountData]:
+        account = dict()
+        data = await self._request('fapiPrivateGetAccount')
+        for x in data['assets']:
+            acc_info = parse_account(x)
+            account[f'{x["asset"]}.{SymbolType.FUTURES_USDT.value}'] = acc_info
+            account[f'{x["asset"]}.{SymbolType.SWAP_USDT.value}'] = acc_info
+        return account
+
+    async def _query_spot_account(self) -> dict[str, AccountData]:
+        account = dict()
+        data = await self._request('privateGetAccount')
+        for x in data['balances']:
+            acc_info = parse_account(x)
+            account[f'{x["asset"]}.{SymbolType.SPOT.value}'] = acc_info
+        return account
+
+    async def _query_coin_position(self) -> dict[str, PositionData]:
+        position = dict()
+        data = await self._request('dapiPrivateGetPositionRisk')
+        for x in data:
+            cc_symbol = convert_coin_symbol_exg_to_cc(x['symbol'])
+            position[cc_symbol] = parse_position(x, cc_symbol)
+        return position
+
+    async def _query_usdt_position(self) -> dict[str, PositionData]:
+        position = dict()
+        data = await self._request('fapiPrivateGetPositionRisk')
+        for x in data:
+            cc_symbol = convert_usdt_symbol_exg_to_cc(x['symbol'])
+            position[cc_symbol] = parse_position(x, cc_symbol)
+        return position
+
+    async def _query_usdt_account_and_position(self) -> tuple[dict[str, AccountData], dict[str, PositionData]]:
+        account, position = dict(), dict()
+        data = await self._request('fapiPrivateGetAccount')
+        for x in data['assets']:
+            acc_info = parse_account(x)
+            account[f'{x["asset"]}.{SymbolType.FUTURES_USDT.value}'] = acc_info
+            account[f'{x["asset"]}.{SymbolType.SWAP_USDT.value}'] = acc_info
+        for x in data['positions']:
+            cc_symbol = convert_usdt_symbol_exg_to_cc(x['symbol'])
+            position[cc_symbol] = parse_position(x, cc_symbol)
+        return account, position
+
+    async def query_account(self, sym_type: SymTypeOrList) -> dict[str, AccountData]:
+        if isinstance(sym_type, SymbolType):
+            sym_type = [sym_type]
+
+        tasks = []
+        if SymbolType.FUTURES_COIN in sym_type or SymbolType.SWAP_COIN in sym_type:
+            tasks.append(self._query_coin_account())
+
+        if SymbolType.FUTURES_USDT in sym_type or SymbolType.SWAP_USDT in sym_type:
+            tasks.append(self._query_usdt_account())
+
+        if SymbolType.SPOT in sym_type:
+            tasks.append(self._query_spot_account())
+
+        account = dict()
+        for x in await asyncio.gather(*tasks):
+            account.update(x)
+        return account
+
+    async def query_position(self, sym_type: SymTypeOrList) -> dict[str, PositionData]:
+        if isinstance(sym_type, SymbolType):
+            sym_type = [sym_type]
+
+        tasks = []
+        if SymbolType.FUTURES_COIN in sym_type or SymbolType.SWAP_COIN in sym_type:
+            tasks.append(self._query_coin_position())
+
+        if SymbolType.FUTURES_USDT in sym_type or SymbolType.SWAP_USDT in sym_type:
+            tasks.append(self._query_usdt_position())
+
+        position = dict()
+        for x in await asyncio.gather(*tasks):
+            position.update(x)
+        return position
+
+    async def query_account_and_position(
+            self, sym_type: SymTypeOrList) -> tuple[dict[str, AccountData], dict[str, PositionData]]:
+        if isinstance(sym_type, SymbolType):
+            sym_type = [sym_type]
+
+        account_tasks, position_tasks, both_tasks = [], [], []
+
+        if SymbolType.FUTURES_COIN in sym_type or SymbolType.SWAP_COIN in sym_type:
+            account_tasks.append(self._query_coin_account())
+            position_tasks.append(self._query_coin_position())
+
+        if SymbolType.FUTURES_USDT in sym_type or SymbolType.SWAP_USDT in sym_type:
+            both_tasks.append(self._query_usdt_account_and_position())
+
+        if SymbolType.SPOT in sym_type:
+            account_tasks.append(self._query_spot_account())
+
+        results = await asyncio.gather(*account_tasks, *position_tasks, *both_tasks)
+        n_acc, n_pos = len(account_tasks), len(position_tasks)
+
+        account, position = dict(), dict()
+        for x in results[:n_acc]:
+            account.update(x)
+        for x in results[n_acc:n_acc + n_pos]:
+            position.update(x)
+        for acc, pos in results[n_acc + n_pos:]:
+            account.update(acc)
+            position.update(pos)
+        return account, position
+
+    async def _query_futures_symbol(self, method: str, swap_type: SymbolType, futures_type: SymbolType):
+        symbol = dict()
+        data = await self._request(method)
+        for x in data['symbols']:
+            if x['contractType'] == 'PERPETUAL':
+                type_ = swap_type
+            elif x['contractType'].endswith('QUARTER'):
+                type_ = futures_type
+            else:
+                continue
+            cc_symbol = SYMBOL_INDEX.add_record(x, type_)
+            symbol[cc_symbol] = parse_symbol(x, cc_symbol)
+        return symbol
+
+    async def _query_spot_symbol(self):
+        symbol = dict()
+        data = await self._request('publicGetExchangeInfo')
+        for x in data['symbols']:
+            cc_symbol = SYMBOL_INDEX.add_record(x, SymbolType.SPOT)
+            symbol[cc_symbol] = parse_symbol(x, cc_symbol)
+        return symbol
+
+    async def query_symbol(self, sym_type: SymTypeOrList) -> dict[str, SymbolData]:
+        if isinstance(sym_type, SymbolType):
+            sym_type = [sym_type]
+
+        tasks = []
+        if SymbolType.FUTURES_COIN in sym_type or SymbolType.SWAP_COIN in sym_type:
+            tasks.append(
+                self._query_futures_symbol('dapiPublicGetExchangeInfo', SymbolType.SWAP_COIN,
+                                           SymbolType.FUTURES_COIN))
+
+        if SymbolType.FUTURES_USDT in sym_type or SymbolType.SWAP_USDT in sym_type:
+            tasks.append(
+                self._query_futures_symbol('fapiPublicGetExchangeInfo', SymbolType.SWAP_USDT,
+                                           SymbolType.FUTURES_USDT))
+
+        if SymbolType.SPOT in sym_type:
+            tasks.append(self._query_spot_symbol())
+
+        symbol = dict()
+        for x in await asyncio.gather(*tasks):
+            symbol.update(x)
+        return symbol
+
+    async def query_order(self, cc_symbol: str, order_id: str, cliend_order_id: Optional[str] = None) -> OrderData:
+        exg_sym, sym_type = self.convert_symbol_cc_to_exg(cc_symbol)
+
+        params = {'symbol': exg_sym, 'orderId': order_id}
+
+        if sym_type == SymbolType.FUTURES_COIN or sym_type == SymbolType.SWAP_COIN:
+            data = await self._request('dapiPrivateGetOrder', params)
+
+        if sym_type == SymbolType.FUTURES_USDT or sym_type == SymbolType.SWAP_USDT:
+            data = await self._request('fapiPrivateGetOrder', params)
+
+        if sym_type == SymbolType.SPOT:
+            if cliend_order_id is not None:
+                params = {'symbol': exg_sym, 'origClientOrderId': cliend_order_id}
+            data = await self._request('privateGetOrder', params)
+        return parse_order(data, cc_symbol, 'query')
+
+    async def query_orderbook(self, cc_symbol: str, limit=50) -> OrderbookData:
+        exg_sym, sym_type = self.convert_symbol_cc_to_exg(cc_symbol)
+        params = {'symbol': exg_sym, 'limit': limit}
+        weight = get_depth_weight(sym_type, limit)
+
+        if sym_type == SymbolType.FUTURES_COIN or sym_type == SymbolType.SWAP_COIN:
+            data = await self._request('dapiPublicGetDepth', params, weight=weight)
+
+        if sym_type == SymbolType.FUTURES_USDT or sym_type == SymbolType.SWAP_USDT:
+            data = await self._request('fapiPublicGetDepth', params, weight=weight)
+
+        if sym_type == SymbolType.SPOT:
+            data = await self._request('publicGetDepth', params, weight=weight)
+
+        ask_prices, ask_sizes = list(zip(*data['asks']))
+        bid_prices, bid_sizes = list(zip(*data['bids']))
+
+        ask_prices = [float(x) for x in ask_prices]
+        bid_prices = [float(x) for x in bid_prices]
+        ask_sizes = [float(x) for x in ask_sizes]
+        bid_sizes = [float(x) for x in bid_sizes]
+
+        return OrderbookData(ask_prices=ask_prices, ask_sizes=ask_sizes, bid_prices=bid_prices, bid_sizes=bid_sizes)
+
+    async def _get_klines(self, sym_type: SymbolType, params: dict) -> list:
+        weight = get_kline_weight(sym_type, params['limit'])
+        if sym_type == SymbolType.FUTURES_COIN or sym_type == SymbolType.SWAP_COIN:
+            return await self._request('dapiPublicGetKlines', params, weight=weight, priority=Priority.BULK)
+
+        if sym_type == SymbolType.FUTURES_USDT or sym_type == SymbolType.SWAP_USDT:
+            return await self._request('fapiPublicGetKlines', params, weight=weight, priority=Priority.BULK)
+
+        if sym_type == SymbolType.SPOT:
+            return await self._request('publicGetKlines', params, weight=weight, priority=Priority.BULK)
+
+    async def query_candle(self,
+                           cc_symbol: str,
+                           start: datetime,
+                           end: datetime,
+                           timeframe: str,
+                           concurrency: int = 1,
+                           fmt: str = 'list'
+                           ) -> Union[list[CandleData], dict[str, np.ndarray], pd.DataFrame, CandleBatch]:
+        """
+        Query candlestick data with start <= candle_begin_time < end
+        With concurrency > 1, pages are fetched concurrently, see BinanceGateway.query_candle for fmt
+        """
+        exg_sym, sym_type = self.convert_symbol_cc_to_exg(cc_symbol)
+        max_candles = MAX_CANDLES[sym_type]
+
+        timeframe_dlt = get_timeframe_delta(timeframe)
+
+        if concurrency > 1:
+            timeframe_ms = int(timeframe_dlt.total_seconds()) * 1000
+            end_ms = int(end.timestamp()) * 1000
+            windows = split_candle_windows(int(start.timestamp()) * 1000, end_ms, timeframe_ms, max_candles)
+            if not windows:
+                return format_candles([], fmt)
+            weight = get_kline_weight(sym_type, windows[0][2])
+            semaphore = asyncio.Semaphore(max(1, min(concurrency, CANDLE_INFLIGHT_WEIGHT // weight)))
+
+            async def fetch(window):
+                start_ms, stop_ms, limit = window
+                params = {
+                    'symbol': exg_sym,
+                    'interval': timeframe,
+                    'startTime': start_ms,
+                    'endTime': stop_ms,
+                    'limit': limit
+                }
+                async with semaphore:
+                    return await self._get_klines(sym_type, params)
+
+            pages = await asyncio.gather(*[fetch(w) for w in windows])
+            return format_candles(merge_candle_pages(pages, timeframe_ms, end_ms, cc_symbol), fmt)
+
+        cur_time = start
+        results: list[list] = []
+
+        while cur_time < end:
+            num_to_end = math.ceil((end - cur_time) / timeframe_dlt)
+            limit = min(num_to_end, max_candles)
+            params = {
+                'symbol': exg_sym,
+                'interval': timeframe,
+                'startTime': int(cur_time.timestamp()) * 1000,
+                'endTime': int((cur_time + (limit - 1) * timeframe_dlt).timestamp()) * 1000,
+                'limit': limit
+            }
+            data = await self._get_klines(sym_type, params)
+
+            if not data:
+                # 窗口内没有K线(尚未上线或停机), 不带endTime查询之后的第一根K线, 没有则结束
+                probe = await self._get_klines(sym_type, {'symbol': exg_sym, 'interval': timeframe,
+                                                          'startTime': params['startTime'], 'limit': 1})
+                if not probe or int(probe[0][0]) >= int(end.timestamp() * 1000):
+                    break
+                cur_time = datetime.fromtimestamp(int(probe[0][0]) / 1000, tz=timezone.utc)
+                continue
+
+            results.extend(data)
+
+            cur_time = datetime.fromtimestamp(int(results[-1][0]) / 1000, tz=timezone.utc) + timeframe_dlt
+
+        return format_candles(results, fmt)
+
+    async def send_order(self,
+                         cc_symbol: str,
+                         direction: Direction,
+                         order_type: OrderType,
+                         price: float,
+                         size: float,
+                         reference: Optional[str] = None) -> OrderData:
+        order_type, time_condition = ORDERTYPE_CC2EXG[order_type]
+        exg_sym, sym_type = self.convert_symbol_cc_to_exg(cc_symbol)
+        (price, ), (size, ) = format_price_size([price], [size], [self.sym_info[cc_symbol]])
+        params = {
+            "symbol": exg_sym,
+            "side": DIRECTION_CC2EXG[direction],
+            "type": order_type,
+            "timeInForce": time_condition,
+            "price": price,
+            "quantity": size,
+        }
+        if reference is not None:
+            params['newClientOrderId'] = reference
+
+        if sym_type == SymbolType.FUTURES_COIN or sym_type == SymbolType.SWAP_COIN:
+            data = await self._request('dapiPrivatePostOrder', params, priority=Priority.ORDER, num_orders=1)
+
+        if sym_type == SymbolType.FUTURES_USDT or sym_type == SymbolType.SWAP_USDT:
+            data = await self._request('fapiPrivatePostOrder', params, priority=Priority.ORDER, num_orders=1)
+
+        if sym_type == SymbolType.SPOT:
+            data = await self._request('privatePostOrder', params, priority=Priority.ORDER, num_orders=1)
+
+        return parse_order(data, cc_symbol, 'send')
+
+    async def batch_send_orders(self, orders: dict[tuple[str, Direction], dict]) -> dict[str, OrderData]:
+        """
+        Batch send multiple orders, all batches and spot orders are sent concurrently
+        Every order gets a result, orders rejected or failed to send have status FAILED and error_msg set
+        """
+        coin_orders = []
+        usdt_orders = []
+        spot_orders = []
+        # 所有订单的价格和数量一次性取整
+        prices, sizes = format_price_size([order['price'] for order in orders.values()],
+                                          [order['size'] for order in orders.values()],
+                                          [self.sym_info[cc_symbol] for cc_symbol, _ in orders])
+        for ((cc_symbol, order_dir), order), price, size in zip(orders.items(), prices, sizes):
+            exg_sym, sym_type = self.convert_symbol_cc_to_exg(cc_symbol)
+            order_type, time_condition = ORDERTYPE_CC2EXG[order['order_type']]
+            order_params = {
+                "symbol": exg_sym,
+                "side": DIRECTION_CC2EXG[order_dir],
+                "type": order_type,
+                "timeInForce": time_condition,
+                "price": price,
+                "quantity": size,
+            }
+            if sym_type == SymbolType.FUTURES_COIN or sym_type == SymbolType.SWAP_COIN:
+                coin_orders.append(((cc_symbol, order_dir), order_params))
+            if sym_type == SymbolType.FUTURES_USDT or sym_type == SymbolType.SWAP_USDT:
+                usdt_orders.append(((cc_symbol, order_dir), order_params))
+            if sym_type == SymbolType.SPOT:
+                spot_orders.append(((cc_symbol, order_dir), order_params))
+
+        batches = split_order_batches(coin_orders, usdt_orders, spot_orders)
+
+        results = await asyncio.gather(*[self._send_order_batch(method, batch) for method, batch in batches])
+        result = dict()
+        for x in results:
+            result.update(x)
+        return result
+
+    async def _send_order_batch(self, method: str, batch: list[tuple[tuple[str, Direction], dict]]) -> dict:
+        try:
+            if method == SPOT_ORDER_METHOD:
+                data = [await self._request(method, batch[0][1], priority=Priority.ORDER, num_orders=1)]
+            else:
+                params = {'batchOrders': self.exg.json([order_params for _, order_params in batch])}
+                data = await self._request(method, params, priority=Priority.ORDER, num_orders=len(batch))
+        except Exception as e:
+            logging.warning(f'Failed to send orders {[key for key, _ in batch]}: {e}')
+            data = [{'msg': str(e)}] * len(batch)
+        return parse_batch_orders(batch, data)
+
+    async def cancel_order(self, cc_symbol: str, order_id: str) -> OrderData:
+        exg_sym, sym_type = self.convert_symbol_cc_to_exg(cc_symbol)
+
+        params = {'symbol': exg_sym, 'orderId': order_id}
+
+        if sym_type == SymbolType.FUTURES_COIN or sym_type == SymbolType.SWAP_COIN:
+            data = await self._request('dapiPrivateDeleteOrder', params, priority=Priority.ORDER)
+
+        if sym_type == SymbolType.FUTURES_USDT or sym_type == SymbolType.SWAP_USDT:
+            data = await self._request('fapiPrivateDeleteOrder', params, priority=Priority.ORDER)
+
+        if sym_type == SymbolType.SPOT:
+            data = await self._request('privateDeleteOrder', params, priority=Priority.ORDER)
+
+        return parse_order(data, cc_symbol, 'cancel')
+
+    async def transfer_asset(self, from_wallet: SymbolType, to_wallet: SymbolType, currency: str, amount: float):
+        transfer_type = f'{TRANSFER_WALLET_CC2EXG[from_wallet]}_{TRANSFER_WALLET_CC2EXG[to_wallet]}'
+        params = {'type': transfer_type, 'asset': currency, 'amount': amount}
+        await self._request('sapiPostAssetTransfer', params)
+
+    async def get_swap_recent_fee_rate(self):
+        ddata, fdata = await asyncio.gather(self._request('dapiPublicGetPremiumIndex'),
+                                            self._request('fapiPublicGetPremiumIndex'))
+        drates = [{
+            'symbol': self.convert_symbol_exg_to_cc(x['symbol'], SymbolType.SWAP_COIN),
+            'funding_time_ms': int(x['nextFundingTime']),
+            'rate': float(x['lastFundingRate'])
+        } for x in ddata if x['lastFundingRate'] != '']
+        frates = [{
+            'symbol': self.convert_symbol_exg_to_cc(x['symbol'], SymbolType.SWAP_USDT),
+            'funding_time_ms': int(x['nextFundingTime']),
+            'rate': float(x['lastFundingRate'])
+        } for x in fdata if x['lastFundingRate'] != '']
+        return add_funding_time(drates + frates)
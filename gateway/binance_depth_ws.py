@@ -0,0 +1,149 @@
+import logging
+import threading
+from collections import deque
+
+from .orderbook import LocalOrderBook
+from .symbol_index import MARKET_COIN, MARKET_SPOT, MARKET_USDT
+from .symbol_store import get_market
+from .websocket_client import WebsocketClient
+
+WS_HOSTS: dict[str, str] = {
+    MARKET_SPOT: 'wss://stream.binance.com:9443/stream',
+    MARKET_USDT: 'wss://fstream.binance.com/stream',
+    MARKET_COIN: 'wss://dstream.binance.com/stream',
+}
+
+MAX_BUFFERED_EVENTS = 1000  # 等待快照期间最多缓存的增量事件数
+RESYNC_DELAY_SEC = 1  # 快照获取失败后的重试间隔
+
+
+class BinanceDepthWs(WebsocketClient):
+    """
+    币安增量深度Websocket, 为每个symbol维护本地订单簿
+
+    * 连接后订阅<symbol>@depth@100ms, 同时通过REST获取快照
+    * 快照返回前的增量事件先缓存, 快照到达后按update id衔接
+    * 发现update id不连续时自动重新同步
+    * 同一连接内的symbol须属于同一市场(现货/U本位/币本位)
+    * 设置分发器后on_packet在分发线程中执行, 订单簿状态由锁保护, 重新同步总在事件循环线程中发起
+    """
+
+    def __init__(self, gateway, cc_symbols: list[str], snapshot_limit: int = 1000, speed: str = '100ms'):
+        """
+        gateway: 用于获取深度快照的BinanceGateway
+        """
+        super().__init__()
+        markets = {get_market(cc_symbol) for cc_symbol in cc_symbols}
+        if len(markets) != 1:
+            raise ValueError(f'Symbols of one BinanceDepthWs should belong to one market, got {markets}')
+        self.market = markets.pop()
+        self.gateway = gateway
+        self.snapshot_limit = snapshot_limit
+        self.reqid = 0
+
+        self.books: dict[str, LocalOrderBook] = dict()
+        self._buffers: dict[str, deque] = dict()
+        self._syncing: set[str] = set()
+        self._stream_to_cc: dict[str, str] = dict()
+        self._lock = threading.Lock()  # 保护books, _buffers和_syncing
+        for cc_symbol in cc_symbols:
+            exg_sym, _ = gateway.convert_symbol_cc_to_exg(cc_symbol)
+            self._stream_to_cc[f'{exg_sym.lower()}@depth@{speed}'] = cc_symbol
+            self.books[cc_symbol] = LocalOrderBook(cc_symbol, is_futures=self.market != MARKET_SPOT)
+            self._buffers[cc_symbol] = deque(maxlen=MAX_BUFFERED_EVENTS)
+
+    def connect(self):
+        """连接Websocket深度频道"""
+        self.init(WS_HOSTS[self.market])
+
+        self.start()
+
+    def on_connected(self) -> None:
+        """连接成功回报"""
+        logging.info(f"深度Websocket API连接成功 {self.market}")
+
+        req: dict = {"method": "SUBSCRIBE", "params": list(self._stream_to_cc), "id": self.reqid}
+        self.send_packet(req)
+        self.reqid += 1
+
+        for cc_symbol in self.books:
+            self.resync(cc_symbol)
+
+    def on_disconnected(self) -> None:
+        """连接断开回报"""
+        with self._lock:
+            for book in self.books.values():
+                book.reset()
+
+    def resync(self, cc_symbol: str) -> None:
+        """重新获取快照, 须在事件循环线程中调用, 其他线程请使用_request_resync"""
+        with self._lock:
+            # 快照请求已在途时保留缓存的增量事件, 用于衔接该快照
+            if cc_symbol in self._syncing:
+                return
+            self.books[cc_symbol].reset()
+            self._buffers[cc_symbol].clear()
+            self._syncing.add(cc_symbol)
+
+        future = self._loop.run_in_executor(None, self.gateway.query_depth_snapshot, cc_symbol, self.snapshot_limit)
+        future.add_done_callback(lambda f: self._on_snapshot(cc_symbol, f))
+
+    def _request_resync(self, cc_symbol: str) -> None:
+        """从任意线程发起重新同步"""
+        self._loop.call_soon_threadsafe(self.resync, cc_symbol)
+
+    def _on_snapshot(self, cc_symbol: str, future) -> None:
+        """快照回报, 在事件循环线程中执行"""
+        if future.cancelled():  # 关闭事件循环时取消
+            with self._lock:
+                self._syncing.discard(cc_symbol)
+            return
+        if future.exception() is not None:
+            with self._lock:
+                self._syncing.discard(cc_symbol)
+            logging.warning(f'Failed to get depth snapshot {cc_symbol}: {future.exception()}')
+            self._loop.call_later(RESYNC_DELAY_SEC, self.resync, cc_symbol)
+            return
+
+        data = future.result()
+        with self._lock:
+            self._syncing.discard(cc_symbol)
+            book = self.books[cc_symbol]
+            book.apply_snapshot(int(data['lastUpdateId']), data['bids'], data['asks'])
+
+            buffer = self._buffers[cc_symbol]
+            while buffer:
+                if not self._apply(book, buffer.popleft()):
+                    logging.warning(f'Depth events of {cc_symbol} do not match snapshot, resync')
+                    book.reset()
+                    self._loop.call_soon(self.resync, cc_symbol)
+                    return
+            self.on_orderbook(book)
+
+    @staticmethod
+    def _apply(book: LocalOrderBook, d: dict) -> bool:
+        return book.apply_diff(d['U'], d['u'], d['b'], d['a'], d.get('pu'))
+
+    def on_packet(self, packet: dict) -> None:
+        """推送数据回报"""
+        cc_symbol = self._stream_to_cc.get(packet.get("stream", None))
+        if cc_symbol is None:
+            return
+
+        with self._lock:
+            book = self.books[cc_symbol]
+            if cc_symbol in self._syncing or book.last_update_id is None:
+                self._buffers[cc_symbol].append(packet['data'])
+                return
+
+            if not self._apply(book, packet['data']):
+                logging.warning(f'Depth update id gap {cc_symbol}, resync')
+                # 重置后的事件先缓存, 直到新快照到达
+                book.reset()
+                self._request_resync(cc_symbol)
+                return
+            self.on_orderbook(book)
+
+    def on_orderbook(self, book: LocalOrderBook) -> None:
+        """本地订单簿更新回报, 在持有锁时调用, 回调期间订单簿不会变化"""
+        pass
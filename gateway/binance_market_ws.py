@@ -0,0 +1,214 @@
+import asyncio
+import logging
+import threading
+import time
+from asyncio import AbstractEventLoop, new_event_loop
+from collections import deque
+from typing import Callable, Optional
+
+from .binance import _convert_symbol_cc_to_exg
+from .binance_depth_ws import WS_HOSTS
+from .symbol_index import MARKET_COIN, MARKET_SPOT, MARKET_USDT
+from .symbol_store import get_market
+from .websocket_client import WebsocketClient, start_event_loop
+
+# 单个连接允许的最大stream数
+MAX_STREAMS_PER_CONNECTION: dict[str, int] = {
+    MARKET_SPOT: 1024,
+    MARKET_USDT: 200,
+    MARKET_COIN: 200,
+}
+
+# 单个连接每秒允许发送的消息数
+MAX_MESSAGES_PER_SECOND: dict[str, int] = {
+    MARKET_SPOT: 5,
+    MARKET_USDT: 10,
+    MARKET_COIN: 10,
+}
+
+MAX_STREAMS_PER_MESSAGE = 50  # 单条SUBSCRIBE/UNSUBSCRIBE消息包含的stream数
+
+CLOSE_TIMEOUT_SEC = 5  # 停止时等待单个连接关闭的时间
+
+# on_data(cc_symbol, channel, data)
+DataCallback = Callable[[str, str, dict], None]
+
+
+class BinanceMarketWs(WebsocketClient):
+    """
+    单个行情连接, 管理该连接上的stream订阅
+
+    * 订阅/取消订阅请求按批次合并, 并按交易所限制的频率发送
+    * 重连后自动分批重新订阅全部stream
+    """
+
+    def __init__(self, market: str, on_data: DataCallback):
+        super().__init__()
+        self.market = market
+        self.on_data = on_data
+        self.reqid = 0
+
+        self.streams: dict[str, tuple[str, str]] = dict()  # stream -> (cc_symbol, channel)
+        self._pending: deque = deque()  # 待发送的 (method, streams)
+        self._draining = False
+        self._connected = False
+
+    def connect(self):
+        """连接Websocket行情频道"""
+        self.init(WS_HOSTS[self.market])
+
+        self.start()
+
+    def _queue(self, method: str, streams: list[str]):
+        for i in range(0, len(streams), MAX_STREAMS_PER_MESSAGE):
+            self._pending.append((method, streams[i:i + MAX_STREAMS_PER_MESSAGE]))
+        if self._loop is not None and self._connected:
+            self._loop.call_soon_threadsafe(self._kick)
+
+    def subscribe(self, items: dict[str, tuple[str, str]]):
+        """订阅stream, items: stream -> (cc_symbol, channel)"""
+        self.streams.update(items)
+        self._queue("SUBSCRIBE", list(items))
+
+    def unsubscribe(self, streams: list[str]):
+        """取消订阅stream"""
+        for stream in streams:
+            self.streams.pop(stream, None)
+        self._queue("UNSUBSCRIBE", streams)
+
+    def _kick(self):
+        """在事件循环线程中启动发送协程"""
+        if not self._draining and self._connected:
+            self._draining = True
+            self._loop.create_task(self._drain())
+
+    async def _drain(self):
+        """按频率限制发送排队的订阅消息"""
+        interval = 1 / MAX_MESSAGES_PER_SECOND[self.market]
+        try:
+            while self._pending and self._connected:
+                method, streams = self._pending.popleft()
+                self.send_packet({"method": method, "params": streams, "id": self.reqid})
+                self.reqid += 1
+                await asyncio.sleep(interval)
+        finally:
+            self._draining = False
+
+    def on_connected(self) -> None:
+        """连接成功回报"""
+        logging.info(f"行情Websocket API连接成功 {self.market}")
+
+        # 重新订阅全部行情, 之前排队的消息已包含在内
+        self._pending.clear()
+        self._connected = True
+        self._queue("SUBSCRIBE", list(self.streams))
+        self._kick()
+
+    def on_disconnected(self) -> None:
+        """连接断开回报"""
+        self._connected = False
+
+    def on_packet(self, packet: dict) -> None:
+        """推送数据回报"""
+        item = self.streams.get(packet.get("stream", None))
+        if item is None:
+            return
+        cc_symbol, channel = item
+        self.on_data(cc_symbol, channel, packet['data'])
+
+
+class SubscriptionManager:
+    """
+    现货、U本位、币本位行情订阅管理
+
+    subscribe(cc_symbol, channel) 中 channel 为币安stream名中symbol之后的部分,
+    如 kline_1m, bookTicker, depth@100ms, aggTrade.
+    stream按市场分配到多个连接上, 每个连接不超过交易所允许的stream数.
+    所有连接共用一个事件循环线程, 由本类启动和停止, 单个连接stop不影响其他连接.
+    """
+
+    def __init__(self, on_data: DataCallback, max_streams_per_connection: Optional[dict[str, int]] = None):
+        self.on_data = on_data
+        self.max_streams = max_streams_per_connection or MAX_STREAMS_PER_CONNECTION
+        self.connections: dict[str, list[BinanceMarketWs]] = {market: [] for market in WS_HOSTS}
+        self._stream_conn: dict[str, BinanceMarketWs] = dict()
+        self._lock = threading.Lock()
+        self._loop: AbstractEventLoop = new_event_loop()
+        self._started = False
+
+    @staticmethod
+    def get_stream(cc_symbol: str, channel: str) -> str:
+        exg_sym, _ = _convert_symbol_cc_to_exg(cc_symbol)
+        return f'{exg_sym.lower()}@{channel}'
+
+    def _start_loop(self):
+        if self._loop.is_running():
+            return
+        start_event_loop(self._loop)
+        # 等待共享的事件循环启动, 连接看到运行中的事件循环便不会再创建线程, 也不会在stop时停止它
+        while not self._loop.is_running():
+            time.sleep(0.01)
+
+    def _start_connection(self, conn: BinanceMarketWs):
+        self._start_loop()
+        conn._loop = self._loop
+        conn.connect()
+
+    def _get_connection(self, market: str) -> BinanceMarketWs:
+        for conn in self.connections[market]:
+            if len(conn.streams) < self.max_streams[market]:
+                return conn
+        conn = BinanceMarketWs(market, self.on_data)
+        self.connections[market].append(conn)
+        if self._started:
+            self._start_connection(conn)
+        return conn
+
+    def subscribe(self, cc_symbol: str, channel: str):
+        self.batch_subscribe([(cc_symbol, channel)])
+
+    def batch_subscribe(self, items: list[tuple[str, str]]):
+        """批量订阅 (cc_symbol, channel)"""
+        with self._lock:
+            new_streams: dict[BinanceMarketWs, dict[str, tuple[str, str]]] = dict()
+            for cc_symbol, channel in items:
+                stream = self.get_stream(cc_symbol, channel)
+                if stream in self._stream_conn:
+                    continue
+                market = get_market(cc_symbol)
+                conn = self._get_connection(market)
+                # 先记录到连接上, 同一批次内后续stream才能正确分片
+                conn.streams[stream] = (cc_symbol, channel)
+                self._stream_conn[stream] = conn
+                new_streams.setdefault(conn, dict())[stream] = (cc_symbol, channel)
+            for conn, streams in new_streams.items():
+                conn.subscribe(streams)
+
+    def unsubscribe(self, cc_symbol: str, channel: str):
+        with self._lock:
+            stream = self.get_stream(cc_symbol, channel)
+            conn = self._stream_conn.pop(stream, None)
+            if conn is not None:
+                conn.unsubscribe([stream])
+
+    def start(self):
+        with self._lock:
+            self._started = True
+            for conns in self.connections.values():
+                for conn in conns:
+                    self._start_connection(conn)
+
+    def stop(self):
+        with self._lock:
+            self._started = False
+            futures = [conn.stop() for conns in self.connections.values() for conn in conns]
+            # 等待各连接关闭会话后再停止共享的事件循环
+            for future in futures:
+                if future is None:
+                    continue
+                try:
+                    future.result(timeout=CLOSE_TIMEOUT_SEC)
+                except Exception:
+                    logging.warning('行情Websocket连接关闭失败', exc_info=True)
+            if self._loop.is_running():
+                self._loop.call_soon_threadsafe(self._loop.stop)
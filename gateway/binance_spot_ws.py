@@ -1,22 +1,31 @@
 import logging
 
-import pandas as pd
-
 from .constant import CandleData
+from .decoder import KlineEvent, TypedDecoder
 
 from .websocket_client import WebsocketClient
 
+SPOT_WS_HOST = "wss://stream.binance.com:9443/stream"
+
 
 class BinanceSpotWs(WebsocketClient):
     """币安现货行情Websocket API"""
-    def __init__(self) -> None:
-        """构造函数"""
+    def __init__(self, candle_format: str = 'dataclass', host: str = SPOT_WS_HOST) -> None:
+        """
+        构造函数
+
+        candle_format: 'dataclass'推送CandleData, 'raw'推送按CANDLE_COLUMNS排列的tuple, 时间均为毫秒时间戳
+        host: Websocket地址, 可指向本地模拟服务器
+        """
         super().__init__()
         self.reqid = 0
+        self.candle_format = candle_format
+        self.host = host
+        self.set_decoder(TypedDecoder())
 
     def connect(self):
         """连接Websocket行情频道"""
-        self.init("wss://stream.binance.com:9443/stream")
+        self.init(self.host)
 
         self.start()
 
@@ -38,18 +47,16 @@ class BinanceSpotWs(WebsocketClient):
             return
 
         if 'kline' in stream:
-            d = packet['data']['k']
-            if not d['x']: # candle not closed
+            k: KlineEvent = packet['data']
+            if not k.closed: # candle not closed
                 return
-            candle = CandleData(candle_begin_time=pd.to_datetime(int(d['t']), unit='ms', utc=True),
-                                caldne_end_time=pd.to_datetime(int(d['T']), unit='ms', utc=True),
-                                open=float(d['o']),
-                                high=float(d['h']),
-                                low=float(d['l']),
-                                close=float(d['c']),
-                                volume=float(d['v']),
-                                turnover=float(d['q']),
-                                num_trades=int(d['n']),
-                                buy_vol=float(d['V']),
-                                buy_turnover=float(d['Q']))
-            print(candle)
+            row = (k.start_time, k.end_time, k.open, k.high, k.low, k.close, k.volume, k.turnover, k.num_trades,
+                   k.buy_vol, k.buy_turnover)
+            if self.candle_format == 'raw':
+                self.on_candle(row)
+                return
+            self.on_candle(CandleData(*row))
+
+    def on_candle(self, candle) -> None:
+        """K线收盘回报"""
+        print(candle)
@@ -0,0 +1,202 @@
+import logging
+import threading
+from asyncio import run_coroutine_threadsafe
+
+from .binance import DIRECTION_EXG2CC, ORDERTYPE_EXG2CC, STATUS_EXG2CC, UNKNOWN_STATUS, convert_market_symbol_exg_to_cc
+from .constant import AccountData, Direction, OrderData, PositionData, SymbolType
+from .symbol_index import MARKET_COIN, MARKET_SPOT, MARKET_USDT
+from .websocket_client import WebsocketClient
+
+USER_WS_HOSTS: dict[str, str] = {
+    MARKET_SPOT: 'wss://stream.binance.com:9443/ws/',
+    MARKET_USDT: 'wss://fstream.binance.com/ws/',
+    MARKET_COIN: 'wss://dstream.binance.com/ws/',
+}
+
+LISTEN_KEY_KEEPALIVE_SEC = 30 * 60  # listenKey有效期60分钟, 每30分钟延期一次
+
+# 账户资产对应的SymbolType, 与BinanceGateway.query_account的key保持一致
+ACCOUNT_SYMTYPES: dict[str, list[SymbolType]] = {
+    MARKET_SPOT: [SymbolType.SPOT],
+    MARKET_USDT: [SymbolType.FUTURES_USDT, SymbolType.SWAP_USDT],
+    MARKET_COIN: [SymbolType.FUTURES_COIN, SymbolType.SWAP_COIN],
+}
+
+
+def _filled_price(cum_quote: float, cum_size: float) -> float:
+    return cum_quote / cum_size if cum_size > 0 else 0.
+
+
+def parse_execution_report(d: dict) -> OrderData:
+    """
+    Spot executionReport event
+    """
+    filled_size = float(d['z'])
+    # 撤单回报中c是撤单请求的id, 订单自身的client id在C中
+    client_order_id = (d.get('C') or d['c']) if d['X'] == 'CANCELED' else d['c']
+    return OrderData(cc_symbol=convert_market_symbol_exg_to_cc(d['s'], MARKET_SPOT),
+                     order_id=d['i'],
+                     timestamp_ms=int(d['T']),
+                     type=ORDERTYPE_EXG2CC.get((d['o'], d['f']), None),
+                     direction=DIRECTION_EXG2CC[d['S']],
+                     status=STATUS_EXG2CC.get(d['X'], UNKNOWN_STATUS),
+                     price=float(d['p']),
+                     size=float(d['q']),
+                     filled_price=_filled_price(float(d['Z']), filled_size),
+                     filled_size=filled_size,
+                     cliend_order_id=client_order_id)
+
+
+def parse_order_trade_update(d: dict, market: str) -> OrderData:
+    """
+    Futures ORDER_TRADE_UPDATE event
+    """
+    o = d['o']
+    return OrderData(cc_symbol=convert_market_symbol_exg_to_cc(o['s'], market),
+                     order_id=o['i'],
+                     timestamp_ms=int(o['T']),
+                     type=ORDERTYPE_EXG2CC.get((o['o'], o['f']), None),
+                     direction=DIRECTION_EXG2CC[o['S']],
+                     status=STATUS_EXG2CC.get(o['X'], UNKNOWN_STATUS),
+                     price=float(o['p']),
+                     size=float(o['q']),
+                     filled_price=float(o['ap']),
+                     filled_size=float(o['z']),
+                     cliend_order_id=o['c'])
+
+
+def parse_account_update(d: dict, market: str) -> tuple[dict[str, AccountData], dict[str, PositionData]]:
+    """
+    Futures ACCOUNT_UPDATE event, only balances and positions that changed are included
+    The event carries no margin balance, so equity is the wallet balance
+    """
+    a = d['a']
+    account = dict()
+    for x in a.get('B', []):
+        balance = float(x['wb'])
+        acc_info = AccountData(account_id=x['a'], equity=balance, balance=balance)
+        for sym_type in ACCOUNT_SYMTYPES[market]:
+            account[f'{x["a"]}.{sym_type.value}'] = acc_info
+
+    position = dict()
+    for x in a.get('P', []):
+        cc_symbol = convert_market_symbol_exg_to_cc(x['s'], market)
+        size = float(x['pa'])
+        direction = None if size == 0 else (Direction.LONG if size > 0 else Direction.SHORT)
+        position[cc_symbol] = PositionData(cc_symbol=cc_symbol,
+                                           direction=direction,
+                                           size=size,
+                                           price=float(x['ep']),
+                                           unrealized_pnl=float(x['up']))
+    return account, position
+
+
+def parse_account_position(d: dict) -> dict[str, AccountData]:
+    """
+    Spot outboundAccountPosition event, balance is the free amount as in parse_account
+    """
+    account = dict()
+    for x in d['B']:
+        balance = float(x['f'])
+        account[f'{x["a"]}.{SymbolType.SPOT.value}'] = AccountData(account_id=x['a'], equity=balance, balance=balance)
+    return account
+
+
+class BinanceUserWs(WebsocketClient):
+    """
+    币安用户数据流Websocket, 推送订单、资金和持仓更新
+
+    * 连接前通过REST创建listenKey, 后台线程每30分钟延期一次
+    * 收到listenKeyExpired后重新创建listenKey并重连
+    * 一个连接对应一个市场(现货/U本位/币本位)
+    """
+
+    def __init__(self, gateway, market: str):
+        """
+        gateway: 用于管理listenKey的BinanceGateway
+        """
+        super().__init__()
+        self.gateway = gateway
+        self.market = market
+        self.listen_key = ''
+
+        self._renew = threading.Event()
+        self._keepalive_thread = None
+
+    def connect(self):
+        """创建listenKey并连接用户数据流"""
+        self.listen_key = self.gateway.create_listen_key(self.market)
+        self.init(USER_WS_HOSTS[self.market] + self.listen_key)
+
+        self.start()
+
+        self._keepalive_thread = threading.Thread(target=self._keepalive, daemon=True)
+        self._keepalive_thread.start()
+
+    def stop(self):
+        future = super().stop()
+        self._renew.set()
+        return future
+
+    def _keepalive(self):
+        while self._active:
+            self._renew.wait(LISTEN_KEY_KEEPALIVE_SEC)
+            if not self._active:
+                return
+            try:
+                if self._renew.is_set():
+                    self._renew.clear()
+                    self._renew_listen_key()
+                else:
+                    self.gateway.keepalive_listen_key(self.market, self.listen_key)
+            except Exception as e:
+                logging.warning(f'Failed to keep listenKey alive {self.market}: {e}')
+                self._renew.set()
+
+    def _renew_listen_key(self):
+        """重新创建listenKey, 关闭当前连接后由接收循环使用新地址重连"""
+        self.listen_key = self.gateway.create_listen_key(self.market)
+        self._host = USER_WS_HOSTS[self.market] + self.listen_key
+        if self._ws:
+            run_coroutine_threadsafe(self._ws.close(), self._loop)
+
+    def on_connected(self) -> None:
+        """连接成功回报"""
+        logging.info(f"用户数据Websocket API连接成功 {self.market}")
+
+    def on_packet(self, packet: dict) -> None:
+        """推送数据回报, 单个事件解析失败只记录日志, 不影响连接"""
+        event = packet.get('e', None)
+        try:
+            self._on_event(event, packet)
+        except Exception as e:
+            logging.error(f'Failed to handle {event} event {self.market}: {e!r}, {packet}')
+
+    def _on_event(self, event: str, packet: dict) -> None:
+        if event == 'executionReport':
+            self.on_order(parse_execution_report(packet))
+        elif event == 'ORDER_TRADE_UPDATE':
+            self.on_order(parse_order_trade_update(packet, self.market))
+        elif event == 'ACCOUNT_UPDATE':
+            account, position = parse_account_update(packet, self.market)
+            if account:
+                self.on_account(account)
+            if position:
+                self.on_position(position)
+        elif event == 'outboundAccountPosition':
+            self.on_account(parse_account_position(packet))
+        elif event == 'listenKeyExpired':
+            logging.warning(f'listenKey expired {self.market}, renew')
+            self._renew.set()
+
+    def on_order(self, order: OrderData) -> None:
+        """订单更新回报"""
+        pass
+
+    def on_account(self, account: dict[str, AccountData]) -> None:
+        """资金更新回报, key与BinanceGateway.query_account一致"""
+        pass
+
+    def on_position(self, position: dict[str, PositionData]) -> None:
+        """持仓更新回报, key为cc_symbol"""
+        pass
@@ -0,0 +1,232 @@
+"""
+Bulk candle download into Parquet partitioned by symbol and date
+
+python -m gateway.bulk_download --out data --sym-type SWAP_USDT --timeframe 1m 1h --start 2023-01-01 --end 2023-02-01
+python -m gateway.bulk_download --out data --symbol BTC-USDT.SWPU ETH-USDT.SWPU --timeframe 5m --start 2023-01-01
+
+Files are laid out as <out>/<timeframe>/symbol=<cc_symbol>/date=<YYYY-MM-DD>/candles.parquet (requires pyarrow).
+Only closed UTC days are written and each day is written atomically, an interrupted run resumes from the missing days.
+A day is written only when the response covers it, i.e. candles up to its end were returned, or REST confirms there is
+no candle left in the task (before listing, after delisting). A day counts as done when its file holds a full day of
+candles or carries the complete flag, so short files from failed runs are downloaded again.
+"""
+import argparse
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from .binance import BinanceGateway
+from .candle import CANDLE_COLUMNS
+from .constant import SymbolType
+from .util import get_timeframe_delta
+
+DAY_MS = 86400000
+CHUNK_DAYS = 7  # 每个下载任务最多覆盖的天数, 也是中断时最多重新下载的天数
+DOWNLOAD_WORKERS = 8  # 同时下载的任务数, 实际请求速率由gateway的RequestScheduler限制
+PARTITION_FILE = 'candles.parquet'
+COMPLETE_KEY = b'gateway.complete'  # Parquet元数据标记, 表示该天已被完整覆盖, K线数少于整天(上线、停机)也不再下载
+
+# (cc_symbol, timeframe, 起始日期ms, 结束日期ms)
+DownloadTask = tuple[str, str, int, int]
+
+
+def get_partition_path(out_dir: str, cc_symbol: str, timeframe: str, day_ms: int) -> str:
+    date = datetime.fromtimestamp(day_ms / 1000, tz=timezone.utc).strftime('%Y-%m-%d')
+    return os.path.join(out_dir, timeframe, f'symbol={cc_symbol}', f'date={date}', PARTITION_FILE)
+
+
+def get_timeframe_ms(timeframe: str) -> int:
+    return int(get_timeframe_delta(timeframe).total_seconds()) * 1000
+
+
+def is_partition_complete(path: str, timeframe_ms: int) -> bool:
+    """
+    Whether a partition file exists and holds a full day of candles or carries the complete flag
+    """
+    if not os.path.exists(path):
+        return False
+    import pyarrow.parquet as pq
+    try:
+        meta = pq.read_metadata(path)
+    except Exception as e:
+        logging.warning(f'Invalid partition {path}: {e}')
+        return False
+    flags = meta.metadata or dict()
+    return flags.get(COMPLETE_KEY) == b'1' or meta.num_rows >= max(1, DAY_MS // timeframe_ms)
+
+
+def resolve_universe(gateway: BinanceGateway, sym_types: list[SymbolType]) -> list[str]:
+    """
+    All listed symbols of the given symbol types
+    """
+    symbols = gateway.query_symbol(sym_types)
+    return sorted(s for s in symbols if gateway.convert_symbol_cc_to_exg(s)[1] in sym_types)
+
+
+def plan_tasks(out_dir: str, cc_symbols: list[str], timeframes: list[str], start_ms: int,
+               end_ms: int) -> list[DownloadTask]:
+    """
+    Group the days without a complete partition file into runs of at most CHUNK_DAYS consecutive days
+    """
+    tasks = []
+    for cc_symbol in cc_symbols:
+        for timeframe in timeframes:
+            timeframe_ms = get_timeframe_ms(timeframe)
+            run_start = None
+            for day_ms in range(start_ms, end_ms, DAY_MS):
+                path = get_partition_path(out_dir, cc_symbol, timeframe, day_ms)
+                done = is_partition_complete(path, timeframe_ms)
+                if not done and run_start is None:
+                    run_start = day_ms
+                if run_start is not None and (done or day_ms + DAY_MS - run_start >= CHUNK_DAYS * DAY_MS):
+                    tasks.append((cc_symbol, timeframe, run_start, day_ms if done else day_ms + DAY_MS))
+                    run_start = None
+            if run_start is not None:
+                tasks.append((cc_symbol, timeframe, run_start, end_ms))
+    return tasks
+
+
+def get_covered_ms(arrays: dict[str, np.ndarray], start_ms: int, timeframe: str) -> int:
+    """
+    End of the range covered by the returned candles, start_ms if there is none
+    """
+    begin = arrays['candle_begin_time']
+    return int(begin[-1]) + get_timeframe_ms(timeframe) if len(begin) else start_ms
+
+
+def write_partitions(out_dir: str,
+                     cc_symbol: str,
+                     timeframe: str,
+                     start_ms: int,
+                     end_ms: int,
+                     arrays: dict[str, np.ndarray],
+                     covered_ms: Optional[int] = None) -> int:
+    """
+    Split candles by UTC day and write one file per day, return the number of candles written
+
+    Only days ending no later than covered_ms are written, by default the end of the last returned candle. Those are
+    flagged complete even when short or empty (before listing, maintenance). Later days are left for the next run.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    begin = arrays['candle_begin_time']
+    if covered_ms is None:
+        covered_ms = get_covered_ms(arrays, start_ms, timeframe)
+    num_written = 0
+    for day_ms in range(start_ms, end_ms, DAY_MS):
+        if day_ms + DAY_MS > covered_ms:
+            break
+        lo, hi = np.searchsorted(begin, day_ms, 'left'), np.searchsorted(begin, day_ms + DAY_MS, 'left')
+        path = get_partition_path(out_dir, cc_symbol, timeframe, day_ms)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        df = pd.DataFrame({col: arrays[col][lo:hi] for col in CANDLE_COLUMNS})
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        table = table.replace_schema_metadata({**(table.schema.metadata or dict()), COMPLETE_KEY: b'1'})
+        # 先写临时文件再替换, 已存在的分区文件总是完整的
+        pq.write_table(table, path + '.tmp')
+        os.replace(path + '.tmp', path)
+        num_written += hi - lo
+    return int(num_written)
+
+
+class BulkDownloader:
+    """
+    Download candles of many symbols and timeframes concurrently, resuming from existing partitions
+
+    Requests go through the gateway's RequestScheduler, so num_workers only bounds the tasks in flight
+    while the request weight stays within the exchange limits.
+    """
+
+    def __init__(self, gateway: BinanceGateway, out_dir: str, num_workers: int = DOWNLOAD_WORKERS):
+        self.gateway = gateway
+        self.out_dir = out_dir
+        self.num_workers = num_workers
+        self._lock = threading.Lock()
+        self.num_candles = 0
+
+    def _run_task(self, task: DownloadTask) -> int:
+        cc_symbol, timeframe, start_ms, end_ms = task
+        start = datetime.fromtimestamp(start_ms / 1000, tz=timezone.utc)
+        end = datetime.fromtimestamp(end_ms / 1000, tz=timezone.utc)
+        arrays = self.gateway.query_candle(cc_symbol, start, end, timeframe, fmt='numpy')
+        covered_ms = get_covered_ms(arrays, start_ms, timeframe)
+        if covered_ms < end_ms:
+            # 返回的K线未到任务结束, 之后的第一根K线也不在任务内时, 剩余的天确实没有数据(尚未上线或已下架)
+            next_ms = self.gateway.query_first_candle_ms(cc_symbol, covered_ms, timeframe)
+            if next_ms is None or next_ms >= end_ms:
+                covered_ms = end_ms
+        return write_partitions(self.out_dir, cc_symbol, timeframe, start_ms, end_ms, arrays, covered_ms)
+
+    def download(self, cc_symbols: list[str], timeframes: list[str], start: datetime,
+                 end: Optional[datetime] = None) -> int:
+        """
+        Download start <= candle_begin_time < end by UTC days, return the number of candles downloaded
+        The end is clamped to the start of the current UTC day, so only closed days are written
+        """
+        today_ms = int(time.time() * 1000) // DAY_MS * DAY_MS
+        start_ms = int(start.timestamp() * 1000) // DAY_MS * DAY_MS
+        end_ms = today_ms if end is None else min(int(end.timestamp() * 1000) // DAY_MS * DAY_MS, today_ms)
+
+        tasks = plan_tasks(self.out_dir, cc_symbols, timeframes, start_ms, end_ms)
+        logging.info(f'{len(tasks)} tasks for {len(cc_symbols)} symbols x {len(timeframes)} timeframes')
+
+        t_start = time.perf_counter()
+        num_done = num_failed = 0
+        with ThreadPoolExecutor(max_workers=max(1, self.num_workers), thread_name_prefix='bulk_download') as executor:
+            futures = {executor.submit(self._run_task, task): task for task in tasks}
+            for future in as_completed(futures):
+                cc_symbol, timeframe, _, _ = futures[future]
+                try:
+                    n = future.result()
+                except Exception as e:
+                    num_failed += 1
+                    logging.warning(f'Failed to download {cc_symbol} {timeframe}: {e}')
+                    continue
+                num_done += 1
+                with self._lock:
+                    self.num_candles += n
+                elapsed = time.perf_counter() - t_start
+                logging.info(f'{num_done}/{len(tasks)} {cc_symbol} {timeframe} +{n}, '
+                             f'{self.num_candles / elapsed:.0f} candles/s')
+
+        elapsed = time.perf_counter() - t_start
+        logging.info(f'Downloaded {self.num_candles} candles in {elapsed:.1f}s, '
+                     f'{self.num_candles / max(elapsed, 1e-9):.0f} candles/s, {num_failed} tasks failed')
+        return self.num_candles
+
+
+def parse_date(s: str) -> datetime:
+    return datetime.strptime(s, '%Y-%m-%d').replace(tzinfo=timezone.utc)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Bulk candle download into Parquet partitioned by symbol and date')
+    parser.add_argument('--out', required=True, help='Output directory')
+    universe = parser.add_mutually_exclusive_group(required=True)
+    universe.add_argument('--sym-type', nargs='+', choices=[t.name for t in SymbolType], help='Symbol types')
+    universe.add_argument('--symbol', nargs='+', help='cc_symbols, e.g. BTC-USDT.SWPU')
+    parser.add_argument('--timeframe', nargs='+', default=['1m'], help='Timeframes, e.g. 1m 1h')
+    parser.add_argument('--start', required=True, type=parse_date, help='Start date, YYYY-MM-DD (UTC)')
+    parser.add_argument('--end', type=parse_date, default=None, help='End date exclusive, defaults to today (UTC)')
+    parser.add_argument('--workers', type=int, default=DOWNLOAD_WORKERS, help='Download tasks in flight')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+    gateway = BinanceGateway()
+    if args.symbol:
+        cc_symbols = args.symbol
+    else:
+        cc_symbols = resolve_universe(gateway, [SymbolType[t] for t in args.sym_type])
+    BulkDownloader(gateway, args.out, args.workers).download(cc_symbols, args.timeframe, args.start, args.end)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+import numpy as np
+import pandas as pd
+
+from .batch import ColumnBatch
+from .constant import CandleData
+from .metrics import METRICS
+from .util import ms_to_datetime_index
+
+CANDLE_COLUMNS: list[str] = [
+    'candle_begin_time', 'candle_end_time', 'open', 'high', 'low', 'close', 'volume', 'turnover', 'num_trades',
+    'buy_vol', 'buy_turnover'
+]
+
+# 每一列在币安原始K线数组中的位置
+KLINE_FIELD_INDEX: dict[str, int] = {
+    'candle_begin_time': 0,
+    'open': 1,
+    'high': 2,
+    'low': 3,
+    'close': 4,
+    'volume': 5,
+    'candle_end_time': 6,
+    'turnover': 7,
+    'num_trades': 8,
+    'buy_vol': 9,
+    'buy_turnover': 10,
+}
+
+CANDLE_DTYPES: dict[str, type] = {
+    col: np.int64 if col in ('candle_begin_time', 'candle_end_time', 'num_trades') else np.float64
+    for col in CANDLE_COLUMNS
+}
+
+CANDLE_FORMATS = ('list', 'numpy', 'dataframe', 'batch')
+
+
+def empty_candle_arrays() -> dict[str, np.ndarray]:
+    return {col: np.empty(0, dtype=CANDLE_DTYPES[col]) for col in CANDLE_COLUMNS}
+
+
+@METRICS.timed('parse_seconds', func='parse_candle_arrays')
+def parse_candle_arrays(data: list[list]) -> dict[str, np.ndarray]:
+    """
+    Parse raw klines into typed columns in one vectorized pass
+    Timestamps are kept as int64 epoch milliseconds
+    """
+    if len(data) == 0:
+        return empty_candle_arrays()
+    # 一次转置后逐列构造, 避免经过字符串数组
+    fields = list(zip(*data))
+    return {col: np.array(fields[KLINE_FIELD_INDEX[col]], dtype=CANDLE_DTYPES[col]) for col in CANDLE_COLUMNS}
+
+
+def parse_candle_list(data: list[list]) -> list[CandleData]:
+    """
+    Parse raw klines straight into CandleData, faster than going through columns when a list is wanted
+    """
+    return [
+        CandleData(int(d[0]), int(d[6]), float(d[1]), float(d[2]), float(d[3]), float(d[4]), float(d[5]),
+                   float(d[7]), int(d[8]), float(d[9]), float(d[10])) for d in data
+    ]
+
+
+def candle_arrays_to_df(arrays: dict[str, np.ndarray]) -> pd.DataFrame:
+    return pd.DataFrame(arrays, columns=CANDLE_COLUMNS)
+
+
+def candle_arrays_to_list(arrays: dict[str, np.ndarray]) -> list[CandleData]:
+    columns = [arrays[col].tolist() for col in CANDLE_COLUMNS]
+    return [CandleData(*row) for row in zip(*columns)]
+
+
+class CandleBatch(ColumnBatch):
+    """
+    Array-backed candles, columns follow CANDLE_COLUMNS with int64 epoch millisecond timestamps
+    """
+    COLUMNS = CANDLE_COLUMNS
+    DTYPES = CANDLE_DTYPES
+
+    @classmethod
+    def from_candles(cls, candles: list[CandleData]) -> 'CandleBatch':
+        if not candles:
+            return cls.empty()
+        rows = [(c.candle_begin_ms, c.candle_end_ms, c.open, c.high, c.low, c.close, c.volume, c.turnover,
+                 c.num_trades, c.buy_vol, c.buy_turnover) for c in candles]
+        columns = list(zip(*rows))
+        return cls({col: np.array(values, dtype=CANDLE_DTYPES[col]) for col, values in zip(CANDLE_COLUMNS, columns)})
+
+    def to_list(self) -> list[CandleData]:
+        return candle_arrays_to_list(self.columns)
+
+    def candle_begin_times(self) -> pd.DatetimeIndex:
+        return ms_to_datetime_index(self.columns['candle_begin_time'])
+
+
+def format_candle_arrays(arrays: dict[str, np.ndarray], fmt: str = 'list'):
+    """
+    Convert candle columns to the requested format
+    'list': list of CandleData, 'numpy': dict of column name to np.ndarray, 'dataframe': pd.DataFrame,
+    'batch': CandleBatch
+    """
+    if fmt == 'list':
+        return candle_arrays_to_list(arrays)
+    if fmt == 'numpy':
+        return arrays
+    if fmt == 'dataframe':
+        return candle_arrays_to_df(arrays)
+    if fmt == 'batch':
+        return CandleBatch(arrays)
+    raise ValueError(f'Unknown candle format {fmt}, should be one of {CANDLE_FORMATS}')
+
+
+def format_candles(data: list[list], fmt: str = 'list'):
+    """
+    Convert raw klines to the requested format, see format_candle_arrays
+    """
+    if fmt == 'list':
+        return parse_candle_list(data)
+    return format_candle_arrays(parse_candle_arrays(data), fmt)
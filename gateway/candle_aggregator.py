@@ -0,0 +1,170 @@
+import logging
+from datetime import datetime
+from typing import Callable, Optional
+
+from .constant import CandleData
+from .util import get_timeframe_delta, ms_to_datetime
+
+# on_bar(timeframe, candle)
+BarCallback = Callable[[str, CandleData], None]
+
+
+def get_timeframe_ms(timeframe: str) -> int:
+    return int(get_timeframe_delta(timeframe).total_seconds()) * 1000
+
+
+class _Bar:
+    __slots__ = ('begin_ms', 'open', 'high', 'low', 'close', 'volume', 'turnover', 'num_trades', 'buy_vol',
+                 'buy_turnover')
+
+    def __init__(self, begin_ms: int, open: float):
+        self.begin_ms = begin_ms
+        self.open = self.high = self.low = self.close = open
+        self.volume = self.turnover = self.buy_vol = self.buy_turnover = 0.
+        self.num_trades = 0
+
+
+class CandleAggregator:
+    """
+    Incrementally build higher timeframe candles of one symbol from closed base candles or from trades
+
+    * Every update is O(1) per timeframe
+    * A bar is published as soon as its last base candle arrives, or when data of a later bar arrives
+    * With trades, bars are published on the first trade of the next bar or by calling on_time
+    * Feed either candles or trades into one aggregator, not both
+    * Bars without any candle or trade are not published, late data of published bars is ignored
+    """
+
+    def __init__(self, cc_symbol: str, timeframes: list[str], on_bar: Optional[BarCallback] = None,
+                 base_timeframe: str = '1m'):
+        self.cc_symbol = cc_symbol
+        self.base_timeframe = base_timeframe
+        self.base_ms = get_timeframe_ms(base_timeframe)
+        self.timeframes: dict[str, int] = {tf: get_timeframe_ms(tf) for tf in timeframes}
+        for tf, tf_ms in self.timeframes.items():
+            if tf_ms % self.base_ms != 0:
+                raise ValueError(f'Timeframe {tf} is not a multiple of {base_timeframe}')
+        if on_bar is not None:
+            self.on_bar = on_bar
+
+        self.bars: dict[str, Optional[_Bar]] = {tf: None for tf in timeframes}
+        self._closed_until: dict[str, int] = {tf: 0 for tf in timeframes}  # 已发布bar的结束时间
+        self._publish = True
+
+    def _get_bar(self, tf: str, tf_ms: int, ts: int, open: float) -> Optional[_Bar]:
+        """
+        Bar containing ts, None if the bar has already been published
+        """
+        begin_ms = ts - ts % tf_ms
+        if begin_ms < self._closed_until[tf]:
+            return None
+        bar = self.bars[tf]
+        if bar is not None and bar.begin_ms != begin_ms:
+            if begin_ms < bar.begin_ms:
+                return None
+            self._close(tf, tf_ms, bar)
+            bar = None
+        if bar is None:
+            bar = self.bars[tf] = _Bar(begin_ms, open)
+        return bar
+
+    def _close(self, tf: str, tf_ms: int, bar: _Bar):
+        self.bars[tf] = None
+        self._closed_until[tf] = bar.begin_ms + tf_ms
+        if self._publish:
+            self.on_bar(tf, self._to_candle(bar, tf_ms))
+
+    def _to_candle(self, bar: _Bar, tf_ms: int) -> CandleData:
+        return CandleData(bar.begin_ms, bar.begin_ms + tf_ms - 1, bar.open, bar.high, bar.low, bar.close, bar.volume,
+                          bar.turnover, bar.num_trades, bar.buy_vol, bar.buy_turnover)
+
+    def update_row(self, row: tuple):
+        """
+        Add one closed base candle as a tuple ordered by CANDLE_COLUMNS, times in epoch milliseconds
+        """
+        begin_ms, end_ms, o, h, l, c, volume, turnover, num_trades, buy_vol, buy_turnover = row
+        for tf, tf_ms in self.timeframes.items():
+            bar = self._get_bar(tf, tf_ms, begin_ms, o)
+            if bar is None:
+                continue
+            bar.high = max(bar.high, h)
+            bar.low = min(bar.low, l)
+            bar.close = c
+            bar.volume += volume
+            bar.turnover += turnover
+            bar.num_trades += num_trades
+            bar.buy_vol += buy_vol
+            bar.buy_turnover += buy_turnover
+            if end_ms + 1 >= bar.begin_ms + tf_ms:  # 最后一根基础K线已收盘
+                self._close(tf, tf_ms, bar)
+
+    def update_candle(self, candle: CandleData):
+        """
+        Add one closed base candle
+        """
+        c = candle
+        self.update_row((c.candle_begin_ms, c.candle_end_ms, c.open, c.high, c.low, c.close, c.volume, c.turnover,
+                         c.num_trades, c.buy_vol, c.buy_turnover))
+
+    def update_trade(self, trade_time: int, price: float, size: float, is_buyer_maker: bool, num_trades: int = 1):
+        """
+        Add one trade, trade_time in epoch milliseconds
+        For aggTrades num_trades is last_trade_id - first_trade_id + 1
+        """
+        turnover = price * size
+        for tf, tf_ms in self.timeframes.items():
+            bar = self._get_bar(tf, tf_ms, trade_time, price)
+            if bar is None:
+                continue
+            if price > bar.high:
+                bar.high = price
+            elif price < bar.low:
+                bar.low = price
+            bar.close = price
+            bar.volume += size
+            bar.turnover += turnover
+            bar.num_trades += num_trades
+            if not is_buyer_maker:  # 主动买入
+                bar.buy_vol += size
+                bar.buy_turnover += turnover
+
+    def update_agg_trade(self, trade):
+        """
+        Add one AggTradeEvent from gateway.decoder
+        """
+        self.update_trade(trade.trade_time, trade.price, trade.size, trade.is_buyer_maker,
+                          trade.last_trade_id - trade.first_trade_id + 1)
+
+    def on_time(self, now_ms: int):
+        """
+        Publish bars which ended before now_ms, used with trade updates
+        """
+        for tf, tf_ms in self.timeframes.items():
+            bar = self.bars[tf]
+            if bar is not None and bar.begin_ms + tf_ms <= now_ms:
+                self._close(tf, tf_ms, bar)
+
+    def backfill(self, gateway, now: datetime):
+        """
+        Load the closed base candles of all unfinished bars through REST, called once at startup
+        Bars already finished before now are not published
+        """
+        now_ms = int(now.timestamp() * 1000)
+        start_ms = min(now_ms - now_ms % tf_ms for tf_ms in self.timeframes.values())
+        arrays = gateway.query_candle(self.cc_symbol, ms_to_datetime(start_ms), now,
+                                      self.base_timeframe, fmt='numpy')
+        closed = arrays['candle_end_time'] < now_ms
+        rows = zip(*[arrays[col][closed].tolist() for col in arrays])
+        self._publish = False
+        try:
+            for row in rows:
+                self.update_row(row)
+        finally:
+            self._publish = True
+        logging.info(f'{self.cc_symbol} candle aggregator backfilled {int(closed.sum())} {self.base_timeframe} candles')
+
+    def on_bar(self, timeframe: str, candle: CandleData):
+        """
+        Bar closed callback
+        """
+        pass
@@ -0,0 +1,144 @@
+import json
+import os
+import threading
+import time
+from typing import Callable
+
+import numpy as np
+import pandas as pd
+
+from .candle import CANDLE_COLUMNS, empty_candle_arrays
+from .util import get_timeframe_delta
+
+Interval = tuple[int, int]  # [start_ms, end_ms)
+CandleFetcher = Callable[[int, int], dict[str, np.ndarray]]
+
+
+def merge_intervals(intervals: list[Interval]) -> list[Interval]:
+    """
+    Merge overlapping or adjacent intervals
+    """
+    merged: list[list[int]] = []
+    for start, end in sorted(intervals):
+        if start >= end:
+            continue
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return [(s, e) for s, e in merged]
+
+
+def subtract_intervals(target: Interval, covered: list[Interval]) -> list[Interval]:
+    """
+    Parts of target not covered by any interval in covered
+    """
+    start, end = target
+    missing = []
+    for s, e in merge_intervals(covered):
+        if e <= start:
+            continue
+        if s >= end:
+            break
+        if s > start:
+            missing.append((start, s))
+        start = max(start, e)
+    if start < end:
+        missing.append((start, end))
+    return missing
+
+
+def concat_candle_arrays(arrays: list[dict[str, np.ndarray]]) -> dict[str, np.ndarray]:
+    """
+    Concatenate candle columns, sort by candle_begin_time and drop duplicated candles (later ones win)
+    """
+    arrays = [a for a in arrays if len(a['candle_begin_time'])]
+    if not arrays:
+        return empty_candle_arrays()
+    merged = {col: np.concatenate([a[col] for a in arrays]) for col in CANDLE_COLUMNS}
+    begin = merged['candle_begin_time']
+    # 倒序后np.unique取到的是每个时间最后出现的K线
+    _, idx = np.unique(begin[::-1], return_index=True)
+    idx = len(begin) - 1 - idx
+    return {col: merged[col][idx] for col in CANDLE_COLUMNS}
+
+
+def slice_candle_arrays(arrays: dict[str, np.ndarray], start_ms: int, end_ms: int) -> dict[str, np.ndarray]:
+    begin = arrays['candle_begin_time']
+    lo, hi = np.searchsorted(begin, start_ms, 'left'), np.searchsorted(begin, end_ms, 'left')
+    return {col: arrays[col][lo:hi] for col in CANDLE_COLUMNS}
+
+
+class CandleCache:
+    """
+    Persistent on-disk candle store, one Parquet file per cc_symbol and timeframe (requires pyarrow)
+
+    A json sidecar records the intervals already downloaded, so only missing ranges are fetched.
+    Closed candles are persisted, the still-open final candle is always fetched and never stored.
+    """
+
+    def __init__(self, root_dir: str):
+        self.root_dir = root_dir
+        self._lock = threading.Lock()  # 保护_key_locks
+        self._key_locks: dict[tuple[str, str], threading.Lock] = dict()
+        os.makedirs(root_dir, exist_ok=True)
+
+    def _key_lock(self, cc_symbol: str, timeframe: str) -> threading.Lock:
+        """
+        Lock of one cc_symbol and timeframe, gap fills of different symbols run concurrently
+        """
+        with self._lock:
+            return self._key_locks.setdefault((cc_symbol, timeframe), threading.Lock())
+
+    def _paths(self, cc_symbol: str, timeframe: str) -> tuple[str, str]:
+        name = f'{cc_symbol}_{timeframe}'
+        return os.path.join(self.root_dir, f'{name}.parquet'), os.path.join(self.root_dir, f'{name}.json')
+
+    def load(self, cc_symbol: str, timeframe: str) -> tuple[dict[str, np.ndarray], list[Interval]]:
+        data_path, meta_path = self._paths(cc_symbol, timeframe)
+        if not os.path.exists(data_path) or not os.path.exists(meta_path):
+            return empty_candle_arrays(), []
+        df = pd.read_parquet(data_path)
+        with open(meta_path) as f:
+            intervals = [tuple(x) for x in json.load(f)['intervals']]
+        return {col: df[col].to_numpy() for col in CANDLE_COLUMNS}, intervals
+
+    def save(self, cc_symbol: str, timeframe: str, arrays: dict[str, np.ndarray], intervals: list[Interval]):
+        data_path, meta_path = self._paths(cc_symbol, timeframe)
+        # 先写临时文件再替换, 避免进程中断留下损坏的缓存
+        pd.DataFrame(arrays, columns=CANDLE_COLUMNS).to_parquet(data_path + '.tmp', index=False)
+        with open(meta_path + '.tmp', 'w') as f:
+            json.dump({'intervals': merge_intervals(intervals)}, f)
+        os.replace(data_path + '.tmp', data_path)
+        os.replace(meta_path + '.tmp', meta_path)
+
+    def missing_intervals(self, cc_symbol: str, timeframe: str, start_ms: int, end_ms: int) -> list[Interval]:
+        _, intervals = self.load(cc_symbol, timeframe)
+        return subtract_intervals((start_ms, end_ms), intervals)
+
+    def get(self, cc_symbol: str, timeframe: str, start_ms: int, end_ms: int,
+            fetch: CandleFetcher) -> dict[str, np.ndarray]:
+        """
+        Candles with start_ms <= candle_begin_time < end_ms
+        fetch(start_ms, end_ms) is called only for ranges missing from the cache and for the open candle
+        """
+        timeframe_ms = int(get_timeframe_delta(timeframe).total_seconds()) * 1000
+        start_ms = -(-start_ms // timeframe_ms) * timeframe_ms
+        # 开始时间小于open_begin的K线都已收盘
+        open_begin = int(time.time() * 1000) // timeframe_ms * timeframe_ms
+        closed_end = min(end_ms, open_begin)
+
+        with self._key_lock(cc_symbol, timeframe):
+            arrays, intervals = self.load(cc_symbol, timeframe)
+            missing = subtract_intervals((start_ms, closed_end), intervals)
+            if missing:
+                fetched = [fetch(s, e) for s, e in missing]
+                closed = [slice_candle_arrays(a, s, e) for a, (s, e) in zip(fetched, missing)]
+                arrays = concat_candle_arrays([arrays] + closed)
+                intervals = merge_intervals(intervals + missing)
+                self.save(cc_symbol, timeframe, arrays, intervals)
+
+        result = slice_candle_arrays(arrays, start_ms, closed_end)
+        if max(start_ms, open_begin) < end_ms:
+            result = concat_candle_arrays([result, fetch(max(start_ms, open_begin), end_ms)])
+        return result
@@ -1,9 +1,13 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from .type import Direction, OrderType, OrderStatus
 from datetime import datetime
 
+import pandas as pd
 
-@dataclass
+from ..util import ms_to_datetime, tick_to_int
+
+
+@dataclass(slots=True)
 class AccountData:
     """
     Account data contains information about equity and balance
@@ -15,7 +19,7 @@ class AccountData:
     unrealized_pnl: float = 0
 
 
-@dataclass
+@dataclass(slots=True)
 class PositionData:
     """
     Positon data is used for tracking each individual position holding
@@ -29,7 +33,7 @@ class PositionData:
     unrealized_pnl: float = 0
 
 
-@dataclass
+@dataclass(slots=True)
 class SymbolData:
     """
     Symbol data contains basic information about each symbol
@@ -40,8 +44,18 @@ class SymbolData:
     price_tick: float
     face_value: float
 
+    # tick = tick_int * 10 ** -scale, 用于整数精度的批量取整
+    price_tick_int: int = field(init=False)
+    price_scale: int = field(init=False)
+    size_tick_int: int = field(init=False)
+    size_scale: int = field(init=False)
+
+    def __post_init__(self):
+        self.price_tick_int, self.price_scale = tick_to_int(self.price_tick)
+        self.size_tick_int, self.size_scale = tick_to_int(self.size_tick)
 
-@dataclass
+
+@dataclass(slots=True)
 class OrderData:
     """
     Order data contains information for tracking lastest status of a specific order.
@@ -49,7 +63,7 @@ class OrderData:
 
     cc_symbol: str
     order_id: str
-    timestamp: datetime
+    timestamp_ms: int  # epoch毫秒, 0表示未知(如撤单回报), 保持int以便按列存储
 
     type: OrderType
     direction: Direction
@@ -61,9 +75,17 @@ class OrderData:
     filled_size: float = 0
 
     cliend_order_id: str = ""
+    error_msg: str = ""  # 下单失败原因
+
+    @property
+    def timestamp(self) -> datetime:
+        """
+        UTC datetime, pd.NaT when timestamp_ms is unknown, as the timestamp field was before
+        """
+        return ms_to_datetime(self.timestamp_ms) if self.timestamp_ms else pd.NaT
 
 
-@dataclass
+@dataclass(slots=True)
 class OrderbookData:
     """
     Orderbook data
@@ -74,13 +96,13 @@ class OrderbookData:
     bid_sizes: list[float]
 
 
-@dataclass
+@dataclass(slots=True)
 class CandleData:
     """
-    Orderbook data
+    Candlestick data
     """
-    candle_begin_time: datetime
-    caldne_end_time: datetime
+    candle_begin_ms: int  # epoch毫秒
+    candle_end_ms: int
     open: float
     high: float
     low: float
@@ -90,3 +112,16 @@ class CandleData:
     num_trades: int
     buy_vol: float
     buy_turnover: float
+
+    @property
+    def candle_begin_time(self) -> datetime:
+        return ms_to_datetime(self.candle_begin_ms)
+
+    @property
+    def candle_end_time(self) -> datetime:
+        return ms_to_datetime(self.candle_end_ms)
+
+    @property
+    def caldne_end_time(self) -> datetime:
+        # 兼容旧字段名
+        return self.candle_end_time
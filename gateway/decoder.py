@@ -0,0 +1,269 @@
+"""
+Websocket frame decoders
+
+A decoder turns one raw text frame into the packet passed to WebsocketClient.on_packet.
+Combined stream frames look like {"stream":"btcusdt@kline_1m","data":{...}}, so the stream name can be
+read from the frame prefix and unwanted frames dropped before the full parse.
+With msgspec installed, TypedDecoder validates and converts typed channels straight into msgspec.Struct schemas,
+without building intermediate dicts.
+"""
+import json
+from typing import Callable, NamedTuple, Optional
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+STREAM_PREFIX = '{"stream":"'
+
+
+def get_loads() -> Callable[[str], dict]:
+    """
+    Fastest available json parser: msgspec > orjson > json
+    """
+    if msgspec is not None:
+        return msgspec.json.Decoder().decode
+    if orjson is not None:
+        return orjson.loads
+    return json.loads
+
+
+def get_stream(text: str) -> Optional[str]:
+    """
+    Stream name of a combined stream frame without parsing it, None for other frames
+    """
+    if not text.startswith(STREAM_PREFIX):
+        return None
+    start = len(STREAM_PREFIX)
+    return text[start:text.find('"', start)]
+
+
+def get_channel(stream: str) -> str:
+    """
+    btcusdt@kline_1m -> kline, btcusdt@depth@100ms -> depth, btcusdt@bookTicker -> bookTicker
+    """
+    channel = stream.split('@', 2)[1] if '@' in stream else stream
+    return channel.split('_', 1)[0]
+
+
+class KlineEvent(NamedTuple):
+    event_time: int
+    symbol: str
+    interval: str
+    start_time: int
+    end_time: int
+    open: float
+    high: float
+    low: float
+    close: float
+    volume: float
+    turnover: float
+    num_trades: int
+    buy_vol: float
+    buy_turnover: float
+    closed: bool
+
+
+class BookTickerEvent(NamedTuple):
+    update_id: int
+    symbol: str
+    bid_price: float
+    bid_size: float
+    ask_price: float
+    ask_size: float
+    event_time: int  # 现货无此字段, 为0
+
+
+class DepthEvent(NamedTuple):
+    event_time: int
+    symbol: str
+    first_id: int
+    final_id: int
+    prev_final_id: Optional[int]  # 仅合约
+    bids: list[tuple[float, float]]
+    asks: list[tuple[float, float]]
+
+
+class AggTradeEvent(NamedTuple):
+    event_time: int
+    symbol: str
+    agg_id: int
+    price: float
+    size: float
+    first_trade_id: int
+    last_trade_id: int
+    trade_time: int
+    is_buyer_maker: bool
+
+
+def parse_kline(d: dict) -> KlineEvent:
+    k = d['k']
+    return KlineEvent(d['E'], d['s'], k['i'], k['t'], k['T'], float(k['o']), float(k['h']), float(k['l']),
+                      float(k['c']), float(k['v']), float(k['q']), k['n'], float(k['V']), float(k['Q']), k['x'])
+
+
+def parse_book_ticker(d: dict) -> BookTickerEvent:
+    return BookTickerEvent(d['u'], d['s'], float(d['b']), float(d['B']), float(d['a']), float(d['A']), d.get('E', 0))
+
+
+def parse_depth(d: dict) -> DepthEvent:
+    bids = [(float(p), float(s)) for p, s in d['b']]
+    asks = [(float(p), float(s)) for p, s in d['a']]
+    return DepthEvent(d['E'], d['s'], d['U'], d['u'], d.get('pu'), bids, asks)
+
+
+def parse_agg_trade(d: dict) -> AggTradeEvent:
+    return AggTradeEvent(d['E'], d['s'], d['a'], float(d['p']), float(d['q']), d['f'], d['l'], d['T'], d['m'])
+
+
+EVENT_PARSERS: dict[str, Callable[[dict], NamedTuple]] = {
+    'kline': parse_kline,
+    'bookTicker': parse_book_ticker,
+    'depth': parse_depth,
+    'aggTrade': parse_agg_trade,
+}
+
+
+if msgspec is not None:
+
+    class _Kline(msgspec.Struct):
+        i: str
+        t: int
+        T: int
+        o: float
+        h: float
+        l: float
+        c: float
+        v: float
+        q: float
+        n: int
+        V: float
+        Q: float
+        x: bool
+
+    class _KlinePayload(msgspec.Struct):
+        E: int
+        s: str
+        k: _Kline
+
+    class _BookTickerPayload(msgspec.Struct):
+        u: int
+        s: str
+        b: float
+        B: float
+        a: float
+        A: float
+        E: int = 0
+
+    class _DepthPayload(msgspec.Struct):
+        E: int
+        s: str
+        U: int
+        u: int
+        b: list[tuple[float, float]]
+        a: list[tuple[float, float]]
+        pu: Optional[int] = None
+
+    class _AggTradePayload(msgspec.Struct):
+        E: int
+        s: str
+        a: int
+        p: float
+        q: float
+        f: int
+        l: int
+        T: int
+        m: bool
+
+    class _KlineFrame(msgspec.Struct):
+        data: _KlinePayload
+
+    class _BookTickerFrame(msgspec.Struct):
+        data: _BookTickerPayload
+
+    class _DepthFrame(msgspec.Struct):
+        data: _DepthPayload
+
+    class _AggTradeFrame(msgspec.Struct):
+        data: _AggTradePayload
+
+    def _kline_from_struct(d) -> KlineEvent:
+        k = d.k
+        return KlineEvent(d.E, d.s, k.i, k.t, k.T, k.o, k.h, k.l, k.c, k.v, k.q, k.n, k.V, k.Q, k.x)
+
+    # channel -> (combined frame schema, schema to event), strict=False converts the string prices to float
+    STRUCT_SCHEMAS: dict[str, tuple[type, Callable]] = {
+        'kline': (_KlineFrame, _kline_from_struct),
+        'bookTicker': (_BookTickerFrame, lambda d: BookTickerEvent(d.u, d.s, d.b, d.B, d.a, d.A, d.E)),
+        'depth': (_DepthFrame, lambda d: DepthEvent(d.E, d.s, d.U, d.u, d.pu, d.b, d.a)),
+        'aggTrade': (_AggTradeFrame, lambda d: AggTradeEvent(d.E, d.s, d.a, d.p, d.q, d.f, d.l, d.T, d.m)),
+    }
+
+
+def get_struct_decoders() -> dict[str, Callable[[str], NamedTuple]]:
+    """
+    Per channel functions decoding a combined stream frame straight into its event, empty without msgspec
+    """
+    if msgspec is None:
+        return dict()
+    decoders = dict()
+    for channel, (schema, to_event) in STRUCT_SCHEMAS.items():
+        decode = msgspec.json.Decoder(schema, strict=False).decode
+        decoders[channel] = lambda text, decode=decode, to_event=to_event: to_event(decode(text).data)
+    return decoders
+
+
+class JsonDecoder:
+    """
+    Plain json decoding into dicts, using the fastest available parser
+    """
+
+    def __init__(self):
+        self._loads = get_loads()
+
+    def decode(self, text: str) -> Optional[dict]:
+        return self._loads(text)
+
+
+class TypedDecoder:
+    """
+    Decode kline, bookTicker, depth and aggTrade payloads into typed NamedTuple events
+
+    * channels: only frames of these channels are parsed, others are dropped before parsing
+    * frames of channels without a parser, and non-stream frames such as subscribe responses, keep dict payloads
+    * with msgspec and no explicit loads, typed channels are decoded through msgspec.Struct schemas,
+      otherwise loads builds a dict which EVENT_PARSERS converts
+    """
+
+    def __init__(self, channels: Optional[set[str]] = None, loads: Optional[Callable[[str], dict]] = None):
+        self.channels = channels
+        self._struct_decoders = get_struct_decoders() if loads is None else dict()
+        self._loads = loads or get_loads()
+        self._channel_cache: dict[str, str] = dict()
+
+    def decode(self, text: str) -> Optional[dict]:
+        stream = get_stream(text)
+        if stream is None:
+            return self._loads(text)
+
+        channel = self._channel_cache.get(stream)
+        if channel is None:
+            channel = self._channel_cache[stream] = get_channel(stream)
+        if self.channels is not None and channel not in self.channels:
+            return None
+
+        struct_decode = self._struct_decoders.get(channel)
+        if struct_decode is not None:
+            return {'stream': stream, 'data': struct_decode(text)}
+
+        packet = self._loads(text)
+        parser = EVENT_PARSERS.get(channel)
+        if parser is not None:
+            packet['data'] = parser(packet['data'])
+        return packet
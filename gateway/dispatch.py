@@ -0,0 +1,242 @@
+import asyncio
+import logging
+import threading
+import time
+import zlib
+from collections import deque
+from dataclasses import dataclass
+from enum import Enum
+from typing import Callable, Optional
+
+from .decoder import get_channel
+from .metrics import METRICS
+
+DEFAULT_QUEUE_SIZE = 10000  # 每个stream的最大缓存数
+
+
+class DispatchPolicy(Enum):
+    CONFLATE = 'conflate'  # 只保留最新一条, 适用于bookTicker等快照类数据
+    DROP_OLDEST = 'drop_oldest'  # 队列满时丢弃最旧的数据
+    BLOCK = 'block'  # 队列满时等待处理, 适用于不可丢失的数据. 事件循环中须使用put_async, 只暂停该连接的接收
+
+
+@dataclass
+class StreamStats:
+    """
+    Counters of one stream, lag is the time between receive and handler start in seconds
+    """
+    received: int = 0
+    processed: int = 0
+    dropped: int = 0  # 被丢弃或被合并的数据数
+    last_lag: float = 0
+    max_lag: float = 0
+
+
+class _StreamBuffer:
+
+    def __init__(self, policy: DispatchPolicy, maxsize: int):
+        self.policy = policy
+        self.maxsize = 1 if policy == DispatchPolicy.CONFLATE else maxsize
+        self.items: deque = deque()
+        self.stats = StreamStats()
+
+
+class _Worker:
+
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.ready: deque = deque()  # 有待处理数据的stream, 轮询处理保证公平
+        self.busy = False  # 是否正在执行handler
+        self.async_waiters: list = []  # 等待BLOCK队列空位的 (loop, future)
+        self.thread: Optional[threading.Thread] = None
+
+
+class Dispatcher:
+    """
+    Decouple websocket receiving from packet handling
+
+    * Packets are buffered per stream in bounded queues, the full-queue behaviour is set per stream or per channel
+    * A stream is always handled by the same worker thread, so packets of one stream keep their order
+    * The receive loop only waits on handlers when a BLOCK stream is full. On an event loop, put_async awaits the space,
+      so a full stream pauses only its own connection, a blocking put there is refused
+    * With metrics enabled, the time from receive to handler completion is recorded as ws_handler_seconds{client=name}
+    """
+
+    def __init__(self,
+                 handler: Callable[[dict], None],
+                 num_workers: int = 1,
+                 maxsize: int = DEFAULT_QUEUE_SIZE,
+                 default_policy: DispatchPolicy = DispatchPolicy.DROP_OLDEST,
+                 policies: Optional[dict[str, DispatchPolicy]] = None,
+                 name: str = 'dispatch'):
+        """
+        policies: 按stream名(如btcusdt@bookTicker)或channel(如bookTicker, kline)设置的队列策略
+        name: 指标标签和线程名前缀, 通常为websocket客户端的类名
+        """
+        self.handler = handler
+        self.name = name
+        self._handler_hist = METRICS.histogram('ws_handler_seconds', client=name)
+        self.maxsize = maxsize
+        self.default_policy = default_policy
+        self.policies = policies or dict()
+
+        self._workers = [_Worker() for _ in range(num_workers)]
+        self._buffers: dict[str, _StreamBuffer] = dict()
+        self._stream_worker: dict[str, _Worker] = dict()
+        self._lock = threading.Lock()
+        self._active = False
+
+    def _get_policy(self, stream: str) -> DispatchPolicy:
+        policy = self.policies.get(stream)
+        if policy is None:
+            policy = self.policies.get(get_channel(stream), self.default_policy)
+        return policy
+
+    def _get_buffer(self, stream: str) -> tuple[_StreamBuffer, _Worker]:
+        buf = self._buffers.get(stream)
+        if buf is not None:
+            return buf, self._stream_worker[stream]
+        with self._lock:
+            if stream not in self._buffers:
+                worker = self._workers[zlib.crc32(stream.encode()) % len(self._workers)]
+                self._stream_worker[stream] = worker
+                self._buffers[stream] = _StreamBuffer(self._get_policy(stream), self.maxsize)
+            return self._buffers[stream], self._stream_worker[stream]
+
+    def _offer(self, stream: str, buf: _StreamBuffer, worker: _Worker, item: tuple) -> bool:
+        """
+        Enqueue under worker.cond, return False when a full BLOCK stream has to wait
+        """
+        if buf.policy == DispatchPolicy.BLOCK and len(buf.items) >= buf.maxsize and self._active:
+            return False
+        if not buf.items:
+            worker.ready.append(stream)
+        elif len(buf.items) >= buf.maxsize:
+            buf.items.popleft()
+            buf.stats.dropped += 1
+        buf.items.append(item)
+        worker.cond.notify_all()
+        return True
+
+    def put(self, packet: dict):
+        """
+        Enqueue one packet from a plain thread, waits while a BLOCK stream is full
+        """
+        stream = packet.get('stream', '') if isinstance(packet, dict) else ''
+        buf, worker = self._get_buffer(stream)
+        item = (time.time(), time.perf_counter(), packet)
+        with worker.cond:
+            buf.stats.received += 1
+            while not self._offer(stream, buf, worker, item):
+                if _on_event_loop():
+                    raise RuntimeError(f'{self.name}: BLOCK stream {stream} is full, use put_async on event loops')
+                worker.cond.wait()
+
+    async def put_async(self, packet: dict):
+        """
+        Enqueue one packet from an event loop, awaits while a BLOCK stream is full without blocking the loop
+        """
+        stream = packet.get('stream', '') if isinstance(packet, dict) else ''
+        buf, worker = self._get_buffer(stream)
+        item = (time.time(), time.perf_counter(), packet)
+        with worker.cond:
+            buf.stats.received += 1
+            if self._offer(stream, buf, worker, item):
+                return
+        loop = asyncio.get_running_loop()
+        while True:
+            with worker.cond:
+                if self._offer(stream, buf, worker, item):
+                    return
+                waiter = loop.create_future()
+                worker.async_waiters.append((loop, waiter))
+            await waiter
+
+    def _run(self, worker: _Worker):
+        while True:
+            with worker.cond:
+                worker.busy = False
+                if not worker.ready:
+                    worker.cond.notify_all()  # 唤醒等待drain的线程
+                while self._active and not worker.ready:
+                    worker.cond.wait()
+                if not self._active:
+                    return
+                stream = worker.ready.popleft()
+                buf = self._buffers[stream]
+                recv_time, recv_perf, packet = buf.items.popleft()
+                if buf.items:
+                    worker.ready.append(stream)
+                worker.busy = True
+                worker.cond.notify_all()
+                if worker.async_waiters:
+                    _wake_async_waiters(worker)
+
+            lag = time.time() - recv_time
+            buf.stats.last_lag = lag
+            buf.stats.max_lag = max(buf.stats.max_lag, lag)
+            try:
+                self.handler(packet)
+            except Exception:
+                logging.exception(f'Dispatch handler failed, stream={stream}')
+            if METRICS.enabled:
+                self._handler_hist.record(time.perf_counter() - recv_perf)
+            buf.stats.processed += 1
+
+    def start(self):
+        if self._active:
+            return
+        self._active = True
+        for i, worker in enumerate(self._workers):
+            worker.thread = threading.Thread(target=self._run, args=(worker, ), name=f'{self.name}_{i}',
+                                             daemon=True)
+            worker.thread.start()
+
+    def drain(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait until every queued packet has been handled, return False on timeout
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for worker in self._workers:
+            with worker.cond:
+                while self._active and (worker.ready or worker.busy):
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        return False
+                    worker.cond.wait(remaining)
+        return True
+
+    def stop(self):
+        self._active = False
+        for worker in self._workers:
+            with worker.cond:
+                worker.cond.notify_all()
+                _wake_async_waiters(worker)
+
+    def queue_depth(self) -> dict[str, int]:
+        return {stream: len(buf.items) for stream, buf in list(self._buffers.items())}
+
+    def stats(self) -> dict[str, StreamStats]:
+        return {stream: buf.stats for stream, buf in list(self._buffers.items())}
+
+
+def _on_event_loop() -> bool:
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+def _set_result(future: asyncio.Future):
+    if not future.done():
+        future.set_result(None)
+
+
+def _wake_async_waiters(worker: _Worker):
+    """
+    Wake the put_async calls waiting on the worker, called under worker.cond
+    """
+    for loop, future in worker.async_waiters:
+        loop.call_soon_threadsafe(_set_result, future)
+    worker.async_waiters.clear()
@@ -0,0 +1,139 @@
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from .constant import SymbolType
+
+FUNDING_COLUMNS = ['symbol', 'funding_time_ms', 'rate']
+SWAP_TYPES = [SymbolType.SWAP_COIN, SymbolType.SWAP_USDT]
+# fundingRate 有 500次/5分钟/IP 的独立限制, 由gateway的RequestScheduler控制, 并发只需覆盖请求延迟
+FUNDING_WORKERS = 4
+FUNDING_CACHE_FILE = 'funding.parquet'
+
+
+def empty_funding_frame() -> pd.DataFrame:
+    return pd.DataFrame({
+        'symbol': pd.Series([], dtype=object),
+        'funding_time_ms': pd.Series([], dtype=np.int64),
+        'rate': pd.Series([], dtype=np.float64),
+    })
+
+
+def concat_funding_frames(frames: list[pd.DataFrame]) -> pd.DataFrame:
+    """
+    Concatenate funding frames, sort by (symbol, funding_time_ms) and drop duplicated records (later ones win)
+    """
+    frames = [df for df in frames if len(df)]
+    if not frames:
+        return empty_funding_frame()
+    df = pd.concat(frames, ignore_index=True)
+    df = df.drop_duplicates(['symbol', 'funding_time_ms'], keep='last')
+    return df.sort_values(['symbol', 'funding_time_ms'], kind='stable', ignore_index=True)
+
+
+class FundingHistory:
+    """
+    Full funding rate history of perpetual swaps as one long DataFrame: symbol, funding_time_ms (int64), rate
+
+    * Symbols are fetched concurrently, pages of one symbol sequentially through BinanceGateway.query_funding_history
+    * Each update only fetches records after the last cached funding time of every symbol
+    * With cache_dir, the history is persisted to a single Parquet file (requires pyarrow)
+    """
+
+    def __init__(self, gateway, cache_dir: Optional[str] = None, num_workers: int = FUNDING_WORKERS):
+        self.gateway = gateway
+        self.cache_dir = cache_dir
+        self.num_workers = num_workers
+        self._lock = threading.Lock()
+        self._df: Optional[pd.DataFrame] = None
+        if cache_dir is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    @property
+    def path(self) -> Optional[str]:
+        if self.cache_dir is None:
+            return None
+        return os.path.join(self.cache_dir, FUNDING_CACHE_FILE)
+
+    def load(self) -> pd.DataFrame:
+        if self._df is None:
+            path = self.path
+            if path is not None and os.path.exists(path):
+                self._df = pd.read_parquet(path)
+            else:
+                self._df = empty_funding_frame()
+        return self._df
+
+    def save(self, df: pd.DataFrame):
+        path = self.path
+        if path is None:
+            return
+        # 先写临时文件再替换, 避免进程中断留下损坏的缓存
+        df.to_parquet(path + '.tmp', index=False)
+        os.replace(path + '.tmp', path)
+
+    def list_symbols(self) -> list[str]:
+        """
+        All listed SWAP_COIN and SWAP_USDT symbols
+        """
+        symbols = self.gateway.query_symbol(SWAP_TYPES)
+        return [s for s in symbols if self.gateway.convert_symbol_cc_to_exg(s)[1] in SWAP_TYPES]
+
+    def _fetch(self, cc_symbol: str, start_ms: int) -> pd.DataFrame:
+        try:
+            arrays = self.gateway.query_funding_history(cc_symbol, start_ms)
+        except Exception as e:
+            logging.warning(f'Failed to fetch funding history of {cc_symbol}: {e}')
+            return empty_funding_frame()
+        df = pd.DataFrame(arrays, columns=FUNDING_COLUMNS[1:])
+        df.insert(0, 'symbol', cc_symbol)
+        return df
+
+    def update(self, cc_symbols: Optional[list[str]] = None) -> pd.DataFrame:
+        """
+        Fetch records newer than the cache for cc_symbols (all swaps by default), return the full history
+        """
+        if cc_symbols is None:
+            cc_symbols = self.list_symbols()
+
+        with self._lock:
+            df = self.load()
+            last_ms = df.groupby('symbol')['funding_time_ms'].max().to_dict() if len(df) else dict()
+            starts = [int(last_ms[s]) + 1 if s in last_ms else 0 for s in cc_symbols]
+            with ThreadPoolExecutor(max_workers=max(1, self.num_workers)) as executor:
+                fetched = list(executor.map(self._fetch, cc_symbols, starts))
+
+            if any(len(x) for x in fetched):
+                df = concat_funding_frames([df] + fetched)
+                self.save(df)
+                self._df = df
+        return df
+
+    def get(self,
+            cc_symbols: Optional[list[str]] = None,
+            start_ms: Optional[int] = None,
+            end_ms: Optional[int] = None) -> pd.DataFrame:
+        """
+        Cached records with start_ms <= funding_time_ms < end_ms, without fetching
+        """
+        df = self.load()
+        mask = np.ones(len(df), dtype=bool)
+        if cc_symbols is not None:
+            mask &= df['symbol'].isin(cc_symbols).to_numpy()
+        if start_ms is not None:
+            mask &= df['funding_time_ms'].to_numpy() >= start_ms
+        if end_ms is not None:
+            mask &= df['funding_time_ms'].to_numpy() < end_ms
+        return df[mask].reset_index(drop=True)
+
+    def pivot(self, cc_symbols: Optional[list[str]] = None) -> pd.DataFrame:
+        """
+        Wide frame of rates, indexed by funding_time_ms with one column per symbol
+        """
+        df = self.get(cc_symbols)
+        return df.pivot(index='funding_time_ms', columns='symbol', values='rate')
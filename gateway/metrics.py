@@ -0,0 +1,246 @@
+"""
+In-process metrics: counters and log-bucketed latency histograms with an optional Prometheus text export
+
+Recording is off by default, set METRICS.enabled = True to turn it on.
+
+    METRICS.enabled = True
+    with METRICS.timer('rest_latency_seconds', endpoint='fapiPrivateGetAccount'):
+        ...
+    METRICS.histogram('parse_seconds', func='parse_order').quantile(0.99)
+    print(METRICS.to_prometheus())
+"""
+import functools
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+HISTOGRAM_MIN = 1e-6  # 最小桶上界, 1微秒
+HISTOGRAM_BUCKETS_PER_DOUBLING = 4  # 每个桶宽约19%
+HISTOGRAM_NUM_BUCKETS = 4 * 27  # 覆盖约1微秒到134秒
+EXPORT_QUANTILES = (0.5, 0.99, 0.999)
+
+Labels = tuple[tuple[str, str], ...]
+
+_LOG_BASE = math.log(2) / HISTOGRAM_BUCKETS_PER_DOUBLING
+
+
+def bucket_upper_bound(i: int) -> float:
+    return HISTOGRAM_MIN * math.exp(i * _LOG_BASE)
+
+
+class Histogram:
+    """
+    Fixed log-scale buckets, quantiles are accurate to one bucket width
+    record takes no lock, concurrent writers may rarely lose a count, which is acceptable for latency statistics
+    """
+
+    def __init__(self):
+        self.buckets = [0] * (HISTOGRAM_NUM_BUCKETS + 1)  # 最后一个桶收录超出范围的值
+        self.count = 0
+        self.sum = 0.
+        self.min = math.inf
+        self.max = 0.
+
+    def record(self, value: float):
+        if value <= HISTOGRAM_MIN:
+            i = 0
+        else:
+            i = min(math.ceil(math.log(value / HISTOGRAM_MIN) / _LOG_BASE), HISTOGRAM_NUM_BUCKETS)
+        self.buckets[i] += 1
+        self.count += 1
+        self.sum += value
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def clear(self):
+        self.buckets = [0] * (HISTOGRAM_NUM_BUCKETS + 1)
+        self.count = 0
+        self.sum = 0.
+        self.min = math.inf
+        self.max = 0.
+
+    def quantile(self, q: float) -> float:
+        """
+        Upper bound of the bucket containing the q-quantile, capped by the observed max
+        """
+        buckets, count = list(self.buckets), self.count
+        if count == 0:
+            return 0.
+        rank = q * count
+        cum = 0
+        for i, n in enumerate(buckets):
+            cum += n
+            if cum >= rank and n > 0:
+                return min(bucket_upper_bound(i), self.max)
+        return self.max
+
+    def summary(self) -> dict[str, float]:
+        result = {'count': self.count, 'sum': self.sum, 'min': self.min if self.count else 0., 'max': self.max}
+        for q in EXPORT_QUANTILES:
+            result[f'p{str(q)[2:].ljust(2, "0")}'] = self.quantile(q)
+        return result
+
+
+class Counter:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.value = 0
+
+    def inc(self, n: int = 1):
+        with self._lock:
+            self.value += n
+
+    def clear(self):
+        with self._lock:
+            self.value = 0
+
+
+def _labels(labels: dict) -> Labels:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+class MetricsRegistry:
+    """
+    Named metrics keyed by label sets, created on first use
+    Recording is a no-op until enabled is set to True
+    """
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._histograms: dict[str, dict[Labels, Histogram]] = dict()
+        self._counters: dict[str, dict[Labels, Counter]] = dict()
+
+    def histogram(self, name: str, **labels) -> Histogram:
+        key = _labels(labels)
+        series = self._histograms.get(name)
+        if series is None or key not in series:
+            with self._lock:
+                series = self._histograms.setdefault(name, dict())
+                series.setdefault(key, Histogram())
+        return series[key]
+
+    def counter(self, name: str, **labels) -> Counter:
+        key = _labels(labels)
+        series = self._counters.get(name)
+        if series is None or key not in series:
+            with self._lock:
+                series = self._counters.setdefault(name, dict())
+                series.setdefault(key, Counter())
+        return series[key]
+
+    def observe(self, name: str, value: float, **labels):
+        if self.enabled:
+            self.histogram(name, **labels).record(value)
+
+    def inc(self, name: str, n: int = 1, **labels):
+        if self.enabled:
+            self.counter(name, **labels).inc(n)
+
+    @contextmanager
+    def timer(self, name: str, **labels):
+        """
+        Record the elapsed seconds of the with block
+        """
+        t = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - t, **labels)
+
+    def timed(self, name: str, **labels):
+        """
+        Decorator recording the elapsed seconds of every call
+        The histogram is resolved once at decoration time, so a call only pays for two clock reads and one record
+        """
+        histogram = self.histogram(name, **labels)
+
+        def decorator(func):
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                t = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    histogram.record(time.perf_counter() - t)
+
+            return wrapper
+
+        return decorator
+
+    def snapshot(self) -> dict[str, dict]:
+        """
+        {name: {labels: summary dict or counter value}}
+        """
+        with self._lock:
+            histograms = {name: dict(series) for name, series in self._histograms.items()}
+            counters = {name: dict(series) for name, series in self._counters.items()}
+        result = {name: {k: h.summary() for k, h in series.items()} for name, series in histograms.items()}
+        result.update({name: {k: c.value for k, c in series.items()} for name, series in counters.items()})
+        return result
+
+    def reset(self):
+        """
+        Zero all metrics in place, histograms held by timed functions stay registered
+        """
+        with self._lock:
+            for series in self._histograms.values():
+                for h in series.values():
+                    h.clear()
+            for series in self._counters.values():
+                for c in series.values():
+                    c.clear()
+
+    def to_prometheus(self, prefix: str = 'binance_gateway_') -> str:
+        """
+        Prometheus text exposition, histograms are exported as summaries
+        """
+        lines = []
+        with self._lock:
+            histograms = {name: dict(series) for name, series in self._histograms.items()}
+            counters = {name: dict(series) for name, series in self._counters.items()}
+
+        for name, series in sorted(histograms.items()):
+            lines.append(f'# TYPE {prefix}{name} summary')
+            for labels, h in series.items():
+                for q in EXPORT_QUANTILES:
+                    lines.append(f'{prefix}{name}{_format_labels(labels + (("quantile", str(q)), ))} {h.quantile(q)}')
+                lines.append(f'{prefix}{name}_sum{_format_labels(labels)} {h.sum}')
+                lines.append(f'{prefix}{name}_count{_format_labels(labels)} {h.count}')
+
+        for name, series in sorted(counters.items()):
+            lines.append(f'# TYPE {prefix}{name} counter')
+            for labels, c in series.items():
+                lines.append(f'{prefix}{name}{_format_labels(labels)} {c.value}')
+        return '\n'.join(lines) + '\n'
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ''
+    values = ','.join(f'{k}="{v}"' for k, v in labels)
+    return '{' + values + '}'
+
+
+# 进程内共享的指标
+METRICS = MetricsRegistry()
+
+
+def get_event_time(packet) -> Optional[int]:
+    """
+    Exchange event time in epoch ms of a combined stream packet, dict payloads or decoded events
+    """
+    if not isinstance(packet, dict):
+        return None
+    data = packet.get('data')
+    if isinstance(data, dict):
+        return data.get('E')
+    return getattr(data, 'event_time', None) or None
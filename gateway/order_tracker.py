@@ -0,0 +1,193 @@
+import logging
+import threading
+import time
+from typing import Callable, Optional
+
+from .binance import OPEN_ORDERS_SYMBOL_WEIGHT, ORDER_LIST_METHODS
+from .constant import OrderData, OrderStatus
+from .rate_limit import WEIGHT_LIMITS, get_api_family, get_endpoint_weight
+from .symbol_index import SYMTYPE_TO_MARKET
+
+FAST_POLL_SEC = 1.
+SLOW_POLL_SEC = 10.
+POLL_BACKOFF = 2.  # 无状态变化时轮询间隔的增长倍数
+YOUNG_ORDER_SEC = 30  # 下单后该时间内的订单按最快频率轮询
+POLL_WEIGHT_SHARE = 0.2  # 每个市场的轮询最多占用的每分钟权重比例
+
+FINAL_STATUSES = {OrderStatus.FULLY_FILLED, OrderStatus.CANCELED, OrderStatus.REJECTED, OrderStatus.FAILED}
+
+# on_order(order)
+OrderCallback = Callable[[OrderData], None]
+
+OrderKey = tuple[str, str]  # (cc_symbol, order_id)
+
+
+def _key(order: OrderData) -> OrderKey:
+    return order.cc_symbol, str(order.order_id)
+
+
+class _MarketPoll:
+    __slots__ = ('interval', 'next_time')
+
+    def __init__(self):
+        self.interval = FAST_POLL_SEC
+        self.next_time = 0.
+
+
+class OrderTracker:
+    """
+    Follow the status of many orders with bulk queries instead of one query_order per order
+
+    * Each poll of a market costs one openOrders request, or one per symbol when that weighs less
+    * Orders which left the open list are resolved with one allOrders request per symbol
+    * Markets with young orders or recent transitions are polled every FAST_POLL_SEC, others back off
+      to SLOW_POLL_SEC, never faster than POLL_WEIGHT_SHARE of the per-minute weight allows
+    * on_order is called only when the status or filled size changes, finished orders are dropped
+    """
+
+    def __init__(self, gateway, on_order: Optional[OrderCallback] = None):
+        self.gateway = gateway
+        if on_order is not None:
+            self.on_order = on_order
+
+        self._lock = threading.Lock()
+        self._orders: dict[str, dict[OrderKey, OrderData]] = dict()  # market -> 订单
+        self._added_at: dict[OrderKey, float] = dict()
+        self._polls: dict[str, _MarketPoll] = dict()
+
+        self._active = False
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def track(self, order: OrderData):
+        """
+        Start tracking an order, usually the return value of send_order
+        """
+        if order.status in FINAL_STATUSES:
+            return
+        _, sym_type = self.gateway.convert_symbol_cc_to_exg(order.cc_symbol)
+        market = SYMTYPE_TO_MARKET[sym_type]
+        key = _key(order)
+        with self._lock:
+            self._orders.setdefault(market, dict())[key] = order
+            self._added_at[key] = time.monotonic()
+            poll = self._polls.setdefault(market, _MarketPoll())
+            poll.interval = FAST_POLL_SEC
+            poll.next_time = min(poll.next_time, time.monotonic() + FAST_POLL_SEC)
+
+    def untrack(self, cc_symbol: str, order_id: str):
+        key = (cc_symbol, str(order_id))
+        with self._lock:
+            for orders in self._orders.values():
+                orders.pop(key, None)
+            self._added_at.pop(key, None)
+
+    def tracked(self) -> list[OrderData]:
+        with self._lock:
+            return [o for orders in self._orders.values() for o in orders.values()]
+
+    def _query_open(self, market: str, symbols: set[str]) -> list[OrderData]:
+        if OPEN_ORDERS_SYMBOL_WEIGHT[market] * len(symbols) < get_endpoint_weight(ORDER_LIST_METHODS[market][0]):
+            return [o for s in sorted(symbols) for o in self.gateway.query_open_orders(market, s)]
+        return self.gateway.query_open_orders(market)
+
+    def _poll_weight(self, market: str, num_symbols: int) -> int:
+        return min(OPEN_ORDERS_SYMBOL_WEIGHT[market] * num_symbols, get_endpoint_weight(ORDER_LIST_METHODS[market][0]))
+
+    def poll_market(self, market: str) -> list[OrderData]:
+        """
+        Refresh all tracked orders of a market, return the orders whose state changed
+        """
+        with self._lock:
+            tracked = dict(self._orders.get(market, dict()))
+        if not tracked:
+            return []
+
+        latest = {_key(o): o for o in self._query_open(market, {s for s, _ in tracked})}
+
+        # 不在挂单列表中的订单已结束, 按symbol从最小的订单号起查询一次全部订单
+        finished: dict[str, list[str]] = dict()
+        for key in tracked:
+            if key not in latest:
+                finished.setdefault(key[0], []).append(key[1])
+        for cc_symbol, order_ids in finished.items():
+            from_id = min(order_ids, key=lambda x: int(x) if x.isdigit() else 0)
+            for o in self.gateway.query_all_orders(cc_symbol, from_id):
+                if (cc_symbol, str(o.order_id)) in tracked:
+                    latest[_key(o)] = o
+
+        changed = []
+        with self._lock:
+            orders = self._orders.get(market, dict())
+            for key, old in tracked.items():
+                new = latest.get(key)
+                if new is None or key not in orders:  # 尚未可见或已取消跟踪
+                    continue
+                if new.status != old.status or new.filled_size != old.filled_size:
+                    changed.append(new)
+                if new.status in FINAL_STATUSES:
+                    orders.pop(key, None)
+                    self._added_at.pop(key, None)
+                else:
+                    orders[key] = new
+
+        for order in changed:
+            self.on_order(order)
+        return changed
+
+    def _next_interval(self, market: str, poll: _MarketPoll, changed: bool) -> float:
+        now = time.monotonic()
+        with self._lock:
+            orders = self._orders.get(market, dict())
+            young = any(now - self._added_at.get(key, 0.) < YOUNG_ORDER_SEC for key in orders)
+            num_symbols = len({s for s, _ in orders})
+        if changed or young:
+            interval = FAST_POLL_SEC
+        else:
+            interval = min(poll.interval * POLL_BACKOFF, SLOW_POLL_SEC)
+        # 按权重预算限制最快轮询频率
+        limit = WEIGHT_LIMITS[get_api_family(ORDER_LIST_METHODS[market][0])]
+        return max(interval, self._poll_weight(market, num_symbols) * 60 / (limit * POLL_WEIGHT_SHARE))
+
+    def poll(self) -> list[OrderData]:
+        """
+        Poll every market whose interval has elapsed, return the orders whose state changed
+        """
+        changed = []
+        with self._lock:
+            due = [m for m, p in self._polls.items() if p.next_time <= time.monotonic() and self._orders.get(m)]
+        for market in due:
+            poll = self._polls[market]
+            try:
+                result = self.poll_market(market)
+            except Exception as e:
+                logging.warning(f'Failed to poll {market} orders: {e}')
+                result = []
+            changed.extend(result)
+            poll.interval = self._next_interval(market, poll, bool(result))
+            poll.next_time = time.monotonic() + poll.interval
+        return changed
+
+    def on_order(self, order: OrderData):
+        """
+        Order state transition callback
+        """
+        pass
+
+    def _run(self):
+        while self._active:
+            self.poll()
+            with self._lock:
+                next_time = min((p.next_time for m, p in self._polls.items() if self._orders.get(m)),
+                                default=time.monotonic() + FAST_POLL_SEC)
+            self._stop_event.wait(min(max(next_time - time.monotonic(), 0.), FAST_POLL_SEC))
+
+    def start(self):
+        self._active = True
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name='order_tracker', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._active = False
+        self._stop_event.set()
@@ -0,0 +1,127 @@
+from bisect import bisect_left
+from typing import Optional
+
+from .constant import OrderbookData
+
+
+class OrderBookSide:
+    """
+    One side of an order book as two sorted arrays, best level first
+
+    Bid prices are stored negated so that both sides are kept in ascending key order.
+    """
+
+    def __init__(self, is_bid: bool):
+        self.is_bid = is_bid
+        self._keys: list[float] = []
+        self._sizes: list[float] = []
+
+    def clear(self):
+        self._keys.clear()
+        self._sizes.clear()
+
+    def update(self, price: float, size: float):
+        """
+        Set the size of a price level, size 0 removes the level
+        """
+        key = -price if self.is_bid else price
+        i = bisect_left(self._keys, key)
+        if i < len(self._keys) and self._keys[i] == key:
+            if size == 0:
+                del self._keys[i]
+                del self._sizes[i]
+            else:
+                self._sizes[i] = size
+        elif size != 0:
+            self._keys.insert(i, key)
+            self._sizes.insert(i, size)
+
+    def best(self) -> Optional[tuple[float, float]]:
+        if not self._keys:
+            return None
+        key = self._keys[0]
+        return (-key if self.is_bid else key), self._sizes[0]
+
+    def top(self, n: int) -> tuple[list[float], list[float]]:
+        keys = self._keys[:n]
+        prices = [-k for k in keys] if self.is_bid else keys
+        return prices, self._sizes[:len(keys)]
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+
+class LocalOrderBook:
+    """
+    Order book maintained from a REST snapshot plus depth diff events
+
+    Update ids follow Binance rules:
+    * spot: the first event after the snapshot must satisfy U <= lastUpdateId + 1 <= u, then U == previous u + 1
+    * futures: the first event must satisfy U <= lastUpdateId <= u, then pu == previous u
+    """
+
+    def __init__(self, cc_symbol: str, is_futures: bool):
+        self.cc_symbol = cc_symbol
+        self.is_futures = is_futures
+        self.bids = OrderBookSide(is_bid=True)
+        self.asks = OrderBookSide(is_bid=False)
+        self.last_update_id: Optional[int] = None
+        self.synced = False  # 快照之后是否已成功衔接增量
+
+    def reset(self):
+        self.bids.clear()
+        self.asks.clear()
+        self.last_update_id = None
+        self.synced = False
+
+    def apply_snapshot(self, last_update_id: int, bids: list, asks: list):
+        self.reset()
+        for price, size in bids:
+            self.bids.update(float(price), float(size))
+        for price, size in asks:
+            self.asks.update(float(price), float(size))
+        self.last_update_id = last_update_id
+
+    def apply_diff(self,
+                   first_id: int,
+                   final_id: int,
+                   bids: list,
+                   asks: list,
+                   prev_final_id: Optional[int] = None) -> bool:
+        """
+        Apply one depth diff event, return False if the sequence is broken and a resync is needed
+        Events older than the snapshot are ignored
+        """
+        if self.last_update_id is None:
+            return False
+
+        last = self.last_update_id
+        if self.synced:
+            ok = prev_final_id == last if self.is_futures else first_id == last + 1
+            if not ok:
+                return False
+        else:
+            if final_id < last or (not self.is_futures and final_id == last):
+                return True  # 快照之前的事件, 丢弃
+            expected = last if self.is_futures else last + 1
+            if not first_id <= expected <= final_id:
+                return False
+
+        for price, size in bids:
+            self.bids.update(float(price), float(size))
+        for price, size in asks:
+            self.asks.update(float(price), float(size))
+        self.last_update_id = final_id
+        self.synced = True
+        return True
+
+    def best_bid(self) -> Optional[tuple[float, float]]:
+        return self.bids.best()
+
+    def best_ask(self) -> Optional[tuple[float, float]]:
+        return self.asks.best()
+
+    def top(self, n: int = 20) -> OrderbookData:
+        bid_prices, bid_sizes = self.bids.top(n)
+        ask_prices, ask_sizes = self.asks.top(n)
+        return OrderbookData(ask_prices=ask_prices, ask_sizes=ask_sizes, bid_prices=bid_prices, bid_sizes=bid_sizes)
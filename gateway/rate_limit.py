@@ -0,0 +1,268 @@
+import asyncio
+import logging
+import threading
+import time
+from enum import Enum, IntEnum
+from typing import Mapping, Optional
+
+from .util import get_timeframe_delta
+
+
+class ApiFamily(Enum):
+    SPOT = 'api'
+    FAPI = 'fapi'
+    DAPI = 'dapi'
+    SAPI = 'sapi'
+
+
+class Priority(IntEnum):
+    ORDER = 0  # 下单、撤单
+    QUERY = 1  # 普通查询
+    BULK = 2  # 批量下载, 如K线分页
+
+
+# 每分钟IP权重上限
+WEIGHT_LIMITS: dict[ApiFamily, int] = {
+    ApiFamily.SPOT: 6000,
+    ApiFamily.FAPI: 2400,
+    ApiFamily.DAPI: 2400,
+    ApiFamily.SAPI: 12000,
+}
+
+# 下单频率上限 (次数, 时间窗口秒数)
+ORDER_LIMITS: dict[ApiFamily, tuple[int, float]] = {
+    ApiFamily.SPOT: (100, 10),
+    ApiFamily.FAPI: (300, 10),
+    ApiFamily.DAPI: (1200, 60),
+}
+
+# 独立于权重的单接口请求次数上限 (次数, 时间窗口秒数), 与同IP下的所有请求共享
+REQUEST_LIMITS: dict[str, tuple[int, float]] = {
+    'fundingRate': (500, 300),
+}
+
+# ccxt方法对应的单接口请求次数限制
+ENDPOINT_BUCKETS: dict[str, str] = {
+    'fapiPublicGetFundingRate': 'fundingRate',
+}
+
+# 各优先级请求发出后需保留的权重比例, 保证批量请求不会占满订单所需的额度
+PRIORITY_RESERVE: dict[Priority, float] = {
+    Priority.ORDER: 0.,
+    Priority.QUERY: 0.05,
+    Priority.BULK: 0.2,
+}
+
+# ccxt方法对应的请求权重, 未列出的按1计算, K线和深度的权重随limit变化, 由调用方给出
+ENDPOINT_WEIGHTS: dict[str, int] = {
+    'privateGetAccount': 20,
+    'privateGetAllOrders': 20,
+    'privateGetOrder': 4,
+    'privateGetOpenOrders': 80,
+    'publicGetExchangeInfo': 20,
+    'publicPostUserDataStream': 2,
+    'publicPutUserDataStream': 2,
+    'dapiPrivateGetAccount': 5,
+    'dapiPrivateGetAllOrders': 20,
+    'dapiPrivateGetOpenOrders': 40,
+    'dapiPrivatePostBatchOrders': 5,
+    'dapiPublicGetFundingRate': 1,
+    'dapiPublicGetPremiumIndex': 10,
+    'fapiPrivateGetAccount': 5,
+    'fapiPrivateGetAllOrders': 5,
+    'fapiPrivateGetPositionRisk': 5,
+    'fapiPrivateGetOpenOrders': 40,
+    'fapiPrivatePostBatchOrders': 5,
+    'fapiPublicGetPremiumIndex': 10,
+    'sapiPostAssetTransfer': 1,
+}
+
+BAN_SECONDS = 60  # 被限频但未返回Retry-After时的默认等待时间
+WAIT_STEP_SECONDS = 0.05  # 等待更高优先级请求时的轮询间隔
+
+
+def get_api_family(method: str) -> ApiFamily:
+    """
+    API family of a ccxt binance method name, e.g. fapiPrivateGetAccount -> FAPI
+    """
+    for family in (ApiFamily.DAPI, ApiFamily.FAPI, ApiFamily.SAPI):
+        if method.startswith(family.value):
+            return family
+    return ApiFamily.SPOT
+
+
+def get_endpoint_weight(method: str) -> int:
+    return ENDPOINT_WEIGHTS.get(method, 1)
+
+
+def get_endpoint_bucket(method: str) -> Optional[str]:
+    return ENDPOINT_BUCKETS.get(method)
+
+
+class TokenBucket:
+    """
+    Token bucket refilled continuously at capacity / window_sec tokens per second
+    """
+
+    def __init__(self, capacity: float, window_sec: float):
+        self.capacity = capacity
+        self.window_sec = window_sec
+        self.rate = capacity / window_sec
+        self.tokens = capacity
+        self._last = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def wait_time(self, amount: float, now: float, reserve: float = 0.) -> float:
+        """
+        Seconds until `amount` tokens can be taken while keeping `reserve` tokens in the bucket
+        """
+        self._refill(now)
+        need = min(amount + reserve, self.capacity) - self.tokens
+        return 0. if need <= 0 else need / self.rate
+
+    def consume(self, amount: float):
+        self.tokens -= amount
+
+    def sync_used(self, used: float, now: float):
+        """
+        Align with the usage reported by the exchange
+        """
+        self._refill(now)
+        self.tokens = min(self.tokens, self.capacity - used)
+
+
+class RequestScheduler:
+    """
+    Weight-aware scheduler shared by all REST calls of a gateway
+
+    * One weight bucket per API family, plus an order-count bucket for order endpoints
+    * Endpoints with their own request-count limit, e.g. fundingRate, also take one token from a named bucket
+    * Buckets are corrected with X-MBX-USED-WEIGHT-* / X-MBX-ORDER-COUNT-* response headers
+    * Priority lanes: a request waits while any request of higher priority is waiting on the same family
+    * 429/418 responses pause the whole family until Retry-After
+    """
+
+    def __init__(self,
+                 weight_limits: Optional[dict[ApiFamily, int]] = None,
+                 order_limits: Optional[dict[ApiFamily, tuple[int, float]]] = None,
+                 request_limits: Optional[dict[str, tuple[int, float]]] = None,
+                 safety_ratio: float = 0.9):
+        weight_limits = weight_limits or WEIGHT_LIMITS
+        order_limits = order_limits or ORDER_LIMITS
+        request_limits = request_limits or REQUEST_LIMITS
+        self._cond = threading.Condition()
+        self._weight_buckets = {f: TokenBucket(limit * safety_ratio, 60) for f, limit in weight_limits.items()}
+        self._order_buckets = {f: TokenBucket(n * safety_ratio, sec) for f, (n, sec) in order_limits.items()}
+        self._request_buckets = {k: TokenBucket(n * safety_ratio, sec) for k, (n, sec) in request_limits.items()}
+        self._waiting = {f: [0] * len(Priority) for f in ApiFamily}
+        self._paused_until = {f: 0. for f in ApiFamily}
+
+    def _try_acquire(self, family: ApiFamily, weight: int, priority: Priority, num_orders: int,
+                     bucket: Optional[str]) -> float:
+        """
+        Take the tokens and return 0, or return the number of seconds to wait
+        """
+        now = time.monotonic()
+        if self._paused_until[family] > now:
+            return self._paused_until[family] - now
+        if any(self._waiting[family][:priority]):
+            return WAIT_STEP_SECONDS
+
+        weight_bucket = self._weight_buckets[family]
+        wait = weight_bucket.wait_time(weight, now, PRIORITY_RESERVE[priority] * weight_bucket.capacity)
+        order_bucket = self._order_buckets.get(family) if num_orders > 0 else None
+        if order_bucket is not None:
+            wait = max(wait, order_bucket.wait_time(num_orders, now))
+        request_bucket = self._request_buckets.get(bucket) if bucket is not None else None
+        if request_bucket is not None:
+            wait = max(wait, request_bucket.wait_time(1, now))
+        if wait > 0:
+            return wait
+
+        weight_bucket.consume(weight)
+        if order_bucket is not None:
+            order_bucket.consume(num_orders)
+        if request_bucket is not None:
+            request_bucket.consume(1)
+        return 0.
+
+    def acquire(self,
+                family: ApiFamily,
+                weight: int,
+                priority: Priority = Priority.QUERY,
+                num_orders: int = 0,
+                bucket: Optional[str] = None):
+        """
+        Block until the request may be sent, num_orders is counted against the order-count limit
+        and one request against the named bucket of REQUEST_LIMITS if given
+        """
+        with self._cond:
+            self._waiting[family][priority] += 1
+            try:
+                while True:
+                    wait = self._try_acquire(family, weight, priority, num_orders, bucket)
+                    if wait <= 0:
+                        return
+                    self._cond.wait(timeout=wait)
+            finally:
+                self._waiting[family][priority] -= 1
+                self._cond.notify_all()
+
+    async def acquire_async(self,
+                            family: ApiFamily,
+                            weight: int,
+                            priority: Priority = Priority.QUERY,
+                            num_orders: int = 0,
+                            bucket: Optional[str] = None):
+        """
+        acquire for coroutines, waits with asyncio.sleep so the event loop keeps running
+        Shares buckets and priority lanes with threads using the same scheduler
+        """
+        with self._cond:
+            self._waiting[family][priority] += 1
+        try:
+            while True:
+                with self._cond:
+                    wait = self._try_acquire(family, weight, priority, num_orders, bucket)
+                if wait <= 0:
+                    return
+                await asyncio.sleep(wait)
+        finally:
+            with self._cond:
+                self._waiting[family][priority] -= 1
+                self._cond.notify_all()
+
+    def update_from_headers(self, family: ApiFamily, headers: Optional[Mapping[str, str]]):
+        """
+        Correct buckets with X-MBX-USED-WEIGHT-{interval} and X-MBX-ORDER-COUNT-{interval} headers
+        """
+        if not headers:
+            return
+        now = time.monotonic()
+        with self._cond:
+            for key, value in headers.items():
+                key = key.lower()
+                if key.startswith('x-mbx-used-weight-') or key.startswith('x-sapi-used-ip-weight-'):
+                    bucket = self._weight_buckets.get(family)
+                elif key.startswith('x-mbx-order-count-'):
+                    bucket = self._order_buckets.get(family)
+                else:
+                    continue
+                interval = key.rsplit('-', 1)[-1]
+                if bucket is None or interval[-1] not in 'smhd':
+                    continue
+                if get_timeframe_delta(interval).total_seconds() != bucket.window_sec:
+                    continue
+                bucket.sync_used(float(value), now)
+
+    def pause(self, family: ApiFamily, seconds: float):
+        """
+        Pause all requests of the family, called on 429/418 responses
+        """
+        logging.warning(f'{family.value} rate limited, pause {seconds}s')
+        with self._cond:
+            self._paused_until[family] = max(self._paused_until[family], time.monotonic() + seconds)
+            self._cond.notify_all()
@@ -0,0 +1,162 @@
+"""
+Raw websocket frame recording and offline replay
+
+Each segment is a gzip text file, one frame per line: "<receive time in epoch ns>\t<raw frame>".
+"""
+import glob
+import gzip
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Iterator, Optional, Union
+
+SEGMENT_FRAMES = 1000000  # 每个分段最多记录的帧数
+SEGMENT_SECONDS = 3600  # 每个分段最长记录时间
+COMPRESS_LEVEL = 6
+
+
+def list_segments(path: Union[str, list[str]]) -> list[str]:
+    """
+    Segment files of a directory in recording order, or the given files as is
+    """
+    if isinstance(path, list):
+        return path
+    if os.path.isdir(path):
+        return sorted(glob.glob(os.path.join(path, '*.log.gz')))
+    return [path]
+
+
+def read_frames(path: Union[str, list[str]]) -> Iterator[tuple[int, str]]:
+    """
+    Iterate (receive time ns, raw frame) over segment files
+    """
+    for seg in list_segments(path):
+        with gzip.open(seg, 'rt', encoding='utf-8') as f:
+            for line in f:
+                ts, _, text = line.partition('\t')
+                yield int(ts), text[:-1] if text.endswith('\n') else text
+
+
+class FrameRecorder:
+    """
+    Append raw frames with receive timestamps to gzip segments
+
+    Frames are handed to a writer thread, so recording never blocks the receive loop.
+    A new segment is started every segment_frames frames or segment_seconds seconds.
+    """
+
+    def __init__(self,
+                 root_dir: str,
+                 prefix: str = 'frames',
+                 segment_frames: int = SEGMENT_FRAMES,
+                 segment_seconds: float = SEGMENT_SECONDS,
+                 compresslevel: int = COMPRESS_LEVEL):
+        self.root_dir = root_dir
+        self.prefix = prefix
+        self.segment_frames = segment_frames
+        self.segment_seconds = segment_seconds
+        self.compresslevel = compresslevel
+        os.makedirs(root_dir, exist_ok=True)
+
+        self.num_frames = 0
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._file = None
+        self._seq = 0
+        self._seg_frames = 0
+        self._seg_start = 0.
+        self._thread = threading.Thread(target=self._run, name='frame_recorder', daemon=True)
+        self._thread.start()
+
+    def record(self, text: str):
+        """
+        Record one raw frame, called from the receive loop
+        """
+        self._queue.put((time.time_ns(), text))
+
+    def _open_segment(self):
+        if self._file is not None:
+            self._file.close()
+        now = datetime.now(timezone.utc).strftime('%Y%m%d_%H%M%S')
+        path = os.path.join(self.root_dir, f'{self.prefix}_{now}_{self._seq:05d}.log.gz')
+        self._seq += 1
+        self._file = gzip.open(path, 'wt', encoding='utf-8', compresslevel=self.compresslevel)
+        self._seg_frames = 0
+        self._seg_start = time.monotonic()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            if (self._file is None or self._seg_frames >= self.segment_frames
+                    or time.monotonic() - self._seg_start >= self.segment_seconds):
+                self._open_segment()
+            ts, text = item
+            try:
+                self._file.write(f'{ts}\t{text}\n')
+            except Exception as e:
+                logging.warning(f'Failed to record frame: {e}')
+            self._seg_frames += 1
+            self.num_frames += 1
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def close(self):
+        """
+        Flush pending frames and close the current segment
+        """
+        self._queue.put(None)
+        self._thread.join()
+
+
+class ReplayEngine:
+    """
+    Feed recorded frames into a WebsocketClient subclass without any network
+
+    * speed None replays as fast as possible, 1 in real time, 10 ten times faster than recorded
+    * Frames go through the client's unpack_data and decoder, then on_packet or its dispatcher
+    * A dispatcher that is not running is started for the replay, drained and stopped again before returning
+    * on_connected is called before the first frame, so it must not rely on the event loop
+    """
+
+    def __init__(self, path: Union[str, list[str]], speed: Optional[float] = None):
+        self.path = path
+        self.speed = speed
+
+    def run(self, client, call_on_connected: bool = True) -> int:
+        """
+        Replay all frames into client, return the number of frames
+        """
+        if call_on_connected:
+            client.on_connected()
+
+        dispatcher = getattr(client, '_dispatcher', None)
+        own_dispatcher = dispatcher is not None and not dispatcher._active
+        if own_dispatcher:
+            dispatcher.start()
+        unpack_data, on_packet = client.unpack_data, dispatcher.put if dispatcher else client.on_packet
+        speed = self.speed
+        first_ts, start = None, time.perf_counter()
+        n = 0
+        for ts, text in read_frames(self.path):
+            if speed:
+                if first_ts is None:
+                    first_ts = ts
+                delay = (ts - first_ts) / 1e9 / speed - (time.perf_counter() - start)
+                if delay > 0:
+                    time.sleep(delay)
+            packet = unpack_data(text)
+            if packet is not None:
+                on_packet(packet)
+            n += 1
+
+        if dispatcher is not None:
+            dispatcher.drain()
+        if own_dispatcher:
+            dispatcher.stop()
+        client.on_disconnected()
+        return n
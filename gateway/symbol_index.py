@@ -0,0 +1,62 @@
+import sys
+import threading
+from typing import Optional
+
+from .constant import SymbolType
+
+MARKET_COIN = 'coin'  # dapi, 币本位合约
+MARKET_USDT = 'usdt'  # fapi, U本位合约
+MARKET_SPOT = 'spot'
+
+SYMTYPE_TO_MARKET: dict[SymbolType, str] = {
+    SymbolType.FUTURES_COIN: MARKET_COIN,
+    SymbolType.SWAP_COIN: MARKET_COIN,
+    SymbolType.FUTURES_USDT: MARKET_USDT,
+    SymbolType.SWAP_USDT: MARKET_USDT,
+    SymbolType.SPOT: MARKET_SPOT,
+}
+
+
+def cc_symbol_from_record(x: dict, sym_type: SymbolType) -> str:
+    """
+    Build cc_symbol from exchangeInfo baseAsset / quoteAsset instead of parsing the exchange symbol
+    """
+    base, quote = x['baseAsset'], x['quoteAsset']
+    if sym_type in (SymbolType.FUTURES_COIN, SymbolType.FUTURES_USDT):  # BTCUSD_210625
+        exp_date = x['symbol'].rsplit('_', 1)[-1]
+        return f'{base}-{quote}-{exp_date}.{sym_type.value}'
+    return f'{base}-{quote}.{sym_type.value}'
+
+
+class SymbolIndex:
+    """
+    Bidirectional O(1) mapping between exchange symbols and cc_symbols
+
+    Exchange symbols are keyed by market, since e.g. BTCUSDT is both a spot pair and a USDT swap.
+    All stored strings are interned.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._exg_to_cc: dict[str, dict[str, str]] = {market: dict() for market in set(SYMTYPE_TO_MARKET.values())}
+        self._cc_to_exg: dict[str, tuple[str, SymbolType]] = dict()
+
+    def add(self, cc_symbol: str, exg_symbol: str, sym_type: SymbolType):
+        cc_symbol, exg_symbol = sys.intern(cc_symbol), sys.intern(exg_symbol)
+        with self._lock:
+            self._exg_to_cc[SYMTYPE_TO_MARKET[sym_type]][exg_symbol] = cc_symbol
+            self._cc_to_exg[cc_symbol] = (exg_symbol, sym_type)
+
+    def add_record(self, x: dict, sym_type: SymbolType) -> str:
+        cc_symbol = cc_symbol_from_record(x, sym_type)
+        self.add(cc_symbol, x['symbol'], sym_type)
+        return cc_symbol
+
+    def exg_to_cc(self, exg_symbol: str, market: str) -> Optional[str]:
+        return self._exg_to_cc[market].get(exg_symbol)
+
+    def cc_to_exg(self, cc_symbol: str) -> Optional[tuple[str, SymbolType]]:
+        return self._cc_to_exg.get(cc_symbol)
+
+    def __len__(self) -> int:
+        return len(self._cc_to_exg)
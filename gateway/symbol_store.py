@@ -0,0 +1,193 @@
+import json
+import logging
+import os
+import threading
+import time
+from typing import Callable, Optional
+
+from .constant import SymbolData, SymbolType
+from .symbol_index import SYMTYPE_TO_MARKET, SymbolIndex
+
+SNAPSHOT_VERSION = 1
+SYMBOL_SNAPSHOT_TTL_SEC = 3600
+MISS_REFRESH_SEC = 60  # 查询不到的symbol触发重新下载市场的最短间隔, 用于发现新上线的symbol
+
+# loader(market) -> {cc_symbol: exchangeInfo record}
+SymbolLoader = Callable[[str], dict[str, dict]]
+SymbolParser = Callable[[dict, str], SymbolData]
+
+
+def get_market(cc_symbol: str) -> str:
+    return SYMTYPE_TO_MARKET[SymbolType(cc_symbol.rsplit('.', 1)[-1])]
+
+
+class SymbolStore:
+    """
+    Lazily loaded symbol metadata, behaves like a read-only dict from cc_symbol to SymbolData
+
+    * A market (coin / usdt / spot) is downloaded as a whole, once, when one of its symbols is first requested
+    * Records are snapshotted to disk, a snapshot older than ttl is still served while refreshing in background
+    * A symbol missing from a loaded market triggers a refresh, at most once per miss_refresh seconds
+    * SymbolData is parsed on first access of each symbol
+    * Loaded records, including those from snapshots, are registered into the symbol index if given
+    """
+
+    def __init__(self,
+                 loader: SymbolLoader,
+                 parser: SymbolParser,
+                 snapshot_dir: Optional[str] = None,
+                 ttl: float = SYMBOL_SNAPSHOT_TTL_SEC,
+                 index: Optional[SymbolIndex] = None,
+                 miss_refresh: float = MISS_REFRESH_SEC):
+        self._loader = loader
+        self._parser = parser
+        self._index = index
+        self.snapshot_dir = snapshot_dir
+        self.ttl = ttl
+        self.miss_refresh = miss_refresh
+
+        self._lock = threading.RLock()
+        self._load_locks = {market: threading.Lock() for market in set(SYMTYPE_TO_MARKET.values())}
+        self._records: dict[str, dict[str, dict]] = dict()  # market -> cc_symbol -> record
+        self._updated_at: dict[str, float] = dict()
+        self._loaded_at: dict[str, float] = dict()  # 本进程最近一次下载市场的时间
+        self._parsed: dict[str, SymbolData] = dict()
+        self._refreshing: set[str] = set()
+
+        if snapshot_dir is not None:
+            os.makedirs(snapshot_dir, exist_ok=True)
+
+    def _snapshot_path(self, market: str) -> str:
+        return os.path.join(self.snapshot_dir, f'binance_symbols_{market}.json')
+
+    def _read_snapshot(self, market: str) -> Optional[tuple[float, dict[str, dict]]]:
+        if self.snapshot_dir is None or not os.path.exists(self._snapshot_path(market)):
+            return None
+        try:
+            with open(self._snapshot_path(market)) as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError) as e:
+            logging.warning(f'Failed to read symbol snapshot {market}: {e}')
+            return None
+        if snapshot.get('version') != SNAPSHOT_VERSION:
+            return None
+        return snapshot['updated_at'], snapshot['symbols']
+
+    def _write_snapshot(self, market: str, updated_at: float, records: dict[str, dict]):
+        if self.snapshot_dir is None:
+            return
+        path = self._snapshot_path(market)
+        with open(path + '.tmp', 'w') as f:
+            json.dump({'version': SNAPSHOT_VERSION, 'updated_at': updated_at, 'symbols': records}, f)
+        os.replace(path + '.tmp', path)
+
+    def _register(self, records: dict[str, dict]):
+        if self._index is None:
+            return
+        for cc_symbol, x in records.items():
+            self._index.add(cc_symbol, x['symbol'], SymbolType(cc_symbol.rsplit('.', 1)[-1]))
+
+    def _set_records(self, market: str, updated_at: float, records: dict[str, dict]):
+        self._register(records)
+        with self._lock:
+            self._records[market] = records
+            self._updated_at[market] = updated_at
+            for cc_symbol in records:
+                self._parsed.pop(cc_symbol, None)
+
+    def refresh(self, market: str):
+        """
+        Download all symbols of the market and update the snapshot
+        """
+        records = self._loader(market)
+        updated_at = time.time()
+        with self._lock:
+            self._loaded_at[market] = updated_at
+        self._set_records(market, updated_at, records)
+        self._write_snapshot(market, updated_at, records)
+
+    def _refresh_background(self, market: str):
+        with self._lock:
+            if market in self._refreshing:
+                return
+            self._refreshing.add(market)
+
+        def run():
+            try:
+                self.refresh(market)
+            except Exception as e:
+                logging.warning(f'Failed to refresh symbols {market}: {e}')
+            finally:
+                with self._lock:
+                    self._refreshing.discard(market)
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def _ensure_market(self, market: str):
+        with self._lock:
+            if market in self._records:
+                if time.time() - self._updated_at[market] > self.ttl:
+                    self._refresh_background(market)
+                return
+
+        # 同一市场只由一个线程下载, 其余线程等待其结果
+        with self._load_locks[market]:
+            if market in self._records:
+                return
+            snapshot = self._read_snapshot(market)
+            if snapshot is not None:
+                self._set_records(market, *snapshot)
+                if time.time() - snapshot[0] > self.ttl:
+                    self._refresh_background(market)
+            else:
+                self.refresh(market)
+
+    def _refresh_on_miss(self, market: str):
+        """
+        Reload a market whose records lack a requested symbol, e.g. newly listed, unless it was reloaded recently
+        """
+        with self._load_locks[market]:
+            with self._lock:
+                if time.time() - self._loaded_at.get(market, 0.) < self.miss_refresh:
+                    return
+            try:
+                self.refresh(market)
+            except Exception as e:  # 已有记录可用, 下载失败时不影响查询
+                logging.warning(f'Failed to refresh symbols {market}: {e}')
+
+    def _get_record(self, cc_symbol: str) -> Optional[dict]:
+        market = get_market(cc_symbol)
+        self._ensure_market(market)
+        record = self._records[market].get(cc_symbol)
+        if record is None:
+            self._refresh_on_miss(market)
+            record = self._records[market].get(cc_symbol)
+        return record
+
+    def get(self, cc_symbol: str) -> SymbolData:
+        sym = self._parsed.get(cc_symbol)
+        if sym is not None:
+            return sym
+        record = self._get_record(cc_symbol)
+        if record is None:
+            raise KeyError(cc_symbol)
+        sym = self._parser(record, cc_symbol)
+        self._parsed[cc_symbol] = sym
+        return sym
+
+    def __getitem__(self, cc_symbol: str) -> SymbolData:
+        return self.get(cc_symbol)
+
+    def __contains__(self, cc_symbol: str) -> bool:
+        try:
+            return self._get_record(cc_symbol) is not None
+        except (KeyError, ValueError):  # 无法识别的symbol类型
+            return False
+
+    def records(self, market: str) -> dict[str, dict]:
+        """
+        All raw records of the market, loading it if needed
+        """
+        self._ensure_market(market)
+        with self._lock:
+            return dict(self._records[market])
@@ -1,16 +1,23 @@
+import asyncio
 import logging
 import time
-from datetime import timedelta
+from datetime import datetime, timedelta, timezone
 from decimal import Decimal
 
+import numpy as np
 import pandas as pd
 import math
 
 
-def retry_getter(func, retry_times=5, sleep_seconds=1, default=None, raise_err=True):
+def retry_getter(func, retry_times=5, sleep_seconds=1, default=None, raise_err=True, no_retry: tuple = ()):
+    """
+    Call func until it succeeds, exceptions of no_retry types are raised at once
+    """
     for i in range(retry_times):
         try:
             return func()
+        except no_retry:
+            raise
         except Exception as e:
             logging.warning(f'An error occurred {str(e)}')
             if i == retry_times - 1 and raise_err:
@@ -20,6 +27,21 @@ def retry_getter(func, retry_times=5, sleep_seconds=1, default=None, raise_err=T
     return default
 
 
+async def async_retry_getter(func, retry_times=5, sleep_seconds=1, default=None, raise_err=True, no_retry: tuple = ()):
+    for i in range(retry_times):
+        try:
+            return await func()
+        except no_retry:
+            raise
+        except Exception as e:
+            logging.warning(f'An error occurred {str(e)}')
+            if i == retry_times - 1 and raise_err:
+                raise e
+            await asyncio.sleep(sleep_seconds)
+            sleep_seconds *= 2
+    return default
+
+
 def get_timeframe_delta(timeframe: str) -> timedelta:
     qty = int(timeframe[:-1])
     if timeframe[-1] == 'm':
@@ -34,6 +56,20 @@ def get_timeframe_delta(timeframe: str) -> timedelta:
         raise RuntimeError(f'Unknown timeframe {timeframe}')
 
 
+def ms_to_datetime(ms: int) -> datetime:
+    """
+    Convert one epoch millisecond timestamp to UTC datetime without going through pandas
+    """
+    return datetime.fromtimestamp(ms / 1000, tz=timezone.utc)
+
+
+def ms_to_datetime_index(values) -> pd.DatetimeIndex:
+    """
+    Convert an array of epoch millisecond timestamps to UTC datetimes in one vectorized call
+    """
+    return pd.to_datetime(np.asarray(values, dtype=np.int64), unit='ms', utc=True)
+
+
 def round_to_tick(value: float, tick: float) -> float:
     """
     Round price/size to tick value.
@@ -51,4 +87,41 @@ def floor_to_tick(value: float, tick: float) -> float:
     value = Decimal(str(value))
     target = Decimal(str(tick))
     rounded = float(int(math.floor(value / target)) * target)
-    return rounded
\ No newline at end of file
+    return rounded
+
+
+def tick_to_int(tick: float) -> tuple[int, int]:
+    """
+    Represent tick as tick_int * 10 ** -scale, return (tick_int, scale)
+    e.g. 0.005 -> (5, 3), 10 -> (10, 0)
+    """
+    d = Decimal(str(tick)).normalize()
+    scale = max(0, -d.as_tuple().exponent)
+    return int(d.scaleb(scale)), scale
+
+
+def quantize_to_ticks(values, tick_int, scale, floor: bool = False) -> np.ndarray:
+    """
+    Vectorized rounding of prices/sizes to number of ticks (int64)
+    tick_int and scale can be scalars or arrays aligned with values, rounding is half-even like round_to_tick
+    """
+    x = np.asarray(values, dtype=np.float64) * np.power(10., scale) / np.asarray(tick_int, dtype=np.float64)
+    x = np.round(x, 8)  # 消除浮点误差, 如 0.3 / 0.1 = 2.9999999999999996
+    return (np.floor(x) if floor else np.rint(x)).astype(np.int64)
+
+
+def ticks_to_str(ticks, tick_int, scale) -> list[str]:
+    """
+    Exact decimal strings of number of ticks, tick_int and scale can be scalars or arrays aligned with ticks
+    """
+    ticks = np.asarray(ticks, dtype=np.int64)
+    units = (ticks * np.asarray(tick_int, dtype=np.int64)).tolist()
+    scales = np.broadcast_to(np.asarray(scale, dtype=np.int64), ticks.shape).tolist()
+    result = []
+    for u, s in zip(units, scales):
+        if s == 0:
+            result.append(str(u))
+        else:
+            q, r = divmod(abs(u), 10**s)
+            result.append(f'{"-" if u < 0 else ""}{q}.{r:0{s}d}')
+    return result
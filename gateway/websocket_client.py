@@ -1,9 +1,12 @@
 import json
 import sys
+import time
 import traceback
 from datetime import datetime
 from types import coroutine
 from threading import Thread
+from typing import Optional
+from concurrent.futures import Future
 from asyncio import (
     get_event_loop,
     set_event_loop,
@@ -13,15 +16,19 @@ from asyncio import (
 
 from aiohttp import ClientSession, ClientWebSocketResponse
 
+from .metrics import METRICS, get_event_time
+
 
 class WebsocketClient:
     """
     针对各类Websocket API的异步客户端
 
-    * 重载unpack_data方法来实现数据解包逻辑
+    * 重载unpack_data方法或调用set_decoder来实现数据解包逻辑
     * 重载on_connected方法来实现连接成功回调处理
     * 重载on_disconnected方法来实现连接断开回调处理
     * 重载on_packet方法来实现数据推送回调处理
+    * 调用set_dispatcher后on_packet在分发线程中执行, 不再阻塞接收循环
+    * 调用set_recorder记录收到的原始数据, 用于离线回放
     * 重载on_error方法来实现异常捕捉回调处理
     """
 
@@ -30,9 +37,10 @@ class WebsocketClient:
         self._active: bool = False
         self._host: str = ""
 
-        self._session: ClientSession = ClientSession()
+        self._session: ClientSession = None  # 在运行连接的事件循环中创建
         self._ws: ClientWebSocketResponse = None
         self._loop: AbstractEventLoop = None
+        self._own_loop: bool = False  # 事件循环是否由本客户端启动, 共享的事件循环由其所有者停止
 
         self._proxy: str = ""
         self._ping_interval: int = 60  # 秒
@@ -41,6 +49,10 @@ class WebsocketClient:
         self._last_sent_text: str = ""
         self._last_received_text: str = ""
 
+        self._decoder = None
+        self._dispatcher = None
+        self._recorder = None
+
     def init(
         self,
         host: str,
@@ -73,22 +85,31 @@ class WebsocketClient:
 
         if not self._loop:
             self._loop = get_event_loop()
-        start_event_loop(self._loop)
+        if not self._loop.is_running():
+            start_event_loop(self._loop)
+            self._own_loop = True
+
+        if self._dispatcher:
+            self._dispatcher.start()
 
         run_coroutine_threadsafe(self._run(), self._loop)
 
-    def stop(self):
+    def stop(self) -> Optional[Future]:
         """
         停止客户端。
+
+        返回关闭连接和会话的Future, 共享事件循环的所有者应等待其完成后再停止事件循环。
         """
         self._active = False
 
-        if self._ws:
-            coro = self._ws.close()
-            run_coroutine_threadsafe(coro, self._loop)
+        if self._dispatcher:
+            self._dispatcher.stop()
 
+        future = None
         if self._loop and self._loop.is_running():
-            self._loop.stop()
+            future = run_coroutine_threadsafe(self._close(self._own_loop), self._loop)
+        self._own_loop = False
+        return future
 
     def join(self):
         """
@@ -109,12 +130,32 @@ class WebsocketClient:
             coro: coroutine = self._ws.send_str(text)
             run_coroutine_threadsafe(coro, self._loop)
 
+    def set_decoder(self, decoder):
+        """
+        设置数据解包器, 解包器须实现decode(text)方法, 返回None表示丢弃该数据包
+        """
+        self._decoder = decoder
+
+    def set_dispatcher(self, dispatcher):
+        """
+        设置数据分发器, 分发器须实现put_async(packet), start()和stop()方法, 通常以on_packet作为处理函数
+        """
+        self._dispatcher = dispatcher
+
+    def set_recorder(self, recorder):
+        """
+        设置原始数据记录器, 记录器须实现record(text)方法
+        """
+        self._recorder = recorder
+
     def unpack_data(self, data: str):
         """
         对字符串数据进行json格式解包
 
         如果需要使用json以外的解包格式，请重载实现本函数。
         """
+        if self._decoder:
+            return self._decoder.decode(data)
         return json.loads(data)
 
     def on_connected(self):
@@ -160,10 +201,30 @@ class WebsocketClient:
         )
         return text
 
+    async def _close(self, stop_loop: bool):
+        """
+        关闭连接和会话, 事件循环由本客户端启动时随后停止它
+        """
+        if self._ws:
+            await self._ws.close()
+        if self._session:
+            await self._session.close()
+            self._session = None
+        if stop_loop:
+            self._loop.stop()
+
     async def _run(self):
         """
         在事件循环中运行的主协程
         """
+        name: str = type(self).__name__
+        lag_hist = METRICS.histogram('ws_event_lag_seconds', client=name)
+        handler_hist = METRICS.histogram('ws_handler_seconds', client=name)
+
+        # 会话必须在运行连接的事件循环中创建
+        if self._session is None:
+            self._session = ClientSession()
+
         while self._active:
             # 捕捉运行过程中异常
             try:
@@ -179,11 +240,28 @@ class WebsocketClient:
 
                 # 持续处理收到的数据
                 async for msg in self._ws:
+                    recv_time: float = time.time()
+                    t: float = time.perf_counter()
                     text: str = msg.data
                     self._record_last_received_text(text)
+                    if self._recorder:
+                        self._recorder.record(text)
 
                     data: dict = self.unpack_data(text)
-                    self.on_packet(data)
+                    if data is None:
+                        continue
+                    if self._dispatcher:
+                        await self._dispatcher.put_async(data)
+                    else:
+                        self.on_packet(data)
+
+                    # 交易所事件时间到接收的延迟, 以及接收到处理完成的耗时 (使用分发器时由分发线程记录)
+                    if METRICS.enabled:
+                        event_time = get_event_time(data)
+                        if event_time:
+                            lag_hist.record(recv_time - event_time / 1000)
+                        if not self._dispatcher:
+                            handler_hist.record(time.perf_counter() - t)
 
                 # 移除Websocket连接对象
                 self._ws = None
@@ -0,0 +1,160 @@
+import os
+import urllib.error
+import urllib.request
+import zipfile
+from datetime import datetime, timezone
+
+import numpy as np
+import pytest
+
+from gateway.archive import (ArchiveLoader, ArchiveStore, get_archive_path, parse_agg_trade_archive,
+                             parse_funding_archive, parse_kline_archive)
+from gateway.candle import parse_candle_arrays
+from gateway.constant import SymbolType
+
+HOUR_MS = 3600000
+KLINE_HEADER = ('open_time,open,high,low,close,volume,close_time,quote_volume,count,taker_buy_volume,'
+                'taker_buy_quote_volume,ignore')
+
+
+def _ms(*args) -> int:
+    return int(datetime(*args, tzinfo=timezone.utc).timestamp() * 1000)
+
+
+def make_klines(start_ms: int, end_ms: int, step_ms: int = HOUR_MS) -> list[list]:
+    return [[t, 1.0 + i, 2.0 + i, 0.5 + i, 1.5 + i, 10.0, t + step_ms - 1, 15.0, 3, 4.0, 6.0, 0]
+            for i, t in enumerate(range(start_ms, end_ms, step_ms))]
+
+
+def write_zip(path: str, rows: list[list], header: str = ''):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    lines = [header] if header else []
+    lines += [','.join(str(x) for x in row) for row in rows]
+    with zipfile.ZipFile(path, 'w') as zf:
+        zf.writestr(os.path.basename(path).replace('.zip', '.csv'), '\n'.join(lines) + '\n')
+
+
+def write_kline_archive(root: str, period: str, date: str, rows: list[list], header: str = ''):
+    rel_path = get_archive_path(SymbolType.SPOT, period, 'klines', 'BTCUSDT', date, '1h')
+    write_zip(os.path.join(root, rel_path), rows, header)
+
+
+class FakeGateway:
+    """
+    Serves REST candles from a full kline list and records the requested ranges
+    """
+
+    def __init__(self, klines: list[list]):
+        self.klines = klines
+        self.calls: list[tuple[int, int]] = []
+
+    def query_candle(self, cc_symbol, start, end, timeframe, fmt='list'):
+        start_ms, end_ms = int(start.timestamp() * 1000), int(end.timestamp() * 1000)
+        self.calls.append((start_ms, end_ms))
+        return parse_candle_arrays([k for k in self.klines if start_ms <= k[0] < end_ms])
+
+
+def test_parse_kline_archive_header_and_microseconds(tmp_path):
+    rows = make_klines(_ms(2025, 1, 1), _ms(2025, 1, 1, 3))
+    micro_rows = [[r[0] * 1000] + r[1:6] + [r[6] * 1000] + r[7:] for r in rows]
+    path = str(tmp_path / 'k.zip')
+    write_zip(path, micro_rows, KLINE_HEADER)
+
+    arrays = parse_kline_archive(path)
+    expected = parse_candle_arrays(rows)
+    assert set(arrays) == set(expected)
+    for col, values in expected.items():
+        assert arrays[col].dtype == values.dtype
+        np.testing.assert_array_equal(arrays[col], values)
+
+
+def test_parse_agg_trade_and_funding_archive(tmp_path):
+    agg_path = str(tmp_path / 'a.zip')
+    write_zip(agg_path, [[1, '100.5', '0.1', 10, 12, 1672531200000, 'true'],
+                         [2, '100.6', '0.2', 13, 13, 1672531200001, 'False']])
+    arrays = parse_agg_trade_archive(agg_path)
+    np.testing.assert_array_equal(arrays['agg_id'], [1, 2])
+    np.testing.assert_array_equal(arrays['is_buyer_maker'], [True, False])
+    assert arrays['is_buyer_maker'].dtype == bool
+
+    funding_path = str(tmp_path / 'f.zip')
+    write_zip(funding_path, [[1672560000000, 8, '0.0002'], [1672531200000, 8, '0.0001']],
+              'calc_time,funding_interval_hours,last_funding_rate')
+    arrays = parse_funding_archive(funding_path)
+    np.testing.assert_array_equal(arrays['funding_time_ms'], [1672531200000, 1672560000000])
+    np.testing.assert_allclose(arrays['rate'], [0.0001, 0.0002])
+
+
+@pytest.fixture
+def kline_root(tmp_path):
+    """
+    January 2023 as a monthly archive, February 1st and 3rd as daily archives, February 2nd missing
+    """
+    root = str(tmp_path)
+    klines = make_klines(_ms(2023, 1, 1), _ms(2023, 2, 5))
+    write_kline_archive(root, 'monthly', '2023-01', [k for k in klines if k[0] < _ms(2023, 2, 1)])
+    for day in (1, 3):
+        write_kline_archive(root, 'daily', f'2023-02-{day:02d}',
+                            [k for k in klines if _ms(2023, 2, day) <= k[0] < _ms(2023, 2, day + 1)], KLINE_HEADER)
+    return root, klines
+
+
+def test_archive_monthly_daily_merge_with_rest_fallback(kline_root):
+    root, klines = kline_root
+    gateway = FakeGateway(klines)
+    loader = ArchiveLoader(ArchiveStore(root, download=False), gateway)
+    start, end = datetime(2023, 1, 1, tzinfo=timezone.utc), datetime(2023, 2, 4, tzinfo=timezone.utc)
+
+    arrays = loader.query_candle('BTC-USDT.SPT', start, end, '1h', fmt='numpy')
+
+    # 缺失的2月2日日度归档由REST补齐, 其余来自归档
+    assert gateway.calls == [(_ms(2023, 2, 2), _ms(2023, 2, 3))]
+    expected = parse_candle_arrays([k for k in klines if k[0] < _ms(2023, 2, 4)])
+    for col, values in expected.items():
+        np.testing.assert_array_equal(arrays[col], values)
+
+
+def test_archive_without_gateway_leaves_holes(kline_root):
+    root, _ = kline_root
+    loader = ArchiveLoader(ArchiveStore(root, download=False))
+    start, end = datetime(2023, 2, 1, tzinfo=timezone.utc), datetime(2023, 2, 4, tzinfo=timezone.utc)
+
+    begin = loader.query_candle('BTC-USDT.SPT', start, end, '1h', fmt='numpy')['candle_begin_time']
+
+    assert len(begin) == 48
+    assert not ((begin >= _ms(2023, 2, 2)) & (begin < _ms(2023, 2, 3))).any()
+
+
+def test_archive_download_error_falls_back_to_rest(kline_root, monkeypatch):
+    root, klines = kline_root
+    gateway = FakeGateway(klines)
+    store = ArchiveStore(root, download=True)
+
+    class Response:
+        """
+        Connection that times out after the download has started
+        """
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *args):
+            return False
+
+        def read(self, size=-1):
+            raise TimeoutError('timed out')
+
+    def urlopen(url, timeout=None):
+        # 2月2日缺失的日度归档在读取时超时, 其余下载请求连接失败
+        if '2023-02-02' in url:
+            return Response()
+        raise urllib.error.URLError('connection refused')
+
+    monkeypatch.setattr(urllib.request, 'urlopen', urlopen)
+    start, end = datetime(2023, 2, 1, tzinfo=timezone.utc), datetime(2023, 2, 4, tzinfo=timezone.utc)
+
+    arrays = ArchiveLoader(store, gateway).query_candle('BTC-USDT.SPT', start, end, '1h', fmt='numpy')
+
+    assert gateway.calls == [(_ms(2023, 2, 2), _ms(2023, 2, 3))]
+    assert len(arrays['candle_begin_time']) == 72
+    assert not [f for _, _, files in os.walk(root) for f in files if f.endswith('.tmp')]
@@ -0,0 +1,77 @@
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from gateway.bulk_download import DAY_MS, BulkDownloader, get_partition_path, is_partition_complete, plan_tasks
+from gateway.candle import parse_candle_arrays
+
+HOUR_MS = 3600000
+START_MS = int(datetime(2023, 1, 1, tzinfo=timezone.utc).timestamp() * 1000)
+
+
+def make_klines(start_ms: int, end_ms: int) -> list[list]:
+    return [[t, 1.0, 2.0, 0.5, 1.5, 10.0, t + HOUR_MS - 1, 15.0, 3, 4.0, 6.0, 0] for t in range(start_ms, end_ms, HOUR_MS)]
+
+
+class FakeGateway:
+    """
+    Serves 1h candles of [listed_ms, delisted_ms), optionally dropping candles to simulate a truncated response
+    """
+
+    def __init__(self, listed_ms: int, delisted_ms: int, truncate_ms: int = None):
+        self.klines = make_klines(listed_ms, delisted_ms)
+        self.truncate_ms = truncate_ms
+        self.num_queries = 0
+
+    def query_candle(self, cc_symbol, start, end, timeframe, fmt='list'):
+        self.num_queries += 1
+        start_ms, end_ms = int(start.timestamp() * 1000), int(end.timestamp() * 1000)
+        if self.truncate_ms is not None:
+            end_ms = min(end_ms, self.truncate_ms)
+        return parse_candle_arrays([k for k in self.klines if start_ms <= k[0] < end_ms])
+
+    def query_first_candle_ms(self, cc_symbol, start_ms, timeframe):
+        return next((k[0] for k in self.klines if k[0] >= start_ms), None)
+
+
+def download(out_dir: str, gateway: FakeGateway, num_days: int):
+    start = datetime.fromtimestamp(START_MS / 1000, tz=timezone.utc)
+    end = datetime.fromtimestamp((START_MS + num_days * DAY_MS) / 1000, tz=timezone.utc)
+    BulkDownloader(gateway, out_dir, num_workers=1).download(['BTC-USDT.SWPU'], ['1h'], start, end)
+
+
+def complete_days(out_dir: str, num_days: int) -> list[bool]:
+    return [
+        is_partition_complete(get_partition_path(out_dir, 'BTC-USDT.SWPU', '1h', START_MS + i * DAY_MS), HOUR_MS)
+        for i in range(num_days)
+    ]
+
+
+def test_days_before_listing_and_after_delisting_are_complete(tmp_path):
+    out_dir = str(tmp_path)
+    # 第10天中午上线, 第12天中午下架
+    gateway = FakeGateway(START_MS + 9 * DAY_MS + 12 * HOUR_MS, START_MS + 11 * DAY_MS + 12 * HOUR_MS)
+
+    download(out_dir, gateway, 14)
+
+    assert all(complete_days(out_dir, 14))
+    assert plan_tasks(out_dir, ['BTC-USDT.SWPU'], ['1h'], START_MS, START_MS + 14 * DAY_MS) == []
+
+    path = get_partition_path(out_dir, 'BTC-USDT.SWPU', '1h', START_MS + 9 * DAY_MS)
+    np.testing.assert_array_equal(pd.read_parquet(path)['candle_begin_time'],
+                                  [k[0] for k in gateway.klines[:12]])
+
+    # 再次运行不会重复下载
+    num_queries = gateway.num_queries
+    download(out_dir, gateway, 14)
+    assert gateway.num_queries == num_queries
+
+
+def test_truncated_response_leaves_uncovered_days(tmp_path):
+    out_dir = str(tmp_path)
+    gateway = FakeGateway(START_MS, START_MS + 7 * DAY_MS, truncate_ms=START_MS + 2 * DAY_MS + 5 * HOUR_MS)
+
+    download(out_dir, gateway, 7)
+
+    assert complete_days(out_dir, 7) == [True, True] + [False] * 5
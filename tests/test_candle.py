@@ -0,0 +1,59 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from gateway.candle import (CANDLE_COLUMNS, CANDLE_DTYPES, CandleBatch, format_candles, parse_candle_arrays,
+                            parse_candle_list)
+
+# 币安原始K线, 价格与成交量为字符串
+RAW_KLINES = [
+    [1672531200000, '16541.77', '16545.70', '16508.39', '16529.67', '4364.83', 1672534799999, '72146072.9', 61866,
+     '2222.87', '36741580.1', '0'],
+    [1672534800000, '16529.59', '16556.80', '16525.78', '16551.47', '3590.06', 1672538399999, '59390898.4', 52224,
+     '1781.27', '29467996.0', '0'],
+]
+
+
+def test_parse_candle_arrays_dtypes_and_values():
+    arrays = parse_candle_arrays(RAW_KLINES)
+
+    assert list(arrays) == CANDLE_COLUMNS
+    for col in CANDLE_COLUMNS:
+        assert arrays[col].dtype == CANDLE_DTYPES[col]
+    np.testing.assert_array_equal(arrays['candle_begin_time'], [1672531200000, 1672534800000])
+    np.testing.assert_array_equal(arrays['candle_end_time'], [1672534799999, 1672538399999])
+    np.testing.assert_array_equal(arrays['close'], [16529.67, 16551.47])
+    np.testing.assert_array_equal(arrays['num_trades'], [61866, 52224])
+    np.testing.assert_array_equal(arrays['buy_turnover'], [36741580.1, 29467996.0])
+
+
+def test_parse_candle_empty():
+    arrays = parse_candle_arrays([])
+    assert list(arrays) == CANDLE_COLUMNS
+    assert all(len(values) == 0 and values.dtype == CANDLE_DTYPES[col] for col, values in arrays.items())
+    assert parse_candle_list([]) == []
+    assert format_candles([], 'dataframe').empty
+
+
+def test_parse_candle_list_matches_arrays():
+    candles = parse_candle_list(RAW_KLINES)
+    assert candles == CandleBatch(parse_candle_arrays(RAW_KLINES)).to_list()
+
+    c = candles[0]
+    assert c.candle_begin_time == pd.Timestamp('2023-01-01 00:00', tz='UTC')
+    assert c.candle_end_ms == 1672534799999
+    assert (c.open, c.high, c.low, c.close) == (16541.77, 16545.70, 16508.39, 16529.67)
+    assert isinstance(c.num_trades, int)
+
+
+def test_format_candles_consistent_across_formats():
+    arrays = format_candles(RAW_KLINES, 'numpy')
+    df = format_candles(RAW_KLINES, 'dataframe')
+    batch = format_candles(RAW_KLINES, 'batch')
+
+    assert list(df.columns) == CANDLE_COLUMNS
+    for col in CANDLE_COLUMNS:
+        np.testing.assert_array_equal(df[col].to_numpy(), arrays[col])
+    assert batch.to_list() == format_candles(RAW_KLINES, 'list')
+    with pytest.raises(ValueError):
+        format_candles(RAW_KLINES, 'csv')
@@ -0,0 +1,144 @@
+import asyncio
+import threading
+
+from gateway.binance_depth_ws import BinanceDepthWs
+from gateway.orderbook import LocalOrderBook, OrderBookSide
+
+SNAPSHOT_BIDS = [['100.0', '1'], ['99.5', '2'], ['99.0', '3']]
+SNAPSHOT_ASKS = [['100.5', '1'], ['101.0', '2']]
+
+
+def make_book(is_futures: bool, last_update_id: int = 100) -> LocalOrderBook:
+    book = LocalOrderBook('BTC-USDT.SWPU' if is_futures else 'BTC-USDT.SPT', is_futures)
+    book.apply_snapshot(last_update_id, SNAPSHOT_BIDS, SNAPSHOT_ASKS)
+    return book
+
+
+def test_side_sorted_best_first():
+    bids = OrderBookSide(is_bid=True)
+    asks = OrderBookSide(is_bid=False)
+    for price in (99.0, 101.0, 100.0):
+        bids.update(price, 1)
+        asks.update(price, 1)
+
+    assert bids.top(3) == ([101.0, 100.0, 99.0], [1, 1, 1])
+    assert asks.top(3) == ([99.0, 100.0, 101.0], [1, 1, 1])
+
+    bids.update(101.0, 0)
+    bids.update(100.0, 5)
+    bids.update(98.0, 0)  # 不存在的档位size为0, 忽略
+    assert bids.best() == (100.0, 5)
+    assert len(bids) == 2
+
+
+def test_diff_before_snapshot_is_required():
+    book = LocalOrderBook('BTC-USDT.SPT', is_futures=False)
+    assert not book.apply_diff(1, 2, [], [])
+    assert not book.synced
+
+
+def test_spot_sequencing():
+    book = make_book(is_futures=False)
+
+    # 快照之前的事件丢弃, u == lastUpdateId 同样丢弃
+    assert book.apply_diff(90, 100, [['100.0', '9']], [])
+    assert not book.synced and book.best_bid() == (100.0, 1)
+
+    # 首个事件需满足 U <= lastUpdateId + 1 <= u
+    assert book.apply_diff(95, 105, [['100.0', '0'], ['99.8', '4']], [['100.2', '1']])
+    assert book.synced and book.last_update_id == 105
+    assert book.best_bid() == (99.8, 4)
+    assert book.best_ask() == (100.2, 1)
+
+    # 之后需满足 U == 上一个u + 1
+    assert book.apply_diff(106, 110, [], [['100.2', '0']])
+    assert book.best_ask() == (100.5, 1)
+    assert not book.apply_diff(112, 115, [['99.9', '1']], [])
+    assert book.last_update_id == 110 and book.best_bid() == (99.8, 4)
+
+
+def test_spot_gap_after_snapshot():
+    book = make_book(is_futures=False)
+    assert not book.apply_diff(102, 105, [], [])
+    assert not book.synced
+
+
+def test_futures_sequencing():
+    book = make_book(is_futures=True)
+
+    # 快照之前的事件丢弃
+    assert book.apply_diff(80, 99, [['100.0', '9']], [], prev_final_id=79)
+    assert not book.synced
+
+    # 首个事件需满足 U <= lastUpdateId <= u, 不检查pu
+    assert book.apply_diff(98, 103, [['100.0', '5']], [], prev_final_id=97)
+    assert book.synced and book.last_update_id == 103
+
+    # 之后需满足 pu == 上一个u
+    assert book.apply_diff(110, 112, [], [['100.5', '3']], prev_final_id=103)
+    assert book.best_ask() == (100.5, 3)
+    assert not book.apply_diff(120, 125, [], [], prev_final_id=118)
+    assert book.last_update_id == 112
+
+
+def test_resync_after_snapshot_reset():
+    book = make_book(is_futures=True)
+    book.apply_diff(98, 103, [['98.0', '1']], [], prev_final_id=97)
+
+    book.apply_snapshot(200, [['105.0', '1']], [['106.0', '1']])
+
+    assert not book.synced and book.last_update_id == 200
+    top = book.top(5)
+    assert top.bid_prices == [105.0] and top.ask_prices == [106.0]
+
+
+class FakeDepthGateway:
+    """
+    Serves depth snapshots with increasing lastUpdateId and counts the requests
+    """
+
+    def __init__(self):
+        self.num_snapshots = 0
+
+    def convert_symbol_cc_to_exg(self, cc_symbol):
+        return 'BTCUSDT', None
+
+    def query_depth_snapshot(self, cc_symbol, limit):
+        self.num_snapshots += 1
+        return {'lastUpdateId': 100 * self.num_snapshots, 'bids': SNAPSHOT_BIDS, 'asks': SNAPSHOT_ASKS}
+
+
+def test_depth_ws_resync_from_dispatcher_thread():
+    stream = 'btcusdt@depth@100ms'
+
+    async def run():
+        gateway = FakeDepthGateway()
+        ws = BinanceDepthWs(gateway, ['BTC-USDT.SWPU'])
+        ws._loop = asyncio.get_running_loop()
+        ws.resync('BTC-USDT.SWPU')
+        while 'BTC-USDT.SWPU' in ws._syncing:
+            await asyncio.sleep(0.01)
+        book = ws.books['BTC-USDT.SWPU']
+        assert book.last_update_id == 100
+
+        # 分发线程中发现update id不连续, 重新同步由事件循环线程发起
+        def dispatch():
+            ws.on_packet({'stream': stream, 'data': {'U': 99, 'u': 105, 'pu': 98, 'b': [], 'a': []}})
+            ws.on_packet({'stream': stream, 'data': {'U': 110, 'u': 112, 'pu': 108, 'b': [], 'a': []}})
+
+        thread = threading.Thread(target=dispatch)
+        thread.start()
+        thread.join()
+        assert book.last_update_id is None
+        while gateway.num_snapshots < 2 or 'BTC-USDT.SWPU' in ws._syncing:
+            await asyncio.sleep(0.01)
+        assert gateway.num_snapshots == 2 and book.last_update_id == 200
+
+        # 关闭时被取消的快照请求
+        future = ws._loop.create_future()
+        future.cancel()
+        ws._syncing.add('BTC-USDT.SWPU')
+        ws._on_snapshot('BTC-USDT.SWPU', future)
+        assert 'BTC-USDT.SWPU' not in ws._syncing
+
+    asyncio.run(run())
@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+
+from gateway.binance import format_price_size
+from gateway.constant import SymbolData
+from gateway.util import floor_to_tick, quantize_to_ticks, round_to_tick, tick_to_int, ticks_to_str
+
+
+@pytest.mark.parametrize('tick, expected', [
+    (0.005, (5, 3)),
+    (0.1, (1, 1)),
+    (1e-8, (1, 8)),
+    (1, (1, 0)),
+    (10, (10, 0)),
+    (0.00025, (25, 5)),
+])
+def test_tick_to_int(tick, expected):
+    assert tick_to_int(tick) == expected
+
+
+def test_quantize_to_ticks_float_error():
+    # 0.3 / 0.1 = 2.9999999999999996, 向下取整时不能落到2
+    assert quantize_to_ticks([0.3], 1, 1, floor=True).tolist() == [3]
+    assert quantize_to_ticks([1.15], 5, 2, floor=True).tolist() == [23]
+    assert quantize_to_ticks([1.1499], 5, 2, floor=True).tolist() == [22]
+
+
+def test_quantize_to_ticks_matches_scalar_helpers():
+    rng = np.random.default_rng(0)
+    values = np.round(rng.uniform(0, 1000, 200), 6)
+    for tick in (0.01, 0.005, 0.5, 1, 10):
+        tick_int, scale = tick_to_int(tick)
+        rounded = ticks_to_str(quantize_to_ticks(values, tick_int, scale), tick_int, scale)
+        floored = ticks_to_str(quantize_to_ticks(values, tick_int, scale, floor=True), tick_int, scale)
+        assert [float(s) for s in rounded] == [round_to_tick(v, tick) for v in values]
+        assert [float(s) for s in floored] == [floor_to_tick(v, tick) for v in values]
+
+
+def test_ticks_to_str_exact():
+    assert ticks_to_str([3, 0, -7], 5, 3) == ['0.015', '0.000', '-0.035']
+    assert ticks_to_str([12345], 1, 2) == ['123.45']
+    assert ticks_to_str([4], 10, 0) == ['40']
+    # tick_int和scale可以按元素对齐
+    assert ticks_to_str([1, 1], [1, 25], [1, 5]) == ['0.1', '0.00025']
+
+
+def test_format_price_size_per_symbol():
+    syms = [
+        SymbolData('BTC-USDT.SWPU', size_tick=0.001, price_tick=0.1, face_value=1),
+        SymbolData('DOGE-USDT.SWPU', size_tick=1, price_tick=0.00001, face_value=1),
+        SymbolData('ETH-USD.SWPC', size_tick=1, price_tick=0.01, face_value=10),
+    ]
+    prices, sizes = format_price_size([30000.06, 0.123456, 1850.005], [0.0129, 150.9, 3.0], syms)
+
+    assert prices == ['30000.1', '0.12346', '1850.00']
+    assert sizes == ['0.012', '150', '3']